@@ -0,0 +1,95 @@
+import statistics
+import time
+from collections import deque
+from typing import Callable
+
+from PySide6 import QtCore
+
+
+class AccurateSweep:
+    def __init__(self, targets: dict[str, tuple[str, int]], request: Callable[[str], None],
+                 on_finished: Callable[[dict], None], parent: QtCore.QObject, concurrency: int = 4,
+                 timeout: float = 10.0):
+        # targets: identifier the results arrive on -> (topic identifier to request, expected cell count)
+        self.targets = targets
+        self.request = request
+        self.on_finished = on_finished
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.queue: deque[str] = deque(targets)
+        self.in_flight: dict[str, float] = {}
+        self.cells: dict[str, set[int]] = {identifier: set() for identifier in targets}
+        self.durations: dict[str, float] = {}
+        self.missing: list[str] = []
+        self.deltas: list[tuple[float, str, int]] = []
+        self.started: float = 0
+        self.running: bool = False
+        self.timer = QtCore.QTimer(parent)
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.running = True
+        self.fill()
+        self.timer.start(100)
+
+    def fill(self):
+        now = time.perf_counter()
+        while len(self.in_flight) < self.concurrency and len(self.queue) > 0:
+            identifier = self.queue.popleft()
+            self.in_flight[identifier] = now
+            self.request(self.targets[identifier][0])
+
+    def received(self, identifier: str, number: int, accurate: float, fast: float | None):
+        if identifier not in self.in_flight or number in self.cells[identifier]:
+            return
+        self.cells[identifier].add(number)
+        if fast is not None:
+            self.deltas.append((accurate - fast, identifier, number))
+        if len(self.cells[identifier]) >= self.targets[identifier][1]:
+            self.durations[identifier] = time.perf_counter() - self.in_flight.pop(identifier)
+            self.fill()
+            self.finish_if_done()
+
+    def check(self):
+        now = time.perf_counter()
+        for identifier in [identifier for identifier, started in self.in_flight.items()
+                           if now - started > self.timeout]:
+            del self.in_flight[identifier]
+            self.missing.append(identifier)
+        self.fill()
+        self.finish_if_done()
+
+    def finish_if_done(self):
+        if not self.running or len(self.in_flight) > 0 or len(self.queue) > 0:
+            return
+        self.running = False
+        self.timer.stop()
+        self.on_finished(self.report())
+
+    def cancel(self):
+        self.running = False
+        self.timer.stop()
+
+    def report(self) -> dict:
+        report: dict = {
+            'duration': round(time.perf_counter() - self.started, 3),
+            'modules': len(self.targets),
+            'completed': len(self.durations),
+            'missing': sorted(self.missing + list(self.in_flight) + list(self.queue)),
+            'incomplete_cells': {identifier: sorted(set(range(1, self.targets[identifier][1] + 1)) - cells)
+                                 for identifier, cells in self.cells.items()
+                                 if identifier in self.missing and len(cells) > 0},
+        }
+        if len(self.durations) > 0:
+            report['module_duration_mean'] = round(statistics.mean(self.durations.values()), 3)
+            report['module_duration_max'] = round(max(self.durations.values()), 3)
+        if len(self.deltas) > 0:
+            deltas = [delta for delta, _, _ in self.deltas]
+            worst, identifier, number = max(self.deltas, key=lambda entry: abs(entry[0]))
+            report['cells'] = len(deltas)
+            report['delta_mean_mv'] = round(statistics.mean(deltas) * 1000, 2)
+            report['delta_stdev_mv'] = round(statistics.pstdev(deltas) * 1000, 2)
+            report['delta_abs_max_mv'] = round(abs(worst) * 1000, 2)
+            report['delta_abs_max_cell'] = f'{identifier}/{number}'
+        return report
@@ -0,0 +1,163 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import yaml
+from PySide6 import QtWidgets
+from PySide6.QtWidgets import QTableWidget, QTableWidgetItem
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    name: str
+    topic: str
+    above: float | None = None
+    below: float | None = None
+    clear: float | None = None
+    duration: float = 0.0
+    severity: str = 'warning'
+    index: int | None = None
+
+    def triggered(self, value: float) -> bool:
+        return (self.above is not None and value > self.above) or (self.below is not None and value < self.below)
+
+    def cleared(self, value: float) -> bool:
+        if self.clear is None:
+            return not self.triggered(value)
+        if self.above is not None:
+            return value < self.clear
+        return value > self.clear
+
+
+@dataclass(slots=True)
+class Alert:
+    rule: Rule
+    identifier: str
+    number: int | None
+    value: float
+    since: float
+
+    def key(self) -> str:
+        return self.identifier if self.number is None else f'{self.identifier}/{self.number}'
+
+
+def load_rules(filename: Path) -> list[Rule]:
+    if not filename.exists():
+        return []
+    with open(filename, 'r') as file:
+        content: dict = yaml.safe_load(file) or {}
+    rules: list[Rule] = []
+    for entry in content.get('rules', []):
+        rules.append(Rule(
+            name=entry['name'],
+            topic=entry['topic'],
+            above=entry.get('above'),
+            below=entry.get('below'),
+            clear=entry.get('clear'),
+            duration=float(entry.get('for', 0)),
+            severity=entry.get('severity', 'warning'),
+            index=entry.get('index'),
+        ))
+    return rules
+
+
+class AlertEngine:
+    def __init__(self, rules: list[Rule], on_change: Callable[[Alert, bool], None]):
+        self.on_change = on_change
+        self.index: dict[str, list[Rule]] = {}
+        for rule in rules:
+            self.index.setdefault(rule.topic, []).append(rule)
+        self.pending: dict[tuple[str, str, int | None], Alert] = {}
+        self.active: dict[tuple[str, str, int | None], Alert] = {}
+        self.evaluated: int = 0
+
+    def update(self, identifier: str, number: int | None, topic: str, value: str | float, now: float | None = None):
+        rules = self.index.get(topic)
+        if rules is None:
+            return
+        if isinstance(value, str):
+            try:
+                values: list[float] = [float(item) for item in value.split(',')]
+            except ValueError:
+                return
+        else:
+            values = [value]
+        now = now if now is not None else time.monotonic()
+        for rule in rules:
+            if rule.index is not None:
+                if rule.index >= len(values):
+                    continue
+                rule_value = values[rule.index]
+            else:
+                rule_value = max(values)
+            self.evaluate(rule, identifier, number, rule_value, now)
+
+    def evaluate(self, rule: Rule, identifier: str, number: int | None, value: float, now: float):
+        self.evaluated += 1
+        key = (rule.name, identifier, number)
+        alert = self.active.get(key)
+        if alert is not None:
+            alert.value = value
+            if rule.cleared(value):
+                del self.active[key]
+                self.on_change(alert, False)
+            return
+        if not rule.triggered(value):
+            self.pending.pop(key, None)
+            return
+        alert = self.pending.get(key)
+        if alert is None:
+            alert = Alert(rule, identifier, number, value, now)
+            self.pending[key] = alert
+        alert.value = value
+        if now - alert.since >= rule.duration:
+            self.raise_alert(key)
+
+    def raise_alert(self, key: tuple[str, str, int | None]):
+        alert = self.pending.pop(key)
+        self.active[key] = alert
+        self.on_change(alert, True)
+
+    def check_pending(self, now: float | None = None):
+        # a condition that holds without new messages still raises once its duration has passed
+        now = now if now is not None else time.monotonic()
+        for key in [key for key, alert in self.pending.items() if now - alert.since >= alert.rule.duration]:
+            self.raise_alert(key)
+
+    def remove(self, identifier: str):
+        for alerts in (self.pending, self.active):
+            for key in [key for key in alerts if key[1] == identifier]:
+                alert = alerts.pop(key)
+                if alerts is self.active:
+                    self.on_change(alert, False)
+
+
+class AlertsDock(QtWidgets.QDockWidget):
+    HEADERS: list[str] = ['severity', 'rule', 'module', 'cell', 'value', 'since']
+
+    def __init__(self, engine: AlertEngine, parent: QtWidgets.QWidget):
+        super().__init__('alerts', parent)
+        self.engine = engine
+        self.table = QTableWidget(0, len(self.HEADERS), self)
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setWidget(self.table)
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        now = time.monotonic()
+        alerts = sorted(self.engine.active.values(), key=lambda a: (a.rule.severity != 'critical', a.since))
+        self.table.setRowCount(len(alerts))
+        for i, alert in enumerate(alerts):
+            row = (alert.rule.severity, alert.rule.name, alert.identifier,
+                   '' if alert.number is None else str(alert.number), f'{alert.value:g}', f'{now - alert.since:.0f} s')
+            for j, text in enumerate(row):
+                item = self.table.item(i, j)
+                if item is None:
+                    self.table.setItem(i, j, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
+        self.table.resizeColumnsToContents()
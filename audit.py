@@ -0,0 +1,170 @@
+import argparse
+import concurrent.futures
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+from fabric import Config, Connection
+
+from credentials import Credentials
+from docker_container import DockerContainer
+from slave_mapping import SlaveMapping
+from utils import get_config_file, get_config_local, get_yaml_file
+
+# checks many pis at once without the GUI: credentials of can-service, master, relay and .env, the docker containers
+# and the slave mapping. one json line per host is written as soon as the host is done.
+#
+# inventory (yaml):
+#   defaults: {user: pi, password: '123'}
+#   hosts:
+#     - 192.168.1.20
+#     - {host: 'pi-b.local:2222', password: other}
+
+
+def load_inventory(path: Path) -> list[dict]:
+    inventory = get_config_local(path)
+    if 'error' in inventory:
+        raise ValueError(f'{path}: {inventory["error"]}')
+    defaults: dict = {'user': 'pi', 'password': ''} | (inventory.get('defaults') or {})
+    hosts: list[dict] = []
+    for entry in inventory.get('hosts') or []:
+        hosts.append(defaults | ({'host': entry} if isinstance(entry, str) else entry))
+    return hosts
+
+
+class HostAudit:
+    def __init__(self, entry: dict, connect_timeout: float, command_timeout: float):
+        self.host: str = entry['host']
+        self.command_timeout = command_timeout
+        # timeouts.command applies to every sudo/run of the checks
+        self.c = Connection(host=self.host, user=entry['user'], connect_timeout=connect_timeout,
+                            config=Config(overrides={'timeouts': {'command': command_timeout}}),
+                            connect_kwargs={'password': str(entry['password']), 'banner_timeout': connect_timeout,
+                                            'auth_timeout': connect_timeout, 'look_for_keys': False,
+                                            'allow_agent': False})
+        self.started: float | None = None
+        self.timed_out: bool = False
+
+    def close(self):
+        try:
+            self.c.close()
+        except Exception:
+            pass
+
+    def get_yaml_file(self, path: str):
+        # reads go over sftp, a hanging read fails after the command timeout
+        self.c.sftp().get_channel().settimeout(self.command_timeout)
+        return get_yaml_file(self.c, path)
+
+    def credentials(self) -> dict:
+        can = self.get_yaml_file(Credentials.CAN_FILE)
+        master = self.get_yaml_file(Credentials.MASTER_FILE)
+        relay = self.get_yaml_file(Credentials.RELAY_FILE)
+        env = get_config_file(self.c, Credentials.ENV_FILE)
+        mismatch = Credentials.check(can, master, relay, env)
+        if mismatch is not None:
+            # only which pair differs, the report must not contain the passwords
+            return {'match': False, 'problem': mismatch[0]}
+        return {'match': True, 'mqtt_user': Credentials.merge(can, master, relay, env)['mqtt_user']}
+
+    def containers(self) -> dict:
+        result = self.c.sudo(DockerContainer.LIST_COMMAND, hide=True)
+        containers = DockerContainer.parse(result.stdout)
+        return {'running': sorted(container['Names'] for container in containers if container['State'] == 'running'),
+                'not_running': {container['Names']: container['Status'] for container in containers
+                                if container['State'] != 'running'}}
+
+    def slave_mapping(self) -> dict:
+        store = self.get_yaml_file(SlaveMapping.FILE)
+        return {'slaves': len((store or {}).get('slaves') or {}), 'problems': SlaveMapping.check(store)}
+
+    def run(self) -> dict:
+        self.started = time.monotonic()
+        record: dict = {'host': self.host, 'ok': True}
+        try:
+            self.c.open()
+        except Exception as e:
+            return record | {'ok': False, 'error': f'{type(e).__name__}: {e}', 'seconds': self.elapsed()}
+        for name, check in (('credentials', self.credentials), ('containers', self.containers),
+                            ('slave_mapping', self.slave_mapping)):
+            if self.timed_out:
+                break
+            try:
+                record[name] = check()
+            except Exception as e:
+                record[name] = {'error': f'{type(e).__name__}: {e}'}
+                record['ok'] = False
+        self.close()
+        credentials, containers, slave_mapping = (record.get(key, {}) for key in
+                                                  ('credentials', 'containers', 'slave_mapping'))
+        if not credentials.get('match', True) or len(containers.get('not_running', {})) > 0 or \
+                len(slave_mapping.get('problems', [])) > 0:
+            record['ok'] = False
+        return record | {'seconds': self.elapsed()}
+
+    def elapsed(self) -> float:
+        return round(time.monotonic() - self.started, 3) if self.started is not None else 0.0
+
+
+def audit(hosts: list[dict], workers: int, timeout: float, connect_timeout: float, command_timeout: float,
+          output=sys.stdout) -> int:
+    failed: int = 0
+    lock = threading.Lock()
+
+    def write(record: dict):
+        nonlocal failed
+        with lock:
+            failed += 0 if record['ok'] else 1
+            output.write(json.dumps(record) + '\n')
+            output.flush()
+
+    # the pool bounds the number of open ssh connections, each worker holds one host at a time
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='audit') as executor:
+        audits = [HostAudit(entry, connect_timeout, command_timeout) for entry in hosts]
+        pending = {executor.submit(host_audit.run): host_audit for host_audit in audits}
+        while len(pending) > 0:
+            done, _ = concurrent.futures.wait(pending, timeout=0.2, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                host_audit = pending.pop(future)
+                try:
+                    write(future.result())
+                except Exception as e:
+                    write({'host': host_audit.host, 'ok': False, 'error': f'{type(e).__name__}: {e}'})
+            now = time.monotonic()
+            for future, host_audit in list(pending.items()):
+                # the deadline starts when a worker picks the host up, closing the connection ends its reads
+                if host_audit.started is not None and now - host_audit.started > timeout:
+                    host_audit.timed_out = True
+                    host_audit.close()
+                    pending.pop(future)
+                    write({'host': host_audit.host, 'ok': False, 'error': f'timeout after {timeout:g} s',
+                           'seconds': host_audit.elapsed()})
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='audit credentials, containers and slave mapping of many pis')
+    parser.add_argument('inventory', type=Path, help='yaml file with hosts and defaults (user, password)')
+    parser.add_argument('--workers', type=int, default=8, help='hosts checked at the same time')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds per host for all checks')
+    parser.add_argument('--connect-timeout', type=float, default=10)
+    parser.add_argument('--command-timeout', type=float, default=20, help='seconds per remote command or file')
+    parser.add_argument('--output', type=Path, help='json lines file instead of stdout')
+    arguments = parser.parse_args()
+    hosts = load_inventory(arguments.inventory)
+    output = open(arguments.output, 'w') if arguments.output is not None else sys.stdout
+    start = time.monotonic()
+    try:
+        failed = audit(hosts, arguments.workers, arguments.timeout, arguments.connect_timeout,
+                       arguments.command_timeout, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f'{len(hosts)} hosts, {failed} failed, {time.monotonic() - start:.1f} s', file=sys.stderr)
+    sys.exit(1 if failed > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from PySide6 import QtWidgets
+
+from fake_ssh_server import FakeSshServer, create_docker_tree
+from utils import save_config_local
+
+# measures MainWindow.init_queue (the refresh of all ConfigReaders) against the local fake pi at several round trip
+# times: 'cold' opens a new ssh connection like after the settings dialog, 'warm' reuses the open one
+
+ROWS = ['latency', 'mode', 'refresh_s', 'round_trips', 'requests', 'connections', 'bytes_up', 'bytes_down']
+
+
+def wait_refreshed(app: QtWidgets.QApplication, window, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        if window.queue.empty() and window.queue.running is None and \
+                all(reader.button.isEnabled() for reader in window.reader_list.values()):
+            app.processEvents()
+            return True
+        time.sleep(0.002)
+    return False
+
+
+def refresh(app: QtWidgets.QApplication, window, server: FakeSshServer, cold: bool, timeout: float) -> dict:
+    if cold:
+        for reader in window.reader_list.values():
+            reader.c.close()
+        window.reader_config['c'] = window.get_connection()
+        for reader in window.reader_list.values():
+            reader.set_connection()
+    server.reset_counters()
+    start = time.perf_counter()
+    window.init_queue()
+    if not wait_refreshed(app, window, timeout):
+        raise TimeoutError(f'refresh did not finish within {timeout} s')
+    counters = server.counters()
+    return {'refresh_s': time.perf_counter() - start, 'round_trips': counters['round_trips'],
+            'requests': counters['requests'], 'connections': counters['connections'],
+            'bytes_up': counters['bytes_received'], 'bytes_down': counters['bytes_sent']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the config reader refresh against a local fake pi')
+    parser.add_argument('--latencies', default='0,0.01,0.05,0.1', help='comma separated round trip times in seconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120)
+    arguments = parser.parse_args()
+    latencies = [float(value) for value in arguments.latencies.split(',')]
+
+    work_dir = Path(tempfile.mkdtemp(prefix='benchmark-refresh-'))
+    server = FakeSshServer(create_docker_tree(work_dir / 'root')).start()
+    # MainWindow reads and writes config.yaml in the working directory, keep the user's one untouched
+    os.chdir(work_dir)
+    save_config_local(Path('config.yaml'), {'host': f'{server.host}:{server.port}', 'user': server.user,
+                                            'password': server.password})
+    app = QtWidgets.QApplication([])
+    from main import MainWindow
+    window = MainWindow()
+    wait_refreshed(app, window, arguments.timeout)
+
+    print(' '.join(f'{row:>12}' for row in ROWS))
+    for latency in latencies:
+        server.latency = latency
+        for mode in ('cold', 'warm'):
+            results = [refresh(app, window, server, mode == 'cold', arguments.timeout) for _ in range(arguments.repeat)]
+            median = {key: statistics.median(result[key] for result in results) for key in results[0]}
+            values = [f'{latency:.3f}', mode, f'{median["refresh_s"]:.3f}'] + \
+                     [str(int(median[key])) for key in ROWS[3:]]
+            print(' '.join(f'{value:>12}' for value in values))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-from queue import Empty, Queue
 from typing import Callable
 
 from fabric import Connection
@@ -6,17 +5,20 @@ from paramiko.ssh_exception import NoValidConnectionsError
 from PySide6.QtCore import Signal
 from PySide6.QtWidgets import QGridLayout, QPushButton, QStatusBar, QTableWidget
 
+from job_queue import JobQueue, PRIORITY_USER
 from utils import get_config_file, get_yaml_file
 
 
 class ConfigReader:
+    JOB_TIMEOUT: float = 60.0
+
     store: dict
     config: dict
     c: Connection
     button: QPushButton
     table_widget: QTableWidget
     signal: Signal
-    queue: Queue
+    queue: JobQueue
     name: str
     autosize_window: Callable
     status_bar: QStatusBar
@@ -50,10 +52,19 @@ class ConfigReader:
     def set_connection(self):
         self.c = self.config['c']
 
+    def put(self, work: dict):
+        self.queue.put(work | {'group': self.name})
+
+    def put_get_info(self, priority: int | None = None):
+        work = {'func': self.get_info, 'type': 'ssh', 'key': (self.name, 'get_info'), 'timeout': self.JOB_TIMEOUT}
+        if priority is not None:
+            work['priority'] = priority
+        self.put(work)
+
     def init_queue(self):
-        self.queue.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': f'{self.name}..'})
-        self.queue.put({'func': self.get_info, 'type': 'ssh'})
-        self.queue.put({'func': self.button.setEnabled, 'type': 'signal', 'arg': True})
+        self.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': f'{self.name}..'})
+        self.put_get_info()
+        self.put({'func': self.button.setEnabled, 'type': 'signal', 'arg': True})
 
     def get_info(self):
         pass
@@ -61,39 +72,39 @@ class ConfigReader:
     def button_pressed(self):
         self.button.setEnabled(False)
         if self.config.get('last_clicked', '') == self.name:
-            self.queue.put({'func': self.get_info, 'type': 'ssh'})
-        self.queue.put({'func': self.show_info, 'type': 'signal'})
-        self.queue.put({'func': self.button.setEnabled, 'type': 'signal', 'arg': True})
+            self.put_get_info(PRIORITY_USER)
+        else:
+            # a background refresh still waiting has to run before show_info
+            self.queue.promote((self.name, 'get_info'), PRIORITY_USER)
+        self.put({'func': self.show_info, 'type': 'signal', 'priority': PRIORITY_USER,
+                  'after': (self.name, 'get_info')})
+        self.put({'func': self.button.setEnabled, 'type': 'signal', 'arg': True, 'priority': PRIORITY_USER})
         self.config['last_clicked'] = self.name
 
     def show_info(self):
         pass
 
     def clear_queue(self):
-        while not self.queue.empty():
-            try:
-                self.queue.get(block=False)
-            except Empty:
-                continue
-            self.queue.task_done()
+        # only this reader's pending ssh work, its ui jobs still run so the button gets enabled again
+        self.queue.cancel(group=self.name, job_type='ssh')
 
     def sudo(self, command: str):
         try:
             return self.c.sudo(command, hide=True)
         except NoValidConnectionsError as e:
             self.clear_queue()
-            self.queue.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': str(e)})
+            self.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': str(e)})
 
     def get_yaml_file(self, path: str):
         try:
             return get_yaml_file(self.c, path)
         except NoValidConnectionsError as e:
             self.clear_queue()
-            self.queue.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': str(e)})
+            self.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': str(e)})
 
     def get_config_file(self, path: str):
         try:
             return get_config_file(self.c, path)
         except NoValidConnectionsError as e:
             self.clear_queue()
-            self.queue.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': str(e)})
+            self.put({'func': self.status_bar.showMessage, 'type': 'signal', 'arg': str(e)})
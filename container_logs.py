@@ -0,0 +1,182 @@
+import re
+import shlex
+import threading
+from collections import deque
+
+from PySide6 import QtCore
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import (QComboBox, QDialog, QHBoxLayout, QLabel, QLineEdit, QPlainTextEdit, QPushButton,
+                               QSpinBox, QVBoxLayout)
+
+from config_reader import ConfigReader
+
+
+class ContainerLogs(ConfigReader):
+    DEFAULT_CONTAINERS: list[str] = ['easybms-master', 'can-service']
+    MAX_LINES: int = 5000
+    MAX_LINE_LENGTH: int = 2000
+
+    def __init__(self, config: dict):
+        super().__init__(config, 'container_logs')
+        self.containers: list[str] = list(self.DEFAULT_CONTAINERS)
+        self.lines: deque[str] = deque(maxlen=self.MAX_LINES)
+        self.pending: list[str] = []
+        self.lock = threading.Lock()
+        self.pattern: re.Pattern | None = None
+        self.refiltering: bool = False
+        self.channel = None
+        self.generation: int = 0
+        self.dialog: QDialog | None = None
+
+    def get_info(self):
+        result = self.sudo('docker container ls --all --format "{{.Names}}"')
+        if result is None:
+            return
+        names = [name.strip() for name in result.stdout.splitlines() if len(name.strip()) > 0]
+        self.containers = sorted(names, key=lambda name: (name not in self.DEFAULT_CONTAINERS, name))
+
+    def button_pressed(self):
+        if self.dialog is None:
+            self.create_dialog()
+        if self.channel is None:
+            current = self.container_box.currentText()
+            self.container_box.clear()
+            self.container_box.addItems(self.containers)
+            if current in self.containers:
+                self.container_box.setCurrentText(current)
+        self.dialog.show()
+        self.dialog.raise_()
+
+    def create_dialog(self):
+        self.dialog = QDialog()
+        self.dialog.setWindowTitle('container logs')
+        self.dialog.resize(1000, 600)
+        self.dialog.finished.connect(self.stop)
+        layout = QVBoxLayout(self.dialog)
+        controls = QHBoxLayout()
+        self.container_box = QComboBox(self.dialog)
+        self.container_box.addItems(self.containers)
+        controls.addWidget(self.container_box)
+        controls.addWidget(QLabel('tail', self.dialog))
+        self.tail_box = QSpinBox(self.dialog)
+        self.tail_box.setRange(0, self.MAX_LINES)
+        self.tail_box.setValue(500)
+        controls.addWidget(self.tail_box)
+        self.start_button = QPushButton('start', self.dialog)
+        self.start_button.clicked.connect(self.start_stop)
+        controls.addWidget(self.start_button)
+        self.filter_edit = QLineEdit(self.dialog)
+        self.filter_edit.setPlaceholderText('regex filter')
+        controls.addWidget(self.filter_edit, 1)
+        layout.addLayout(controls)
+        self.text = QPlainTextEdit(self.dialog)
+        self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(self.MAX_LINES)
+        self.text.setFont(QFont('monospace'))
+        layout.addWidget(self.text)
+
+        self.filter_timer = QtCore.QTimer(self.dialog)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self.refilter)
+        self.filter_edit.textChanged.connect(lambda: self.filter_timer.start(300))
+        self.flush_timer = QtCore.QTimer(self.dialog)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(100)
+
+    def start_stop(self):
+        if self.channel is not None:
+            self.stop()
+            return
+        self.generation += 1
+        with self.lock:
+            self.lines.clear()
+            self.pending.clear()
+        self.text.clear()
+        self.start_button.setText('stop')
+        threading.Thread(target=self.stream, args=(self.container_box.currentText(), self.tail_box.value(),
+                                                   self.generation), daemon=True).start()
+
+    def stop(self):
+        self.generation += 1
+        channel, self.channel = self.channel, None
+        if channel is not None:
+            channel.close()
+        if self.dialog is not None:
+            self.start_button.setText('start')
+
+    def stream(self, container: str, tail: int, generation: int):
+        try:
+            self.c.open()
+            channel = self.c.client.get_transport().open_session()
+            # with a pty the remote side gets a hangup when the channel closes, otherwise docker logs -f keeps running
+            # on the pi; the pty also merges stderr and ends lines with \r\n
+            channel.get_pty()
+            channel.exec_command(f'sudo -n docker logs -f --tail {tail} {shlex.quote(container)}')
+        except Exception as e:
+            self.signal.emit({'func': self.status_bar.showMessage, 'arg': f'container logs: {e}'})
+            self.signal.emit({'func': self.stop})
+            return
+        if generation != self.generation:
+            channel.close()
+            return
+        self.channel = channel
+        rest = b''
+        while generation == self.generation:
+            try:
+                data = channel.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            *lines, rest = (rest + data).split(b'\n')
+            if len(rest) > self.MAX_LINE_LENGTH:
+                lines.append(rest)
+                rest = b''
+            self.add_lines([line.rstrip(b'\r').decode(errors='replace')[:self.MAX_LINE_LENGTH] for line in lines])
+        channel.close()
+        if generation == self.generation:
+            self.signal.emit({'func': self.stop})
+
+    def add_lines(self, lines: list[str]):
+        with self.lock:
+            pattern = self.pattern
+            self.lines.extend(lines)
+            self.pending.extend(line for line in lines if pattern is None or pattern.search(line))
+            if len(self.pending) > self.MAX_LINES:
+                del self.pending[:-self.MAX_LINES]
+
+    def flush(self):
+        if self.refiltering:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if len(pending) > 0:
+            self.text.appendPlainText('\n'.join(pending))
+
+    def refilter(self):
+        text = self.filter_edit.text()
+        try:
+            pattern = re.compile(text) if len(text) > 0 else None
+        except re.error:
+            self.filter_edit.setStyleSheet('color: red;')
+            return
+        self.filter_edit.setStyleSheet('')
+        with self.lock:
+            self.pattern = pattern
+            lines = list(self.lines)
+            self.pending.clear()
+        self.refiltering = True
+        threading.Thread(target=self.filter_lines, args=(pattern, lines), daemon=True).start()
+
+    def filter_lines(self, pattern: re.Pattern | None, lines: list[str]):
+        if pattern is not None:
+            lines = [line for line in lines if pattern.search(line)]
+        self.signal.emit({'func': self.show_filtered, 'arg': (pattern, lines)})
+
+    def show_filtered(self, result: tuple):
+        pattern, lines = result
+        if pattern is not self.pattern:
+            return
+        self.text.setPlainText('\n'.join(lines))
+        self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
+        self.refiltering = False
@@ -4,32 +4,47 @@ from config_reader import ConfigReader
 
 
 class Credentials(ConfigReader):
+    CAN_FILE: str = '/docker/can-service/credentials.yaml'
+    MASTER_FILE: str = '/docker/easybms-master/credentials.yaml'
+    RELAY_FILE: str = '/docker/build/relay-service/credentials.yaml'
+    ENV_FILE: str = '/docker/.env'
+
     def __init__(self, config: dict):
         super().__init__(config, 'credentials')
 
+    @staticmethod
+    def check(can: dict, master: dict, relay: dict, env: dict) -> tuple[str, dict, dict] | None:
+        # the first pair that differs, None if all services use the credentials of the .env
+        if can != master:
+            return 'can != master', can, master
+        if master != relay:
+            return 'master != relay', master, relay
+        if relay.get('username') != env.get('mqtt_user') or relay.get('password') != env.get('mqtt_password'):
+            return 'relay != env', relay, env
+        return None
+
+    @staticmethod
+    def merge(can: dict, master: dict, relay: dict, env: dict) -> dict:
+        store = can | master | relay
+        store['mqtt_user'] = store.pop('username')
+        store['mqtt_password'] = store.pop('password')
+        return store | env
+
     def get_info(self):
         self.signal.emit({'func': self.status_bar.showMessage, 'arg': 'can..'})
-        can = self.get_yaml_file('/docker/can-service/credentials.yaml')
+        can = self.get_yaml_file(self.CAN_FILE)
         if can is None:
             return
         self.signal.emit({'func': self.status_bar.showMessage, 'arg': 'master..'})
-        master = self.get_yaml_file('/docker/easybms-master/credentials.yaml')
+        master = self.get_yaml_file(self.MASTER_FILE)
         self.signal.emit({'func': self.status_bar.showMessage, 'arg': 'relay..'})
-        relay = self.get_yaml_file('/docker/build/relay-service/credentials.yaml')
-        env = self.get_config_file('/docker/.env')
-        if can != master:
-            print('can != master!', can, master)
-            return
-        if master != relay:
-            print('master != relay!', master, relay)
-            return
-        if relay['username'] != env['mqtt_user'] or relay['password'] != env['mqtt_password']:
-            print('relay != env!', relay, env)
+        relay = self.get_yaml_file(self.RELAY_FILE)
+        env = self.get_config_file(self.ENV_FILE)
+        mismatch = self.check(can, master, relay, env)
+        if mismatch is not None:
+            print(f'{mismatch[0]}!', mismatch[1], mismatch[2])
             return
-        self.store = can | master | relay
-        self.store['mqtt_user'] = self.store.pop('username')
-        self.store['mqtt_password'] = self.store.pop('password')
-        self.store |= env
+        self.store = self.merge(can, master, relay, env)
         self.signal.emit({'func': self.status_bar.showMessage, 'arg': 'credentials match!'})
 
     def show_info(self):
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+
+from PySide6 import QtWidgets
+from PySide6.QtWidgets import QTableWidget, QTableWidgetItem
+
+
+class Metrics:
+    PREFIX: str = 'mqtt_live_'
+
+    def __init__(self):
+        self.counters: dict[tuple[str, str], float] = {}
+        self.gauges: dict[tuple[str, str], float] = {}
+        self.timings: dict[tuple[str, str], list[float]] = {}
+        self.rates: dict[tuple[str, str], float] = {}
+        self.last_counters: dict[tuple[str, str], float] = {}
+        self.last_rate_update: float = time.perf_counter()
+
+    def count(self, name: str, label: str = '', value: float = 1):
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, label: str = ''):
+        self.gauges[(name, label)] = value
+
+    def observe(self, name: str, seconds: float, label: str = ''):
+        timing = self.timings.get((name, label))
+        if timing is None:
+            self.timings[(name, label)] = [1, seconds, seconds]
+            return
+        timing[0] += 1
+        timing[1] += seconds
+        if seconds > timing[2]:
+            timing[2] = seconds
+
+    def update_rates(self):
+        now = time.perf_counter()
+        interval = now - self.last_rate_update
+        if interval <= 0:
+            return
+        for key, value in self.counters.items():
+            self.rates[key] = (value - self.last_counters.get(key, 0)) / interval
+        self.last_counters = dict(self.counters)
+        self.last_rate_update = now
+
+    @staticmethod
+    def series(name: str, label: str) -> str:
+        return f'{Metrics.PREFIX}{name}{{{label}}}' if label else f'{Metrics.PREFIX}{name}'
+
+    def rows(self) -> list[tuple[str, str]]:
+        rows: list[tuple[str, str]] = []
+        for (name, label), value in sorted(self.rates.items()):
+            rows.append((f'{name} {label}'.strip() + ' /s', f'{value:.1f}'))
+        for (name, label), value in sorted(self.gauges.items()):
+            rows.append((f'{name} {label}'.strip(), f'{value:g}'))
+        for (name, label), (count, total, maximum) in sorted(self.timings.items()):
+            rows.append((f'{name} {label}'.strip(),
+                         f'{count:.0f}x, {total / count * 1000:.3f} ms avg, {maximum * 1000:.3f} ms max'))
+        return rows
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        for (name, label), value in sorted(self.counters.items()):
+            lines.append(f'{self.series(f"{name}_total", label)} {value:g}')
+        for (name, label), value in sorted(self.gauges.items()):
+            lines.append(f'{self.series(name, label)} {value:g}')
+        for (name, label), (count, total, maximum) in sorted(self.timings.items()):
+            lines.append(f'{self.series(f"{name}_seconds_count", label)} {count:g}')
+            lines.append(f'{self.series(f"{name}_seconds_sum", label)} {total:.6f}')
+            lines.append(f'{self.series(f"{name}_seconds_max", label)} {maximum:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    def __init__(self, metrics: Metrics, metrics_file: str, metrics_address: str):
+        self.metrics = metrics
+        self.metrics_file: Path | None = Path(metrics_file) if len(metrics_file) > 0 else None
+        self.text: str = ''
+        self.server: ThreadingHTTPServer | None = None
+        if len(metrics_address) > 0:
+            host, _, port = metrics_address.rpartition(':')
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = exporter.text.encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def export(self):
+        self.text = self.metrics.to_prometheus()
+        if self.metrics_file is not None:
+            tmp_file = self.metrics_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as file:
+                file.write(self.text)
+            os.replace(tmp_file, self.metrics_file)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class DiagnosticsDock(QtWidgets.QDockWidget):
+    def __init__(self, rows: Callable[[], list[tuple[str, str]]], parent: QtWidgets.QWidget):
+        super().__init__('diagnostics', parent)
+        self.rows = rows
+        self.table = QTableWidget(0, 2, self)
+        self.table.setHorizontalHeaderLabels(['metric', 'value'])
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setWidget(self.table)
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        rows = self.rows()
+        self.table.setRowCount(len(rows))
+        for i, (name, value) in enumerate(rows):
+            for j, text in enumerate((name, value)):
+                item = self.table.item(i, j)
+                if item is None:
+                    self.table.setItem(i, j, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
+        self.table.resizeColumnsToContents()
+
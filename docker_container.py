@@ -6,15 +6,20 @@ from config_reader import ConfigReader
 
 
 class DockerContainer(ConfigReader):
+    LIST_COMMAND: str = 'docker container ls --all --format "{{json . }}"'
+
     def __init__(self, config: dict):
         super().__init__(config, 'docker_container')
 
-    def get_info(self):
-        result = self.sudo('docker container ls --all --format "{{json . }}"')
-        container = result.stdout
-        container = '[' + container.strip() + ']'
+    @staticmethod
+    def parse(stdout: str) -> list[dict]:
+        container = '[' + stdout.strip() + ']'
         container = container.replace('\n', ',')
-        self.store = json.loads(container)
+        return json.loads(container)
+
+    def get_info(self):
+        result = self.sudo(self.LIST_COMMAND)
+        self.store = self.parse(result.stdout)
 
     def show_info(self):
         headers = ['Names', 'State', 'Ports', 'Networks', 'Status']
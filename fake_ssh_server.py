@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import shlex
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import paramiko
+import yaml
+
+# local stand-in for the pi: password auth, exec of 'cat <file>' and 'docker container ls' (optionally through sudo)
+# and sftp reads, all served from a fake root directory. every connection goes through a proxy that delays each
+# chunk by half the configured round trip time in both directions, so the numbers look like a wifi link.
+
+CONTAINERS: list[dict] = [
+    {'Names': 'easybms-master', 'State': 'running', 'Status': 'Up 3 days', 'Ports': '', 'Networks': 'host'},
+    {'Names': 'can-service', 'State': 'running', 'Status': 'Up 3 days', 'Ports': '', 'Networks': 'host'},
+    {'Names': 'relay-service', 'State': 'running', 'Status': 'Up 3 days', 'Ports': '', 'Networks': 'host'},
+    {'Names': 'modbus4mqtt', 'State': 'exited', 'Status': 'Exited (1) 2 hours ago', 'Ports': '', 'Networks': 'host'},
+    {'Names': 'mosquitto', 'State': 'running', 'Status': 'Up 3 days',
+     'Ports': '0.0.0.0:1883->1883/tcp, :::1883->1883/tcp', 'Networks': 'bridge'},
+]
+
+
+def create_docker_tree(root: Path, modules: int = 24, registers: int = 60) -> Path:
+    docker = root / 'docker'
+    credentials = {'username': 'easybms', 'password': 'secret'}
+    for folder in ('can-service', 'easybms-master', 'build/relay-service'):
+        (docker / folder).mkdir(parents=True, exist_ok=True)
+        (docker / folder / 'credentials.yaml').write_text(yaml.dump(credentials))
+    (docker / '.env').write_text('mqtt_user=easybms\nmqtt_password=secret\nTZ=Europe/Berlin\n')
+    slaves = {f'aabbccddee{i:02x}': {'number': i + 1} for i in range(modules)}
+    slaves['aabbccddee00']['total_voltage_measurer'] = True
+    slaves['aabbccddee01']['total_current_measurer'] = True
+    (docker / 'easybms-master' / 'slave_mapping.yaml').write_text(yaml.dump({'slaves': slaves}))
+    (docker / 'modbus4mqtt').mkdir(parents=True, exist_ok=True)
+    register_list = [{'address': 5000 + i, 'table': 'input', 'pub_topic': f'sungrow/register_{i}', 'type': 'uint16',
+                      'unit': 'W', 'retain': False, 'sensor_type': 'power'} for i in range(registers)]
+    (docker / 'modbus4mqtt' / 'sungrow_sh10rt.yaml').write_text(yaml.dump({'registers': register_list}))
+    (root / 'containers.json').write_text(json.dumps(CONTAINERS))
+    return root
+
+
+class LatencyPipe:
+    def __init__(self, source: socket.socket, target: socket.socket, server: 'FakeSshServer', from_client: bool):
+        self.source = source
+        self.target = target
+        self.server = server
+        self.from_client = from_client
+        self.chunks: deque[tuple[float, bytes]] = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def start(self):
+        threading.Thread(target=self.receive, daemon=True).start()
+        threading.Thread(target=self.forward, daemon=True).start()
+
+    def receive(self):
+        while True:
+            try:
+                data = self.source.recv(65536)
+            except OSError:
+                data = b''
+            with self.condition:
+                if not data:
+                    self.closed = True
+                else:
+                    self.chunks.append((time.perf_counter() + self.server.latency / 2, data))
+                self.condition.notify()
+            if not data:
+                return
+            self.server.count(len(data), self.from_client)
+
+    def forward(self):
+        while True:
+            with self.condition:
+                while len(self.chunks) < 1 and not self.closed:
+                    self.condition.wait()
+                if len(self.chunks) < 1:
+                    break
+                due, data = self.chunks.popleft()
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.target.sendall(data)
+            except OSError:
+                break
+        for sock in (self.source, self.target):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class FakeSftp(paramiko.SFTPServerInterface):
+    def __init__(self, server: paramiko.ServerInterface, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.fake: FakeSshServer = server.fake
+
+    def stat(self, path: str):
+        self.fake.request()
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.fake.local_path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def list_folder(self, path: str):
+        self.fake.request()
+        local = self.fake.local_path(path)
+        try:
+            return [paramiko.SFTPAttributes.from_stat(os.stat(local / name), name) for name in os.listdir(local)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path: str, flags: int, attr):
+        self.fake.request()
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            handle = paramiko.SFTPHandle(flags)
+            handle.readfile = open(self.fake.local_path(path), 'rb')
+            handle.filename = path
+            return handle
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def canonicalize(self, path: str) -> str:
+        return os.path.normpath('/' + path) if path not in ('', '.') else '/home/pi'
+
+
+class FakeSession(paramiko.ServerInterface):
+    def __init__(self, fake: 'FakeSshServer'):
+        self.fake = fake
+
+    def get_allowed_auths(self, username: str) -> str:
+        return 'password'
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if username == self.fake.user and password == self.fake.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel: paramiko.Channel, term: bytes, width: int, height: int,
+                                  pixelwidth: int, pixelheight: int, modes: bytes) -> bool:
+        return True
+
+    def check_channel_exec_request(self, channel: paramiko.Channel, command: bytes) -> bool:
+        threading.Thread(target=self.fake.execute, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+class FakeSshServer:
+    def __init__(self, root: Path, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 user: str = 'pi', password: str = '123'):
+        self.root = root
+        self.latency = latency
+        self.user = user
+        self.password = password
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.listener = socket.create_server((host, port))
+        self.host, self.port = self.listener.getsockname()[:2]
+        self.lock = threading.Lock()
+        self.transports: list[paramiko.Transport] = []
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self.lock:
+            self.bytes_received: int = 0
+            self.bytes_sent: int = 0
+            self.round_trips: int = 0
+            self.requests: int = 0
+            self.connections: int = 0
+            self.client_turn: bool = False
+
+    def count(self, size: int, from_client: bool):
+        with self.lock:
+            if from_client:
+                self.bytes_received += size
+                # a client chunk after the server has answered starts the next round trip
+                if not self.client_turn:
+                    self.round_trips += 1
+                    self.client_turn = True
+            else:
+                self.bytes_sent += size
+                self.client_turn = False
+
+    def request(self):
+        with self.lock:
+            self.requests += 1
+
+    def counters(self) -> dict:
+        with self.lock:
+            return {'round_trips': self.round_trips, 'requests': self.requests, 'connections': self.connections,
+                    'bytes_received': self.bytes_received, 'bytes_sent': self.bytes_sent}
+
+    def local_path(self, path: str) -> Path:
+        return self.root / os.path.normpath('/' + path).lstrip('/')
+
+    def start(self):
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            server_side, proxy_side = socket.socketpair()
+            LatencyPipe(client, proxy_side, self, from_client=True).start()
+            LatencyPipe(proxy_side, client, self, from_client=False).start()
+            transport = paramiko.Transport(server_side)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, FakeSftp)
+            session = FakeSession(self)
+            transport.start_server(server=session)
+            self.transports.append(transport)
+
+    def stop(self):
+        self.listener.close()
+        for transport in self.transports:
+            transport.close()
+
+    def execute(self, channel: paramiko.Channel, command: str):
+        self.request()
+        status, output = self.run_command(command)
+        channel.sendall(output.encode())
+        channel.send_exit_status(status)
+        # closing here could overtake the reply to the exec request, the client closes after the exit status
+        channel.shutdown_write()
+
+    def run_command(self, command: str) -> tuple[int, str]:
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            return 2, ''
+        if len(args) > 0 and args[0] == 'sudo':
+            args = args[1:]
+            while len(args) > 0 and args[0].startswith('-'):
+                option = args.pop(0)
+                if option in ('-p', '-u') and len(args) > 0:
+                    args.pop(0)
+        if len(args) == 2 and args[0] == 'cat':
+            try:
+                return 0, self.local_path(args[1]).read_text()
+            except OSError as e:
+                return 1, f'cat: {args[1]}: {e.strerror}\n'
+        if args[:3] == ['docker', 'container', 'ls']:
+            containers = json.loads((self.root / 'containers.json').read_text())
+            if '{{.Names}}' in args:
+                return 0, ''.join(f'{container["Names"]}\n' for container in containers)
+            return 0, ''.join(json.dumps(container) + '\n' for container in containers)
+        return 127, f'{args[0] if len(args) > 0 else command}: command not found\n'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='local ssh/sftp stand-in for the pi with a fake /docker tree')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2222)
+    parser.add_argument('--latency', type=float, default=0.0, help='round trip time in seconds')
+    parser.add_argument('--root', type=Path, help='fake root directory, a generated one if omitted')
+    arguments = parser.parse_args()
+    root = arguments.root or create_docker_tree(Path(tempfile.mkdtemp(prefix='fake-pi-')))
+    server = FakeSshServer(root, arguments.host, arguments.port, arguments.latency).start()
+    print(f'fake pi on {server.host}:{server.port} (user {server.user}, password {server.password}), root {root}')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,5 +1,9 @@
+import hashlib
 import json
 from dataclasses import dataclass
+from typing import Callable
+
+from PySide6 import QtCore
 
 
 @dataclass(frozen=True, slots=True)
@@ -20,6 +24,7 @@ class SensorDef:
     value_max: int | None = None
     value_step: float | None = None
     mode: str | None = None
+    value_template: str | None = None
 
 
 def generate_ha_discovery_payload(sensors: list[SensorDef], dev_id: str, dev_name: str, o_name: str, o_url: str,
@@ -57,5 +62,60 @@ def generate_ha_discovery_payload(sensors: list[SensorDef], dev_id: str, dev_nam
         if sensor.value_max: component['max'] = sensor.value_max  # max
         if sensor.value_step: component['step'] = sensor.value_step  # step
         if sensor.mode: component['mode'] = sensor.mode  # mode
+        if sensor.value_template: component['val_tpl'] = sensor.value_template  # value_template
         payload['cmps'][sensor.name] = component
     return json.dumps(payload)
+
+
+def generate_module_sensors(cell_count: int = 12) -> list[SensorDef]:
+    sensors: list[SensorDef] = []
+    for i in range(1, cell_count + 1):
+        sensors.append(SensorDef(f'cell_{i}_voltage', state_topic=f'cell/{i}/voltage', device_class='voltage', unit='V',
+                                 state_class='measurement', precision=3))
+    sensors += [
+        SensorDef('module_voltage', device_class='voltage', unit='V', state_class='measurement', precision=2),
+        SensorDef('module_temp_1', state_topic='module_temps', device_class='temperature', unit='°C',
+                  state_class='measurement', value_template="{{ value.split(',')[0] }}"),
+        SensorDef('module_temp_2', state_topic='module_temps', device_class='temperature', unit='°C',
+                  state_class='measurement', value_template="{{ value.split(',')[1] }}"),
+        SensorDef('chip_temp', device_class='temperature', unit='°C', state_class='measurement', precision=1),
+        SensorDef('pec15_error_count', state_class='total_increasing', entity_category='diagnostic'),
+    ]
+    return sensors
+
+
+class HaDiscoveryPublisher:
+    def __init__(self, publish: Callable[[str, str], None], parent: QtCore.QObject, interval_ms: int = 250):
+        self.publish = publish
+        self.signatures: dict[str, tuple] = {}
+        self.payloads: dict[str, str] = {}
+        self.hashes: dict[str, str] = {}
+        self.pending: dict[str, tuple[str, str]] = {}
+        self.published_count: int = 0
+        self.timer = QtCore.QTimer(parent)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.publish_next)
+
+    def update(self, dev_id: str, signature: tuple, topic: str, build: Callable[[], str]):
+        if self.signatures.get(dev_id) == signature:
+            return
+        self.signatures[dev_id] = signature
+        payload = build()
+        self.payloads[dev_id] = payload
+        payload_hash = hashlib.sha1(payload.encode()).hexdigest()
+        if self.hashes.get(dev_id) == payload_hash:
+            self.pending.pop(dev_id, None)
+            return
+        self.pending[dev_id] = (topic, payload)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def publish_next(self):
+        if len(self.pending) < 1:
+            self.timer.stop()
+            return
+        dev_id = next(iter(self.pending))
+        topic, payload = self.pending.pop(dev_id)
+        self.publish(topic, payload)
+        self.hashes[dev_id] = hashlib.sha1(payload.encode()).hexdigest()
+        self.published_count += 1
@@ -0,0 +1,219 @@
+import csv
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TextIO
+
+# levels with their bucket size in ms, raw samples are rolled up to 1 minute and those to 1 hour
+LEVELS: dict[str, int] = {'raw': 0, '1m': 60_000, '1h': 3_600_000}
+DEFAULT_RETENTION: dict[str, float] = {'raw': 2, '1m': 14, '1h': 365}
+DAY: int = 86_400_000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    module TEXT NOT NULL,
+    cell INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    UNIQUE (module, cell, metric)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1m (
+    series INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    mean REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1h (
+    series INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    mean REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, ts)
+) WITHOUT ROWID;
+-- the rollup and the retention delete select by time across all series
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE INDEX IF NOT EXISTS rollup_1m_ts ON rollup_1m (ts);
+CREATE INDEX IF NOT EXISTS rollup_1h_ts ON rollup_1h (ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def pick_level(start: int, end: int) -> str:
+    span = end - start
+    if span <= 6 * 3_600_000:
+        return 'raw'
+    if span <= 8 * DAY:
+        return '1m'
+    return '1h'
+
+
+class HistoryStore:
+    BATCH_SIZE: int = 5000
+    FLUSH_INTERVAL: float = 1.0
+    ROLLUP_INTERVAL: float = 60.0
+
+    def __init__(self, path: Path, retention: dict[str, float] | None = None):
+        self.path = path
+        self.retention: dict[str, float] = DEFAULT_RETENTION | (retention or {})
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.series: dict[tuple[str, int, str], int] = {}
+        self.written: int = 0
+        self.batches: int = 0
+        self.dropped: int = 0
+        self.last_rollup: float = 0
+        # oldest sample written since the last rollup, late or backfilled samples roll their buckets up again
+        self.dirty_since: int | None = None
+        self.local = threading.local()
+        with connect(path) as connection:
+            connection.executescript(SCHEMA)
+        self.thread = threading.Thread(target=self.run, name='history writer', daemon=True)
+        self.thread.start()
+
+    def add(self, module: str, cell: int, metric: str, value: float, ts: int | None = None):
+        # called from the gui thread, the writer thread resolves the series and inserts in batches
+        self.queue.put((module, cell, metric, value, ts if ts is not None else time.time_ns() // 1_000_000))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(10)
+
+    def run(self):
+        connection = connect(self.path)
+        for series_id, module, cell, metric in connection.execute('SELECT id, module, cell, metric FROM series'):
+            self.series[(module, cell, metric)] = series_id
+        running = True
+        while running:
+            batch: list[tuple] = []
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            try:
+                if len(batch) > 0:
+                    self.write(connection, batch)
+                if time.monotonic() - self.last_rollup > self.ROLLUP_INTERVAL or not running:
+                    self.rollup(connection)
+            except sqlite3.Error as e:
+                print('history store:', e)
+                self.dropped += len(batch)
+        connection.close()
+
+    def series_id(self, connection: sqlite3.Connection, key: tuple[str, int, str]) -> int:
+        series_id = self.series.get(key)
+        if series_id is None:
+            connection.execute('INSERT OR IGNORE INTO series (module, cell, metric) VALUES (?, ?, ?)', key)
+            series_id = connection.execute('SELECT id FROM series WHERE module = ? AND cell = ? AND metric = ?',
+                                           key).fetchone()[0]
+            self.series[key] = series_id
+        return series_id
+
+    def write(self, connection: sqlite3.Connection, batch: list[tuple]):
+        with connection:
+            rows = [(self.series_id(connection, (module, cell, metric)), ts, value)
+                    for module, cell, metric, value, ts in batch]
+            connection.executemany('INSERT OR REPLACE INTO samples (series, ts, value) VALUES (?, ?, ?)', rows)
+        oldest = min(row[1] for row in rows)
+        self.dirty_since = oldest if self.dirty_since is None else min(self.dirty_since, oldest)
+        self.written += len(rows)
+        self.batches += 1
+
+    def rollup(self, connection: sqlite3.Connection):
+        # only complete buckets are rolled up, the meta table remembers up to where
+        self.last_rollup = time.monotonic()
+        now = time.time_ns() // 1_000_000
+        dirty_since, self.dirty_since = self.dirty_since, None
+        with connection:
+            self.rollup_level(connection, 'rollup_1m', LEVELS['1m'], now, dirty_since,
+                              'SELECT series, ts / {size} * {size} AS bucket, min(value), max(value), avg(value), '
+                              'count(*) FROM samples WHERE ts >= ? AND ts < ? GROUP BY series, bucket')
+            self.rollup_level(connection, 'rollup_1h', LEVELS['1h'], now, dirty_since,
+                              'SELECT series, ts / {size} * {size} AS bucket, min(min), max(max), '
+                              'sum(mean * count) / sum(count), sum(count) FROM rollup_1m WHERE ts >= ? AND ts < ? '
+                              'GROUP BY series, bucket')
+            for level, table in (('raw', 'samples'), ('1m', 'rollup_1m'), ('1h', 'rollup_1h')):
+                connection.execute(f'DELETE FROM {table} WHERE ts < ?', (now - int(self.retention[level] * DAY),))
+
+    @staticmethod
+    def rollup_level(connection: sqlite3.Connection, table: str, size: int, now: int, dirty_since: int | None,
+                     select: str):
+        row = connection.execute('SELECT value FROM meta WHERE key = ?', (table,)).fetchone()
+        end = now // size * size
+        start = row[0] if row is not None else 0
+        if dirty_since is not None:
+            start = min(start, dirty_since // size * size)
+        if end <= start:
+            return
+        connection.execute(f'INSERT OR REPLACE INTO {table} (series, ts, min, max, mean, count) '
+                           f'{select.format(size=size)}', (start, end))
+        connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (table, end))
+
+    def reader(self) -> sqlite3.Connection:
+        # queries may come from any thread, each one gets its own connection
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = connect(self.path)
+        return connection
+
+    def modules(self) -> list[str]:
+        return [row[0] for row in self.reader().execute('SELECT DISTINCT module FROM series ORDER BY module')]
+
+    def metrics(self, module: str) -> list[str]:
+        return [row[0] for row in self.reader().execute(
+            'SELECT DISTINCT metric FROM series WHERE module = ? ORDER BY metric', (module,))]
+
+    def query(self, module: str, metric: str, start: int, end: int,
+              level: str | None = None) -> dict[int, list[tuple[int, float, float, float]]]:
+        # per cell: (ts, min, max, mean), raw samples have min = max = mean
+        level = level or pick_level(start, end)
+        if level == 'raw':
+            select = 'SELECT s.cell, v.ts, v.value, v.value, v.value FROM samples v'
+        else:
+            select = f'SELECT s.cell, v.ts, v.min, v.max, v.mean FROM rollup_{level} v'
+        result: dict[int, list[tuple[int, float, float, float]]] = {}
+        for cell, ts, minimum, maximum, mean in self.reader().execute(
+                f'{select} JOIN series s ON s.id = v.series WHERE s.module = ? AND s.metric = ? '
+                f'AND v.ts >= ? AND v.ts < ? ORDER BY s.cell, v.ts', (module, metric, start, end)):
+            result.setdefault(cell, []).append((ts, minimum, maximum, mean))
+        return result
+
+    def export_csv(self, file: TextIO, modules: list[str], metric: str, start: int, end: int,
+                   level: str | None = None) -> int:
+        writer = csv.writer(file)
+        writer.writerow(['module', 'cell', 'metric', 'time', 'min', 'max', 'mean'])
+        rows = 0
+        for module in modules:
+            for cell, samples in self.query(module, metric, start, end, level).items():
+                for ts, minimum, maximum, mean in samples:
+                    writer.writerow([module, cell, metric, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts / 1000)),
+                                     minimum, maximum, mean])
+                    rows += 1
+        return rows
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from PySide6 import QtCore
+from PySide6.QtWidgets import QComboBox, QDialog, QFileDialog, QHBoxLayout, QLabel, QPushButton, QScrollArea, \
+    QVBoxLayout, QWidget
+
+from history_store import HistoryStore
+from sparkline import SparklineGrid
+
+RANGES: dict[str, int] = {'1 hour': 3_600_000, '6 hours': 6 * 3_600_000, '1 day': 86_400_000,
+                          '7 days': 7 * 86_400_000, '30 days': 30 * 86_400_000, '1 year': 365 * 86_400_000}
+UNITS: dict[str, str] = {'voltage': 'V', 'module_voltage': 'V', 'chip_temp': '°C'}
+
+
+class HistoryDialog(QDialog):
+    def __init__(self, store: HistoryStore, signal: QtCore.SignalInstance, parent: QWidget | None = None):
+        super().__init__(parent)
+        self.store = store
+        self.signal = signal
+        self.generation: int = 0
+        self.setWindowTitle('history')
+        self.resize(760, 520)
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        self.module_box = QComboBox(self)
+        self.module_box.currentTextChanged.connect(self.update_metrics)
+        controls.addWidget(self.module_box)
+        self.metric_box = QComboBox(self)
+        self.metric_box.currentTextChanged.connect(self.refresh)
+        controls.addWidget(self.metric_box)
+        self.range_box = QComboBox(self)
+        self.range_box.addItems(list(RANGES))
+        self.range_box.currentTextChanged.connect(self.refresh)
+        controls.addWidget(self.range_box)
+        refresh_button = QPushButton('refresh', self)
+        refresh_button.clicked.connect(self.refresh)
+        controls.addWidget(refresh_button)
+        export_button = QPushButton('export csv', self)
+        export_button.clicked.connect(self.export)
+        controls.addWidget(export_button)
+        controls.addStretch(1)
+        layout.addLayout(controls)
+        self.status = QLabel(self)
+        layout.addWidget(self.status)
+        self.scroll = QScrollArea(self)
+        self.scroll.setWidgetResizable(True)
+        layout.addWidget(self.scroll)
+        self.charts = SparklineGrid(3)
+        self.scroll.setWidget(self.charts)
+        self.module_box.addItems(self.store.modules())
+
+    def update_metrics(self, module: str):
+        self.metric_box.blockSignals(True)
+        current = self.metric_box.currentText()
+        self.metric_box.clear()
+        self.metric_box.addItems(self.store.metrics(module))
+        if current in [self.metric_box.itemText(i) for i in range(self.metric_box.count())]:
+            self.metric_box.setCurrentText(current)
+        self.metric_box.blockSignals(False)
+        self.refresh()
+
+    def time_range(self) -> tuple[int, int]:
+        end = time.time_ns() // 1_000_000
+        return end - RANGES[self.range_box.currentText()], end
+
+    def refresh(self):
+        module, metric = self.module_box.currentText(), self.metric_box.currentText()
+        if len(module) < 1 or len(metric) < 1:
+            return
+        self.generation += 1
+        self.status.setText('loading...')
+        start, end = self.time_range()
+        threading.Thread(target=self.load, args=(module, metric, start, end, self.generation), daemon=True).start()
+
+    def load(self, module: str, metric: str, start: int, end: int, generation: int):
+        query_start = time.perf_counter()
+        result = self.store.query(module, metric, start, end)
+        self.signal.emit({'func': self.show_result,
+                          'arg': (generation, metric, result, time.perf_counter() - query_start)})
+
+    def show_result(self, arg: tuple):
+        generation, metric, result, duration = arg
+        if generation != self.generation:
+            return
+        # a fresh grid, the number of cells differs between metrics
+        self.charts = SparklineGrid(3)
+        unit = UNITS.get(metric, '')
+        for cell, samples in result.items():
+            key = str(cell)
+            self.charts.chart(key, metric if cell == 0 else f'cell {cell}', unit)
+            self.charts.set_series(key, [mean for _, _, _, mean in samples])
+        self.scroll.setWidget(self.charts)
+        points = sum(len(samples) for samples in result.values())
+        self.status.setText(f'{points} points in {duration * 1000:.0f} ms')
+
+    def export(self):
+        module, metric = self.module_box.currentText(), self.metric_box.currentText()
+        if len(module) < 1 or len(metric) < 1:
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, 'export csv', f'{module}_{metric}.csv', 'CSV (*.csv)')
+        if len(file_name) < 1:
+            return
+        start, end = self.time_range()
+        with open(file_name, 'w', newline='') as file:
+            rows = self.store.export_csv(file, [module], metric, start, end)
+        self.status.setText(f'{rows} rows exported to {file_name}')
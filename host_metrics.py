@@ -0,0 +1,213 @@
+import shlex
+import threading
+from collections import deque
+
+from PySide6 import QtCore
+from PySide6.QtWidgets import QDialog, QHBoxLayout, QLabel, QPushButton, QScrollArea, QSpinBox, QVBoxLayout
+
+from config_reader import ConfigReader
+from sparkline import SparklineGrid
+
+# one shell loop per stream: every interval it prints a compact block of tagged lines, 'docker stats' runs next to it
+# in streaming mode and its lines are interleaved with the 'D' tag
+SAMPLE_SCRIPT = '''
+sudo -n docker stats --format 'D {{{{.Name}}}} {{{{.CPUPerc}}}} {{{{.MemPerc}}}}' 2>/dev/null &
+trap 'kill $! 2>/dev/null' EXIT
+trap 'exit 1' HUP INT TERM
+while true; do
+  head -n 1 /proc/stat
+  grep -E '^(MemTotal|MemAvailable):' /proc/meminfo
+  for zone in /sys/class/thermal/thermal_zone*/temp; do [ -r "$zone" ] && echo "T $(cat "$zone")"; done
+  df -P / | awk 'NR == 2 {{print "F", $3, $2}}'
+  echo E
+  sleep {interval}
+done
+'''
+
+
+class HostSampleParser:
+    SAMPLES: int = 300
+
+    def __init__(self, samples: int = SAMPLES):
+        self.samples = samples
+        self.series: dict[str, deque[float]] = {}
+        self.last_cpu: tuple[int, int] | None = None
+        self.memory: dict[str, int] = {}
+        self.temperatures: list[float] = []
+        self.rest: bytes = b''
+
+    def append(self, key: str, value: float):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = deque(maxlen=self.samples)
+        series.append(value)
+
+    def feed(self, data: bytes) -> bool:
+        *lines, self.rest = (self.rest + data).split(b'\n')
+        if len(self.rest) > 4096:
+            self.rest = b''
+        changed = False
+        for line in lines:
+            changed |= self.parse_line(line.decode(errors='replace'))
+        return changed
+
+    def parse_line(self, line: str) -> bool:
+        # docker stats clears the screen with escape sequences before each refresh
+        fields = line.rsplit('\x1b[H', 1)[-1].split()
+        if len(fields) < 1:
+            return False
+        try:
+            tag = fields[0]
+            if tag == 'cpu':
+                ticks = [int(value) for value in fields[1:]]
+                idle = ticks[3] + (ticks[4] if len(ticks) > 4 else 0)
+                total = sum(ticks[:8])
+                if self.last_cpu is not None and total > self.last_cpu[1]:
+                    busy = 1 - (idle - self.last_cpu[0]) / (total - self.last_cpu[1])
+                    self.append('cpu', 100 * busy)
+                self.last_cpu = (idle, total)
+            elif tag in ('MemTotal:', 'MemAvailable:'):
+                self.memory[tag] = int(fields[1])
+            elif tag == 'T':
+                self.temperatures.append(int(fields[1]) / 1000)
+            elif tag == 'F':
+                used, size = int(fields[1]), int(fields[2])
+                if size > 0:
+                    self.append('disk', 100 * used / size)
+            elif tag == 'D' and len(fields) >= 4:
+                name = fields[1]
+                self.append(f'docker/{name}/cpu', float(fields[2].rstrip('%')))
+                self.append(f'docker/{name}/memory', float(fields[3].rstrip('%')))
+                return True
+            elif tag == 'E':
+                total = self.memory.get('MemTotal:', 0)
+                if total > 0 and 'MemAvailable:' in self.memory:
+                    self.append('memory', 100 * (total - self.memory['MemAvailable:']) / total)
+                if len(self.temperatures) > 0:
+                    self.append('temperature', max(self.temperatures))
+                self.memory.clear()
+                self.temperatures.clear()
+                return True
+        except (ValueError, IndexError):
+            pass
+        return False
+
+
+class HostMetrics(ConfigReader):
+    CHARTS: dict[str, tuple[str, str, float | None, float | None]] = {
+        'cpu': ('cpu', '%', 0, 100),
+        'memory': ('memory', '%', 0, 100),
+        'disk': ('disk /', '%', 0, 100),
+        'temperature': ('temperature', '°C', None, None),
+    }
+
+    def __init__(self, config: dict):
+        super().__init__(config, 'host_metrics')
+        self.parser = HostSampleParser()
+        self.lock = threading.Lock()
+        self.changed: bool = False
+        self.channel = None
+        self.generation: int = 0
+        self.dialog: QDialog | None = None
+
+    def init_queue(self):
+        self.put({'func': self.button.setEnabled, 'type': 'signal', 'arg': True})
+
+    def button_pressed(self):
+        if self.dialog is None:
+            self.create_dialog()
+        self.dialog.show()
+        self.dialog.raise_()
+        if self.channel is None:
+            self.start()
+
+    def create_dialog(self):
+        self.dialog = QDialog()
+        self.dialog.setWindowTitle('host metrics')
+        self.dialog.resize(760, 420)
+        self.dialog.finished.connect(self.stop)
+        layout = QVBoxLayout(self.dialog)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel('interval [s]', self.dialog))
+        self.interval_box = QSpinBox(self.dialog)
+        self.interval_box.setRange(1, 60)
+        self.interval_box.setValue(2)
+        controls.addWidget(self.interval_box)
+        self.start_button = QPushButton('start', self.dialog)
+        self.start_button.clicked.connect(self.start_stop)
+        controls.addWidget(self.start_button)
+        controls.addStretch(1)
+        layout.addLayout(controls)
+        self.charts = SparklineGrid(3)
+        for key, (title, unit, minimum, maximum) in self.CHARTS.items():
+            self.charts.chart(key, title, unit, minimum, maximum)
+        scroll = QScrollArea(self.dialog)
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(self.charts)
+        layout.addWidget(scroll)
+
+        self.redraw_timer = QtCore.QTimer(self.dialog)
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.redraw_timer.start(250)
+
+    def start_stop(self):
+        if self.channel is not None:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self):
+        self.generation += 1
+        with self.lock:
+            self.parser = HostSampleParser()
+            self.changed = True
+        self.start_button.setText('stop')
+        threading.Thread(target=self.stream, args=(self.interval_box.value(), self.generation), daemon=True).start()
+
+    def stop(self):
+        self.generation += 1
+        channel, self.channel = self.channel, None
+        if channel is not None:
+            channel.close()
+        if self.dialog is not None:
+            self.start_button.setText('start')
+
+    def stream(self, interval: int, generation: int):
+        try:
+            self.c.open()
+            channel = self.c.client.get_transport().open_session()
+            # the hangup on close ends the script through its trap, and docker stats with it
+            channel.get_pty()
+            channel.exec_command(f'sh -c {shlex.quote(SAMPLE_SCRIPT.format(interval=interval))}')
+        except Exception as e:
+            self.signal.emit({'func': self.status_bar.showMessage, 'arg': f'host metrics: {e}'})
+            self.signal.emit({'func': self.stop})
+            return
+        if generation != self.generation:
+            channel.close()
+            return
+        self.channel = channel
+        while generation == self.generation:
+            try:
+                data = channel.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            with self.lock:
+                self.changed |= self.parser.feed(data)
+        channel.close()
+        if generation == self.generation:
+            self.signal.emit({'func': self.stop})
+
+    def redraw(self):
+        with self.lock:
+            if not self.changed:
+                return
+            self.changed = False
+            series = {key: list(values) for key, values in self.parser.series.items()}
+        for key, values in series.items():
+            if key.startswith('docker/'):
+                _, name, kind = key.split('/')
+                self.charts.chart(key, f'{name} {kind}', '%', 0, None)
+            self.charts.set_series(key, values)
@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from typing import Hashable
+
+from diagnostics import Metrics
+
+PRIORITY_USER: int = 0
+PRIORITY_BACKGROUND: int = 10
+
+
+class Job:
+    __slots__ = ('work', 'priority', 'key', 'group', 'timeout', 'after', 'created', 'cancelled')
+
+    def __init__(self, work: dict):
+        self.work = work
+        self.priority: int = work.get('priority', PRIORITY_BACKGROUND)
+        self.key: Hashable | None = work.get('key')
+        self.group: str | None = work.get('group')
+        self.timeout: float | None = work.get('timeout')
+        self.after: Hashable | None = work.get('after')
+        self.created: float = time.perf_counter()
+        self.cancelled: bool = False
+
+    def name(self) -> str:
+        func = self.work['func']
+        return getattr(func, '__qualname__', repr(func))
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class JobQueue:
+    # work items are the {'func', 'type', 'arg'} dicts used before, with optional 'priority' (lower runs first),
+    # 'key' (an identical pending key is coalesced), 'group' (for cancel), 'timeout' (seconds for ssh jobs) and 'after'
+    # (the key of the job whose results it reads, it is skipped unless that job's last run succeeded)
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.heap: list[tuple[int, int, Job]] = []
+        self.pending_keys: dict[Hashable, Job] = {}
+        self.counter = itertools.count()
+        self.metrics = Metrics()
+        self.running: Job | None = None
+        # last state per job key, and the threads of timed out jobs per group that may still use its connection
+        self.states: dict[Hashable, str] = {}
+        self.abandoned: dict[str, threading.Thread] = {}
+
+    def put(self, work: dict) -> Job:
+        job = Job(work)
+        with self.lock:
+            if job.key is not None:
+                pending = self.pending_keys.get(job.key)
+                if pending is not None:
+                    self.metrics.count('jobs', f'job="{job.name()}",state="coalesced"')
+                    if job.priority >= pending.priority:
+                        return pending
+                    pending.cancelled = True
+                self.pending_keys[job.key] = job
+            heapq.heappush(self.heap, (job.priority, next(self.counter), job))
+            self.metrics.set_gauge('jobs_pending', len(self.heap))
+            self.lock.notify()
+        return job
+
+    def promote(self, key: Hashable, priority: int) -> bool:
+        with self.lock:
+            pending = self.pending_keys.get(key)
+            if pending is None or pending.priority <= priority:
+                return False
+            # still under the lock, so the worker can't take the old job in between and run it twice
+            self.put(pending.work | {'priority': priority})
+            return True
+
+    def get(self) -> Job:
+        with self.lock:
+            while True:
+                while len(self.heap) < 1:
+                    self.lock.wait()
+                _, _, job = heapq.heappop(self.heap)
+                self.metrics.set_gauge('jobs_pending', len(self.heap))
+                if job.key is not None and self.pending_keys.get(job.key) is job:
+                    del self.pending_keys[job.key]
+                if not job.cancelled and not self.skip(job):
+                    self.running = job
+                    self.metrics.observe('job_wait', time.perf_counter() - job.created, f'job="{job.name()}"')
+                    return job
+
+    def skip(self, job: Job) -> bool:
+        # called with the lock held
+        if job.after is not None and self.states.get(job.after, 'done') != 'done':
+            reason = self.states[job.after]
+        elif job.work.get('type') == 'ssh' and job.group in self.abandoned:
+            if not self.abandoned[job.group].is_alive():
+                del self.abandoned[job.group]
+                return False
+            reason = 'busy'
+        else:
+            return False
+        print(f'job {job.name()} skipped, {reason}')
+        if job.key is not None:
+            self.states[job.key] = 'skipped'
+        self.metrics.count('jobs', f'job="{job.name()}",state="skipped"')
+        return True
+
+    def cancel(self, group: str | None = None, job_type: str | None = None) -> int:
+        cancelled: int = 0
+        with self.lock:
+            for _, _, job in self.heap:
+                if job.cancelled or (group is not None and job.group != group):
+                    continue
+                if job_type is not None and job.work.get('type') != job_type:
+                    continue
+                job.cancelled = True
+                cancelled += 1
+                self.metrics.count('jobs', f'job="{job.name()}",state="cancelled"')
+        return cancelled
+
+    @staticmethod
+    def call(job: Job) -> str:
+        try:
+            job.work['func']()
+        except Exception:
+            traceback.print_exc()
+            return 'error'
+        return 'done'
+
+    def run(self, job: Job):
+        start = time.perf_counter()
+        if job.timeout is None:
+            state = self.call(job)
+        else:
+            # the ssh call can't be interrupted, a job over its timeout is abandoned so the queue keeps moving
+            states: list[str] = []
+            thread = threading.Thread(target=lambda: states.append(self.call(job)), daemon=True)
+            thread.start()
+            thread.join(job.timeout)
+            if thread.is_alive():
+                print(f'job {job.name()} timed out after {job.timeout} s')
+                state = 'timeout'
+            else:
+                state = states[0]
+        with self.lock:
+            if state == 'timeout' and job.group is not None:
+                self.abandoned[job.group] = thread
+            if job.key is not None:
+                self.states[job.key] = state
+            self.metrics.observe('job_run', time.perf_counter() - start, f'job="{job.name()}"')
+            self.metrics.count('jobs', f'job="{job.name()}",state="{state}"')
+
+    def task_done(self, job: Job):
+        with self.lock:
+            if self.running is job:
+                self.running = None
+
+    def empty(self) -> bool:
+        with self.lock:
+            return all(job.cancelled for _, _, job in self.heap)
+
+    def rows(self) -> list[tuple[str, str]]:
+        with self.lock:
+            self.metrics.update_rates()
+            return self.metrics.rows()
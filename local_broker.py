@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import struct
+
+# minimal mqtt 3.1.1 broker for local testing: qos 0/1, retained messages, + and # wildcards, no auth, no persistence.
+# mqtt 5 clients get the subset mqtt live uses: subscription identifiers and topic aliases, other properties are ignored
+# (--v311-only answers them like a plain 3.1.1 broker does)
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+RECEIVE_MAXIMUM, TOPIC_ALIAS_MAXIMUM, TOPIC_ALIAS = 0x21, 0x22, 0x23
+SUBSCRIPTION_IDENTIFIER, SUBSCRIPTION_IDENTIFIER_AVAILABLE = 0x0b, 0x29
+ALIAS_MAXIMUM = 16
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_parts = topic_filter.split('/')
+    topic_parts = topic.split('/')
+    for i, part in enumerate(filter_parts):
+        if part == '#':
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != '+' and part != topic_parts[i]:
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+def encode_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length > 0 else byte)
+        if length == 0:
+            return bytes(encoded)
+
+
+def decode_length(data: bytes, offset: int) -> tuple[int, int]:
+    # returns the value and the offset after it
+    value, multiplier = 0, 1
+    while True:
+        byte = data[offset]
+        offset += 1
+        value += (byte & 0x7f) * multiplier
+        multiplier *= 128
+        if byte & 0x80 == 0:
+            return value, offset
+
+
+def read_properties(data: bytes, offset: int) -> tuple[dict[int, int], int]:
+    # only the integer properties used here are decoded, the others are skipped
+    length, offset = decode_length(data, offset)
+    end = offset + length
+    properties: dict[int, int] = {}
+    while offset < end:
+        identifier = data[offset]
+        offset += 1
+        if identifier == SUBSCRIPTION_IDENTIFIER:
+            properties[identifier], offset = decode_length(data, offset)
+        elif identifier in (TOPIC_ALIAS, RECEIVE_MAXIMUM, TOPIC_ALIAS_MAXIMUM, 0x13):
+            properties[identifier] = struct.unpack_from('!H', data, offset)[0]
+            offset += 2
+        elif identifier in (0x02, 0x11, 0x18, 0x27):
+            properties[identifier] = struct.unpack_from('!I', data, offset)[0]
+            offset += 4
+        elif identifier in (0x01, 0x17, 0x19, 0x24, 0x25, 0x28, 0x29, 0x2a):
+            properties[identifier] = data[offset]
+            offset += 1
+        else:
+            break
+    return properties, end
+
+
+def packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+def encode_string(value: bytes) -> bytes:
+    return struct.pack('!H', len(value)) + value
+
+
+def publish_packet(topic: str, payload: bytes, retain: bool = False, version: int = 4,
+                   subscription_ids: list[int] | None = None) -> bytes:
+    if version < 5:
+        return packet(PUBLISH, int(retain), encode_string(topic.encode()) + payload)
+    properties = b''.join(bytes([SUBSCRIPTION_IDENTIFIER]) + encode_length(subscription_id)
+                          for subscription_id in subscription_ids or [])
+    return packet(PUBLISH, int(retain), encode_string(topic.encode()) + encode_length(len(properties)) + properties +
+                  payload)
+
+
+class Session:
+    def __init__(self, broker: 'LocalBroker', reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        # topic filter -> mqtt 5 subscription identifier
+        self.subscriptions: dict[str, int | None] = {}
+        self.version: int = 4
+        self.aliases: dict[int, str] = {}
+
+    async def read_packet(self) -> tuple[int, int, bytes]:
+        header = (await self.reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = (await self.reader.readexactly(1))[0]
+            length += (byte & 0x7f) * multiplier
+            multiplier *= 128
+            if byte & 0x80 == 0:
+                break
+        return header >> 4, header & 0x0f, await self.reader.readexactly(length)
+
+    def send(self, data: bytes):
+        self.broker.bytes_sent += len(data)
+        self.writer.write(data)
+
+    async def run(self):
+        try:
+            while True:
+                packet_type, flags, body = await self.read_packet()
+                self.broker.bytes_received += len(body) + 2
+                if packet_type == CONNECT:
+                    self.handle_connect(body)
+                elif packet_type == PUBLISH:
+                    self.handle_publish(flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self.handle_subscribe(body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.handle_unsubscribe(body)
+                elif packet_type == PINGREQ:
+                    self.send(packet(PINGRESP, 0, b''))
+                elif packet_type == DISCONNECT:
+                    break
+                await self.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.broker.sessions.discard(self)
+            self.writer.close()
+
+    def handle_connect(self, body: bytes):
+        # protocol name 'MQTT' then the level, 4 for 3.1.1 and 5 for mqtt 5
+        version = body[6]
+        if version == 5 and self.broker.v311_only:
+            self.send(packet(CONNACK, 0, b'\x00\x01'))
+            raise ConnectionError('unsupported protocol version')
+        self.version = version
+        if self.version < 5:
+            self.send(packet(CONNACK, 0, b'\x00\x00'))
+            return
+        properties = struct.pack('!BHBB', TOPIC_ALIAS_MAXIMUM, ALIAS_MAXIMUM, SUBSCRIPTION_IDENTIFIER_AVAILABLE, 1)
+        self.send(packet(CONNACK, 0, b'\x00\x00' + encode_length(len(properties)) + properties))
+
+    def handle_publish(self, flags: int, body: bytes):
+        qos = flags >> 1 & 3
+        retain = bool(flags & 1)
+        topic_length = struct.unpack_from('!H', body)[0]
+        topic = body[2:2 + topic_length].decode()
+        offset = 2 + topic_length
+        if qos > 0:
+            self.send(packet(PUBACK, 0, body[offset:offset + 2]))
+            offset += 2
+        if self.version >= 5:
+            properties, offset = read_properties(body, offset)
+            alias = properties.get(TOPIC_ALIAS)
+            if alias is not None:
+                if len(topic) > 0:
+                    self.aliases[alias] = topic
+                else:
+                    topic = self.aliases.get(alias, '')
+            self.broker.aliased += int(alias is not None and topic_length == 0)
+        self.broker.publish(topic, body[offset:], retain)
+
+    def handle_subscribe(self, body: bytes):
+        packet_id = body[:2]
+        offset = 2
+        subscription_id: int | None = None
+        if self.version >= 5:
+            properties, offset = read_properties(body, offset)
+            subscription_id = properties.get(SUBSCRIPTION_IDENTIFIER)
+        granted = bytearray()
+        while offset < len(body):
+            length = struct.unpack_from('!H', body, offset)[0]
+            topic_filter = body[offset + 2:offset + 2 + length].decode()
+            offset += 2 + length + 1
+            self.subscriptions[topic_filter] = subscription_id
+            granted.append(0)
+            for topic, payload in self.broker.retained.items():
+                if topic_matches(topic_filter, topic):
+                    self.send(publish_packet(topic, payload, True, self.version,
+                                             [subscription_id] if subscription_id is not None else None))
+        properties = b'\x00' if self.version >= 5 else b''
+        self.send(packet(SUBACK, 0, packet_id + properties + bytes(granted)))
+
+    def handle_unsubscribe(self, body: bytes):
+        offset = 2
+        if self.version >= 5:
+            offset = read_properties(body, offset)[1]
+        count = 0
+        while offset < len(body):
+            length = struct.unpack_from('!H', body, offset)[0]
+            self.subscriptions.pop(body[offset + 2:offset + 2 + length].decode(), None)
+            offset += 2 + length
+            count += 1
+        self.send(packet(UNSUBACK, 0, body[:2] + (b'\x00' + bytes(count) if self.version >= 5 else b'')))
+
+
+class LocalBroker:
+    def __init__(self, v311_only: bool = False):
+        self.v311_only = v311_only
+        self.sessions: set[Session] = set()
+        self.retained: dict[str, bytes] = {}
+        self.bytes_sent: int = 0
+        self.bytes_received: int = 0
+        self.aliased: int = 0
+        self.server: asyncio.Server | None = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 1883):
+        self.server = await asyncio.start_server(self.accept, host, port)
+
+    async def accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = Session(self, reader, writer)
+        self.sessions.add(session)
+        await session.run()
+
+    def publish(self, topic: str, payload: bytes, retain: bool = False):
+        if retain:
+            if len(payload) > 0:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        data = publish_packet(topic, payload)
+        for session in list(self.sessions):
+            matches = [subscription_id for topic_filter, subscription_id in session.subscriptions.items()
+                       if topic_matches(topic_filter, topic)]
+            if len(matches) < 1:
+                continue
+            if session.version < 5:
+                session.send(data)
+            else:
+                subscription_ids = [subscription_id for subscription_id in matches if subscription_id is not None]
+                session.send(publish_packet(topic, payload, False, session.version, subscription_ids))
+
+
+async def main(host: str, port: int, v311_only: bool = False):
+    broker = LocalBroker(v311_only)
+    await broker.start(host, port)
+    print(f'local broker listening on {host}:{port}')
+    await broker.server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='minimal local mqtt broker for testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--v311-only', action='store_true', help='refuse mqtt 5 connects like a 3.1.1 broker')
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.v311_only))
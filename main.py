@@ -1,5 +1,4 @@
 import os
-import queue
 import sys
 import threading
 from pathlib import Path
@@ -7,16 +6,23 @@ from pathlib import Path
 from fabric import Connection
 from PySide6 import QtCore, QtWidgets
 
+import profiler
 from config_reader import ConfigReader
+from container_logs import ContainerLogs
 from credentials import Credentials
 from custom_signal_window import CustomSignalWindow
+from diagnostics import DiagnosticsDock
 from docker_container import DockerContainer
+from host_metrics import HostMetrics
+from job_queue import JobQueue
 from modbus import Modbus
+from mqtt_hub import MqttHub
 from mqtt_live import MqttLiveWindow
 from settings_dialog import SettingsDialog
 from slave_mapping import SlaveMapping
 from ui.main import Ui_MainWindow
 from utils import get_config_local, save_config_local
+from utils_qt import exec_app
 
 CONFIG_FILE = Path('config.yaml')
 
@@ -32,8 +38,20 @@ class MainWindow(Ui_MainWindow):
 
         self.actionconfig.triggered.connect(self.show_settings_dialog)
         self.actionmqtt_live.triggered.connect(self.show_mqtt_live)
-
-        self.queue = queue.Queue()
+        self.actionwrite_profile.triggered.connect(profiler.write_profile)
+        self.actionwrite_profile.setVisible(profiler.active_profiler is not None)
+
+        self.queue = JobQueue()
+        # all mqtt live windows of the same broker share one connection
+        self.mqtt_hub = MqttHub(self.main_window.signal)
+        self.diagnostics_dock = DiagnosticsDock(self.queue.rows, self.main_window)
+        self.main_window.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, self.diagnostics_dock)
+        self.diagnostics_dock.hide()
+        self.actiondiagnostics.toggled.connect(self.diagnostics_dock.setVisible)
+        self.diagnostics_dock.visibilityChanged.connect(self.actiondiagnostics.setChecked)
+        diagnostics_timer = QtCore.QTimer(self.main_window)
+        diagnostics_timer.timeout.connect(self.diagnostics_dock.refresh)
+        diagnostics_timer.start(1000)
 
         self.config: dict = get_config_local(CONFIG_FILE)
         if 'error' in self.config:
@@ -58,6 +76,8 @@ class MainWindow(Ui_MainWindow):
         self.reader_list: dict[str, ConfigReader] = {
             'credentials': Credentials(self.reader_config),
             'docker': DockerContainer(self.reader_config),
+            'container_logs': ContainerLogs(self.reader_config),
+            'host_metrics': HostMetrics(self.reader_config),
             'slave_mapping': SlaveMapping(self.reader_config),
             'modbus': Modbus(self.reader_config)
         }
@@ -67,7 +87,7 @@ class MainWindow(Ui_MainWindow):
 
     def show(self):
         self.main_window.show()
-        sys.exit(self.app.exec_())
+        sys.exit(exec_app())
 
     def show_mqtt_live(self):
         store = self.reader_list['credentials'].store
@@ -75,7 +95,7 @@ class MainWindow(Ui_MainWindow):
         parameters['host'] = self.config['host']
         parameters['username'] = store['mqtt_user']
         parameters['password'] = store['mqtt_password']
-        w = MqttLiveWindow(parameters, as_app=False)
+        w = MqttLiveWindow(parameters, as_app=False, transport=self.mqtt_hub.client(parameters))
         w.show()
 
     def get_connection(self):
@@ -95,16 +115,18 @@ class MainWindow(Ui_MainWindow):
             self.reader_config['c'] = self.get_connection()
             for key in self.reader_list:
                 self.reader_list[key].set_connection()
+            # work queued for the old connection is stale, the new one starts with a fresh refresh
+            self.queue.cancel()
             self.init_queue()
 
     def worker(self):
         while True:
-            work = self.queue.get()
-            if work['type'] == 'ssh':
-                work['func']()
-            elif work['type'] == 'signal':
-                self.main_window.signal.emit(work)
-            self.queue.task_done()
+            job = self.queue.get()
+            if job.work['type'] == 'ssh':
+                self.queue.run(job)
+            elif job.work['type'] == 'signal':
+                self.main_window.signal.emit(job.work)
+            self.queue.task_done(job)
 
     def autosize_window(self):
         def resize_width():
@@ -122,6 +144,7 @@ class MainWindow(Ui_MainWindow):
 if __name__ == '__main__':
     script_dir = os.path.dirname(os.path.realpath(__file__))
 
+    profiler.start_profiler(sys.argv, 'main')
     app = QtWidgets.QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
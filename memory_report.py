@@ -0,0 +1,48 @@
+import gc
+import os
+import sys
+from collections import Counter
+
+
+def rss_bytes() -> int | None:
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on linux and bytes on macos
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+        return None
+
+
+def object_counts(limit: int = 15) -> list[tuple[str, int]]:
+    counts: Counter = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return counts.most_common(limit)
+
+
+def deep_size(obj, seen: set[int] | None = None, depth: int = 3) -> int:
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen, depth - 1) + deep_size(value, seen, depth - 1) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen, depth - 1) for item in obj)
+    return size
+
+
+def format_bytes(value: int | None) -> str:
+    if value is None:
+        return 'n/a'
+    for unit in ('B', 'KiB', 'MiB'):
+        if value < 1024:
+            return f'{value:.0f} {unit}'
+        value /= 1024
+    return f'{value:.1f} GiB'
@@ -1,32 +1,41 @@
 import statistics
 import time
 
-import paho.mqtt.client as mqtt
-from PySide6 import QtWidgets
+from PySide6 import QtCore, QtWidgets
 
 from cell import Cell
+from memory_report import deep_size
 from module_widget import ModuleWidget
-from utils_qt import exchange_widget_positions
+from mqtt_topics import MODULE_TOPICS
+from mqtt_transport import MqttTransport
+from utils_qt import exchange_widget_positions, GridModel
+
+
+class ModuleTombstone:
+    __slots__ = ('identifier', 'snapshot', 'reason', 'evicted')
+
+    def __init__(self, identifier: str, snapshot: dict, reason: str):
+        self.identifier = identifier
+        self.snapshot = snapshot
+        self.reason = reason
+        self.evicted: float = time.monotonic()
 
 
 class Module:
-    TOPICS: list = [
-        'available',
+    TOPICS: list = MODULE_TOPICS
+    SNAPSHOT_TOPICS: list = [
         'build_timestamp',
         'chip_temp',
         'module_temps',
-        'module_topic',
         'module_voltage',
         'pec15_error_count',
-        'total_system_current',
-        'total_system_voltage',
         'uptime'
     ]
+    STALE_STYLE: str = 'color: grey;'
 
-    def __init__(self, identifier: str, parent: QtWidgets.QWidget, grid_layout: QtWidgets.QGridLayout,
-                 mqtt_client: mqtt.Client):
+    def __init__(self, identifier: str, parent: QtWidgets.QWidget, grid_model: GridModel, mqtt_client: MqttTransport):
         self.identifier = identifier
-        self.grid_layout = grid_layout
+        self.grid_model = grid_model
         self.mqtt_client = mqtt_client
         self.mac = None
         self.hidden = False
@@ -36,7 +45,9 @@ class Module:
         self.cell_median_voltage: float = 0.0
         self.cell_sum_voltage: float = 0.0
         self.uptime: int = 0
-        self.last_uptime: float = time.time()
+        self.values: dict[str, str] = {}
+        self.stale: bool = False
+        self.last_seen: float = time.monotonic()
 
         self.widget: ModuleWidget = ModuleWidget(parent)
         self.widget.on_drop.connect(self.module_dragged)
@@ -66,14 +77,14 @@ class Module:
         return len(self.identifier) == 12
 
     def restart(self):
-        self.mqtt_client.publish(f'esp-module/{self.identifier}/restart', 1)
+        self.mqtt_client.publish(f'esp-module/{self.identifier}/restart', 1, alias=True)
 
     def drag_start(self, infos: dict):
-        self.mqtt_client.publish(f'esp-module/{self.get_topic()}/blink', 1)
+        self.mqtt_client.publish(f'esp-module/{self.get_topic()}/blink', 1, alias=True)
         print(self.get_topic())
 
     def module_dragged(self, infos: dict):
-        exchange_widget_positions(self.grid_layout, self.widget, infos['widget'])
+        exchange_widget_positions(self.grid_model.grid_layout, self.widget, infos['widget'], self.grid_model)
 
     def get_topic(self):
         if self.mac is not None:
@@ -142,6 +153,24 @@ class Module:
         self.cells[number].voltage = voltage
         self.refresh_cell_text(number)
         self.header.setText(f'{self.get_title()}: {self.get_mean_soc():.1f} %')
+        self.restyle_cells()
+
+    def update_cells(self, voltages: list[float | None], balancing_mask: int | None):
+        for i, voltage in enumerate(voltages[:len(self.cells)]):
+            cell: Cell = self.cells[i + 1]
+            if voltage is not None:
+                cell.voltage = voltage
+            elif cell.voltage is None:
+                continue
+            if balancing_mask is not None:
+                cell.is_balancing = bool(balancing_mask >> i & 1)
+            self.refresh_cell_text(i + 1)
+        if all(cell.voltage is None for cell in self.cells.values()):
+            return
+        self.header.setText(f'{self.get_title()}: {self.get_mean_soc():.1f} %')
+        self.restyle_cells()
+
+    def restyle_cells(self):
         self.cell_median_voltage: float = self.get_median_voltage()
         for cell_number in self.cells:
             current_cell = self.cells[cell_number]
@@ -187,7 +216,6 @@ class Module:
 
     def update_uptime(self, uptime: int):
         self.uptime = uptime
-        self.last_uptime = time.time()
         self.uptime_label.setText(f'{self.uptime}')
         if self.available == 'online':
             self.widget.setStyleSheet('')
@@ -195,7 +223,80 @@ class Module:
     def update_pec15(self, pec15: int):
         self.pec15_label.setText(f'pec15: {pec15}')
 
-    def check_uptime(self):
-        if self.available == 'online':
-            if time.time() - self.last_uptime > 3:
+    def mark_stale(self, group: str):
+        if group == 'uptime':
+            if self.available == 'online' and not self.stale:
                 self.widget.setStyleSheet('background-color: #ff8c1a; color: #202124;')
+        elif group == 'voltages':
+            for cell_number in self.cells:
+                self.cells[cell_number].label.setStyleSheet(self.STALE_STYLE)
+        elif group == 'temps':
+            self.chip_temp.setStyleSheet(self.STALE_STYLE)
+            self.module_temps.setStyleSheet(self.STALE_STYLE)
+
+    def mark_fresh(self, group: str):
+        # uptime, cell voltages and chip temp restyle themselves when the new value is applied
+        if group == 'temps':
+            self.module_temps.setStyleSheet('')
+
+    def to_snapshot(self) -> dict:
+        return {
+            'mac': self.mac,
+            'number': self.number,
+            'hidden': self.hidden,
+            'available': self.available,
+            'values': self.values,
+            'cells': {number: [cell.voltage, cell.is_balancing] for number, cell in self.cells.items()
+                      if cell.voltage is not None},
+        }
+
+    def release(self):
+        self.widget.hide()
+        self.widget.setParent(None)
+        self.widget.deleteLater()
+        self.cells.clear()
+
+    def footprint(self) -> tuple[int, int]:
+        # (qt objects owned by the widget, approximate python bytes)
+        qobjects = len(self.widget.findChildren(QtCore.QObject)) + 1
+        seen: set[int] = set()
+        python_bytes = deep_size(self.__dict__, seen)
+        python_bytes += sum(deep_size(cell.__dict__, seen) for cell in self.cells.values())
+        return qobjects, python_bytes
+
+    def restore_snapshot(self, snapshot: dict):
+        self.mac = snapshot.get('mac')
+        self.number = snapshot.get('number')
+        self.hidden = snapshot.get('hidden', False)
+        self.available = snapshot.get('available')
+        self.values = snapshot.get('values', {})
+        self.header.setText(self.get_title())
+        last_number = None
+        for number, (voltage, is_balancing) in snapshot.get('cells', {}).items():
+            last_number = int(number)
+            self.cells[last_number].voltage = voltage
+            self.cells[last_number].is_balancing = is_balancing
+            self.refresh_cell_text(last_number)
+        if last_number is not None:
+            self.update_cell_voltage(last_number, self.cells[last_number].voltage)
+        if 'chip_temp' in self.values:
+            self.update_chip_temp(self.values['chip_temp'])
+        if 'module_temps' in self.values:
+            self.module_temps.setText(self.values['module_temps'])
+        if 'module_voltage' in self.values:
+            self.update_voltage(self.values['module_voltage'])
+        if 'uptime' in self.values:
+            self.uptime_label.setText(self.values['uptime'])
+        if 'pec15_error_count' in self.values:
+            self.update_pec15(int(self.values['pec15_error_count']))
+        if 'build_timestamp' in self.values:
+            self.build_timestamp_label.setText(self.values['build_timestamp'])
+        self.stale = True
+        self.widget.setStyleSheet(self.STALE_STYLE)
+
+    def confirm_live(self):
+        self.stale = False
+        if self.available is None:
+            self.widget.setStyleSheet('')
+        else:
+            self.update_available(self.available)
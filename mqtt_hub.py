@@ -0,0 +1,294 @@
+import uuid
+from typing import Callable
+
+from PySide6 import QtCore
+
+import mqtt_topics
+from mqtt_transport import create_transport, MqttTransport, PublishAck
+
+DecodedCallback = Callable[[str, tuple | None, bytes], None]
+
+
+class HubClient:
+    # what a view sees of the shared connection, used like a MqttTransport
+    def __init__(self, hub: 'MqttHub', key: tuple, parameters: dict):
+        self.hub = hub
+        self.key = key
+        # kept after the hub closed the connection, a closed view still reads its counters
+        self.transport: MqttTransport = hub.transports[key]
+        self.mqtt_prefix: str = parameters.get('mqtt_prefix', '')
+        if len(self.mqtt_prefix) > 0 and not self.mqtt_prefix.endswith('/'):
+            self.mqtt_prefix = f'{self.mqtt_prefix}/'
+        self.on_connect: Callable[[], None] | None = None
+        self.on_decoded: DecodedCallback | None = None
+        # decoded events the view did not subscribe to but another view did, None takes everything
+        self.accepts: Callable[[tuple | None], bool] | None = None
+        self.filters: set[str] = set()
+        self.active: bool = False
+        # retained messages are the broker's answer to a subscribe, a view only takes them until the hub's sync
+        # marker sent after its subscribes comes back, later ones are replays for another view
+        self.syncing: bool = False
+        self.sync_marker: int | None = None
+
+    @property
+    def subscription_id(self) -> int | None:
+        return self.transport.subscription_id
+
+    @property
+    def reconnect_count(self) -> int:
+        return self.transport.reconnect_count
+
+    @property
+    def retained(self) -> bool:
+        return self.transport.retained
+
+    @property
+    def protocol(self) -> int:
+        return self.transport.protocol
+
+    @property
+    def aliased_publishes(self) -> int:
+        return self.transport.aliased_publishes
+
+    def views(self) -> int:
+        return len(self.hub.clients.get(self.key, []))
+
+    def start(self):
+        self.hub.register(self)
+
+    def stop(self):
+        self.hub.unregister(self)
+
+    def is_connected(self) -> bool:
+        return self.active and self.transport.is_connected()
+
+    def queued(self) -> int:
+        return self.transport.queued()
+
+    def subscribe(self, topic: str, qos: int = 0, subscription_id: int | None = None):
+        if self.active:
+            self.hub.subscribe(self, topic, qos, subscription_id)
+
+    def unsubscribe(self, topic: str):
+        if self.active:
+            self.hub.unsubscribe(self, topic)
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False, alias: bool = False) -> PublishAck:
+        if self.active:
+            self.hub.flush(self.key)
+        return self.transport.publish(topic, payload=payload, qos=qos, retain=retain, alias=alias)
+
+    def connected(self):
+        if self.active and self.on_connect is not None:
+            self.on_connect()
+
+
+class MqttHub:
+    # one broker connection per host and credentials for all views of the process: subscriptions are reference
+    # counted over the views, every message is decoded once and fanned out to the views that want it
+    def __init__(self, signal: QtCore.SignalInstance):
+        self.signal = signal
+        self.transports: dict[tuple, MqttTransport] = {}
+        self.clients: dict[tuple, list[HubClient]] = {}
+        # per connection: views per topic filter, subscription identifier per filter and filters sent to the broker
+        self.counts: dict[tuple, dict[str, int]] = {}
+        self.filter_ids: dict[tuple, dict[str, int | None]] = {}
+        self.subscribed: dict[tuple, set[str]] = {}
+        # subscribed filters to send again, so the broker replays their retained messages for a new view
+        self.replays: dict[tuple, set[str]] = {}
+        self.resubscribing: tuple | None = None
+        # per connection: topic of the sync marker, last marker sent and whether a flush is scheduled
+        self.sync_topics: dict[tuple, str] = {}
+        self.sync_markers: dict[tuple, int] = {}
+        self.flushing: set[tuple] = set()
+        self.fan_out_count: int = 0
+        self.retained_skipped: int = 0
+
+    @staticmethod
+    def connection_key(parameters: dict) -> tuple:
+        transport = parameters.get('mqtt_transport', 'qt')
+        # the ingest process strips and decodes its prefix itself, it can't be shared across prefixes
+        prefix = parameters.get('mqtt_prefix', '') if transport == 'process' else ''
+        return (transport, parameters['host'], int(parameters.get('port', 1883)), parameters['username'],
+                parameters['password'], prefix)
+
+    def client(self, parameters: dict) -> HubClient:
+        key = self.connection_key(parameters)
+        if key not in self.transports:
+            transport = create_transport(parameters, self.signal)
+            transport.on_connect = lambda: self.connected(key)
+            transport.on_message = lambda topic, payload: self.dispatch(key, topic, payload)
+            self.transports[key] = transport
+            self.clients[key] = []
+            self.counts[key] = {}
+            self.filter_ids[key] = {}
+            self.subscribed[key] = set()
+            self.replays[key] = set()
+            self.sync_topics[key] = f'mqtt-live/hub-{uuid.uuid4().hex[:12]}/sync'
+            self.sync_markers[key] = 0
+        return HubClient(self, key, parameters)
+
+    def register(self, client: HubClient):
+        clients = self.clients[client.key]
+        client.active = True
+        clients.append(client)
+        if len(clients) == 1 and not self.transports[client.key].is_connected():
+            self.transports[client.key].start()
+        elif self.transports[client.key].is_connected():
+            # a late view subscribes like after a connect, outside of the constructor that registered it
+            QtCore.QTimer.singleShot(0, client.connected)
+
+    def unregister(self, client: HubClient):
+        if not client.active:
+            return
+        client.active = False
+        clients = self.clients[client.key]
+        clients.remove(client)
+        if len(clients) < 1:
+            # the last view closes the connection, the next one opens a new one
+            self.transports.pop(client.key).stop()
+            for table in (self.clients, self.counts, self.filter_ids, self.subscribed, self.replays, self.sync_topics,
+                          self.sync_markers):
+                table.pop(client.key)
+            self.flushing.discard(client.key)
+            return
+        for topic_filter in list(client.filters):
+            self.unsubscribe(client, topic_filter)
+
+    def connected(self, key: tuple):
+        # a new session has no subscriptions, every view subscribes again
+        self.counts[key] = {}
+        self.subscribed[key] = set()
+        self.replays[key] = set()
+        self.transports[key].subscribe(self.sync_topics[key])
+        # the retained messages of the first subscription reach every view before its own sync marker, no replays
+        self.resubscribing = key
+        try:
+            for client in list(self.clients[key]):
+                client.filters = set()
+                self.request_sync(client)
+                client.connected()
+        finally:
+            self.resubscribing = None
+
+    def subscribe(self, client: HubClient, topic_filter: str, qos: int, subscription_id: int | None):
+        counts = self.counts[client.key]
+        if topic_filter not in client.filters:
+            client.filters.add(topic_filter)
+            counts[topic_filter] = counts.get(topic_filter, 0) + 1
+            self.filter_ids[client.key].setdefault(topic_filter, subscription_id)
+        added = self.apply(client.key, qos)
+        if topic_filter in added:
+            self.request_sync(client)
+        elif self.resubscribing != client.key:
+            # already subscribed for another view: subscribing again makes the broker replay the retained messages,
+            # once for all filters a view subscribes in a row, before its next publish (the initial sync marker)
+            cover = self.covering(topic_filter, self.subscribed[client.key])
+            if cover is not None:
+                self.replays[client.key].add(cover)
+                self.request_sync(client)
+
+    def request_sync(self, client: HubClient):
+        # the client takes retained messages until the marker of the next flush comes back
+        client.syncing = True
+        client.sync_marker = None
+        if client.key not in self.flushing:
+            self.flushing.add(client.key)
+            QtCore.QTimer.singleShot(0, lambda: self.flush(client.key))
+
+    def flush(self, key: tuple):
+        self.flushing.discard(key)
+        if key not in self.transports:
+            return
+        self.replay(key)
+        waiting = [client for client in self.clients[key] if client.syncing and client.sync_marker is None]
+        if len(waiting) < 1:
+            return
+        # published after the subscribes, the broker sends it back after their retained messages
+        self.sync_markers[key] += 1
+        self.transports[key].publish(self.sync_topics[key], payload=str(self.sync_markers[key]))
+        for client in waiting:
+            client.sync_marker = self.sync_markers[key]
+
+    def synced(self, key: tuple, payload: bytes):
+        try:
+            marker = int(payload)
+        except ValueError:
+            return
+        for client in self.clients[key]:
+            if client.syncing and client.sync_marker is not None and client.sync_marker <= marker:
+                client.syncing = False
+                client.sync_marker = None
+
+    def replay(self, key: tuple):
+        replays = self.replays.get(key)
+        if replays is None or len(replays) < 1:
+            return
+        self.replays[key] = set()
+        for topic_filter in sorted(replays & self.subscribed[key]):
+            self.transports[key].subscribe(topic_filter, subscription_id=self.filter_ids[key].get(topic_filter))
+
+    def unsubscribe(self, client: HubClient, topic_filter: str):
+        if topic_filter not in client.filters:
+            return
+        client.filters.discard(topic_filter)
+        counts = self.counts[client.key]
+        counts[topic_filter] -= 1
+        if counts[topic_filter] < 1:
+            counts.pop(topic_filter)
+            self.filter_ids[client.key].pop(topic_filter, None)
+        self.apply(client.key)
+
+    @staticmethod
+    def covering(topic_filter: str, filters: set[str]) -> str | None:
+        if topic_filter in filters:
+            return topic_filter
+        for other in filters:
+            if other.endswith('#') and topic_filter.startswith(other[:-1]):
+                return other
+        return None
+
+    def apply(self, key: tuple, qos: int = 0) -> set[str]:
+        # filters inside a # filter of another view are not sent to the broker, it would deliver those messages twice
+        counts = self.counts[key]
+        wide = {topic_filter for topic_filter in counts if topic_filter.endswith('#')}
+        wanted = {topic_filter for topic_filter in counts
+                  if self.covering(topic_filter, wide - {topic_filter}) is None}
+        subscribed = self.subscribed[key]
+        transport = self.transports[key]
+        added = wanted - subscribed
+        if len(added) > 0:
+            self.replay(key)
+        # subscribe first, a gap would lose retained messages
+        for topic_filter in sorted(added):
+            transport.subscribe(topic_filter, qos, subscription_id=self.filter_ids[key].get(topic_filter))
+        for topic_filter in sorted(subscribed - wanted):
+            transport.unsubscribe(topic_filter)
+        self.subscribed[key] = wanted
+        return added
+
+    def dispatch(self, key: tuple, topic: str, payload: bytes):
+        if topic == self.sync_topics[key]:
+            self.synced(key, payload)
+            return
+        transport = self.transports[key]
+        decoded_by_prefix: dict[str, tuple | None] = {}
+        for client in list(self.clients[key]):
+            if transport.retained and not client.syncing:
+                # a replay for another view, this one has newer values already
+                self.retained_skipped += 1
+                continue
+            prefix = client.mqtt_prefix
+            if prefix not in decoded_by_prefix:
+                if len(prefix) > 0 and not topic.startswith(prefix):
+                    decoded_by_prefix[prefix] = None
+                elif transport.subscription_id is None:
+                    decoded_by_prefix[prefix] = mqtt_topics.decode_topic(topic[len(prefix):])
+                else:
+                    decoded_by_prefix[prefix] = mqtt_topics.decode_tagged_topic(transport.subscription_id,
+                                                                                topic[len(prefix):])
+            decoded = decoded_by_prefix[prefix]
+            if not client.active or client.on_decoded is None or client.accepts is not None and not client.accepts(decoded):
+                continue
+            self.fan_out_count += 1
+            client.on_decoded(topic, decoded, payload)
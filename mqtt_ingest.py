@@ -0,0 +1,164 @@
+import multiprocessing
+import queue
+import struct
+from multiprocessing.shared_memory import SharedMemory
+
+import paho.mqtt.client as mqtt
+
+import mqtt_topics
+
+# one row per module: sequence counter (odd while the row is written) followed by the PACKED_CELLS layout
+ROW_HEADER = struct.Struct('<I')
+ROW_SIZE: int = 32
+CELL_COUNT: int = 12
+MISSING: int = 0xffff
+MASK_OFFSET: int = ROW_HEADER.size + CELL_COUNT * 2
+
+
+class CellTable:
+    def __init__(self, shm: SharedMemory, capacity: int):
+        self.shm = shm
+        self.capacity = capacity
+        self.buffer = shm.buf
+
+    @staticmethod
+    def size(capacity: int) -> int:
+        return capacity * ROW_SIZE
+
+    def clear(self, slot: int):
+        offset = slot * ROW_SIZE
+        struct.pack_into('<I12HH', self.buffer, offset, 0, *([MISSING] * CELL_COUNT), 0)
+
+    def write(self, slot: int, number: int, voltage: int | None = None, balancing: bool | None = None):
+        # single writer: the ingest network thread
+        offset = slot * ROW_SIZE
+        seq = ROW_HEADER.unpack_from(self.buffer, offset)[0]
+        ROW_HEADER.pack_into(self.buffer, offset, seq + 1)
+        if voltage is not None:
+            struct.pack_into('<H', self.buffer, offset + ROW_HEADER.size + (number - 1) * 2, voltage)
+        if balancing is not None:
+            mask = struct.unpack_from('<H', self.buffer, offset + MASK_OFFSET)[0]
+            bit = 1 << (number - 1)
+            struct.pack_into('<H', self.buffer, offset + MASK_OFFSET, mask | bit if balancing else mask & ~bit)
+        ROW_HEADER.pack_into(self.buffer, offset, seq + 2)
+
+    def read(self, slot: int, last_seq: int) -> tuple[int, bytes | None]:
+        # returns the row as PACKED_CELLS bytes if it changed since last_seq, retries while the writer is active
+        offset = slot * ROW_SIZE
+        for _ in range(100):
+            seq = ROW_HEADER.unpack_from(self.buffer, offset)[0]
+            if seq == last_seq:
+                return seq, None
+            if seq & 1:
+                continue
+            row = bytes(self.buffer[offset + ROW_HEADER.size:offset + ROW_HEADER.size + mqtt_topics.PACKED_CELLS.size])
+            if ROW_HEADER.unpack_from(self.buffer, offset)[0] == seq:
+                return seq, row
+        return last_seq, None
+
+
+class Ingest:
+    def __init__(self, parameters: dict, shm_name: str, capacity: int, events: multiprocessing.Queue,
+                 control: multiprocessing.Queue):
+        self.events = events
+        self.control = control
+        self.mqtt_prefix: str = parameters.get('mqtt_prefix', '')
+        self.shm = SharedMemory(name=shm_name)
+        self.table = CellTable(self.shm, capacity)
+        self.slots: dict[str, int] = {}
+        self.mids: dict[int, int] = {}
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client.username_pw_set(parameters['username'], parameters['password'])
+        self.client.reconnect_delay_set(1, 60)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        self.client.on_publish = self.on_publish
+        self.host: str = parameters['host']
+        self.port: int = int(parameters.get('port', 1883))
+
+    def run(self):
+        self.client.connect_async(host=self.host, port=self.port)
+        self.client.loop_start()
+        try:
+            while True:
+                command = self.control.get()
+                if command[0] == 'stop':
+                    break
+                self.execute(command)
+        finally:
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.table.buffer.release()
+            self.shm.close()
+
+    def execute(self, command: tuple):
+        if command[0] == 'publish':
+            _, ack_id, topic, payload, qos, retain = command
+            info = self.client.publish(topic, payload=payload, qos=qos, retain=retain)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.events.put(('published', ack_id, int(info.rc)))
+            else:
+                self.mids[info.mid] = ack_id
+        elif command[0] == 'subscribe':
+            self.client.subscribe(command[1], command[2])
+        elif command[0] == 'unsubscribe':
+            self.client.unsubscribe(command[1])
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if not reason_code.is_failure:
+            self.events.put(('connect',))
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.events.put(('disconnect',))
+
+    def on_publish(self, client, userdata, mid, reason_code, properties):
+        ack_id = self.mids.pop(mid, None)
+        if ack_id is not None:
+            self.events.put(('published', ack_id, 0))
+
+    def on_message(self, client, userdata, msg: mqtt.MQTTMessage):
+        # retained cells stay messages, a replay for another view must not overwrite the live values in the table
+        if not msg.retain:
+            decoded = mqtt_topics.decode_topic(mqtt_topics.strip_prefix(msg.topic, self.mqtt_prefix))
+            if decoded is not None and decoded[0] == mqtt_topics.CELL and 1 <= decoded[2] <= CELL_COUNT \
+                    and len(msg.payload) > 0 and self.write_cell(decoded, msg.payload):
+                return
+        self.events.put(('message', msg.topic, msg.payload, bool(msg.retain)))
+
+    def write_cell(self, decoded: tuple, payload: bytes) -> bool:
+        _, identifier, number, field = decoded
+        if field not in ('voltage', 'is_balancing'):
+            return False
+        slot = self.slots.get(identifier)
+        if slot is None:
+            if len(self.slots) >= self.table.capacity:
+                return False
+            slot = len(self.slots)
+            self.slots[identifier] = slot
+            self.table.clear(slot)
+            self.events.put(('slot', identifier, slot))
+        try:
+            if field == 'voltage':
+                self.table.write(slot, number, voltage=min(MISSING - 1, max(0, round(float(payload) * 1000))))
+            else:
+                self.table.write(slot, number, balancing=bool(int(payload)))
+        except ValueError:
+            return False
+        return True
+
+
+def run_ingest(parameters: dict, shm_name: str, capacity: int, events: multiprocessing.Queue,
+               control: multiprocessing.Queue):
+    Ingest(parameters, shm_name, capacity, events, control).run()
+
+
+def drain(events: multiprocessing.Queue, limit: int) -> list[tuple]:
+    items: list[tuple] = []
+    while len(items) < limit:
+        try:
+            items.append(events.get_nowait())
+        except queue.Empty:
+            break
+    return items
@@ -4,28 +4,49 @@
 #     nuitka-project: --onefile-tempdir-spec="{PROGRAM_DIR}/.mqtt-live"
 #     nuitka-project: --windows-console-mode=disable
 
+import asyncio
+import json
+import multiprocessing
 import os
 import statistics
+import struct
 import sys
 import threading
+import time
+import uuid
 from pathlib import Path
+from typing import Callable
 
-import paho.mqtt.client as mqtt
 import yaml
 from PySide6 import QtCore, QtWidgets
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QAction, QCloseEvent
-from PySide6.QtWidgets import QDialog, QHBoxLayout, QPushButton, QTextEdit, QVBoxLayout, QWidgetItem
+from PySide6.QtWidgets import QDialog, QHBoxLayout, QPushButton, QTextEdit, QVBoxLayout
 from fabric import Connection
 
+import mqtt_topics
+import profiler
+from accurate_sweep import AccurateSweep
+from alerts import Alert, AlertEngine, AlertsDock, load_rules
 from cell import Cell
 from custom_signal_window import CustomSignalWindow
-from ha_discovery import generate_ha_discovery_payload, SensorDef
-from module import Module
-from module_widget import ModuleWidget
+from diagnostics import DiagnosticsDock, Metrics, MetricsExporter
+from ha_discovery import generate_ha_discovery_payload, generate_module_sensors, HaDiscoveryPublisher, SensorDef
+from history_store import HistoryStore
+from history_view import HistoryDialog
+from memory_report import format_bytes, object_counts, rss_bytes
+from module import Module, ModuleTombstone
+from mqtt_hub import HubClient
+from mqtt_topics import CELL_TOPICS
+from mqtt_transport import create_transport, MqttTransport
+from pack_metrics import module_metrics, PackMetricsPublisher
 from settings_dialog import SettingsDialog
+from snapshot import read_snapshot, snapshot_path, write_snapshot
+from staleness import parse_thresholds, StalenessTracker, TOPIC_GROUPS
+from subscriptions import ALWAYS_FIELDS, SubscriptionManager
 from ui.mqtt_live import Ui_MainWindow
 from utils import get_config_local, get_yaml_file, put_file_sudo
+from utils_qt import exec_app, GridModel
 
 
 class MqttLiveWindow(Ui_MainWindow):
@@ -39,15 +60,40 @@ class MqttLiveWindow(Ui_MainWindow):
         'hide_modules': 'none',
         'auto_resize': 1,
         'mqtt_prefix': '',
-        'ota_file': 'firmware.bin'
+        'ota_file': 'firmware.bin',
+        'mqtt_transport': 'qt',
+        'snapshot': 1,
+        'metrics_file': '',
+        'metrics_address': '',
+        'stale_thresholds': 'uptime:3,voltages:0,temps:0',
+        'module_ha_discovery': 0,
+        'ha_discovery_interval': 250,
+        'pack_metrics_prefix': '',
+        'pack_metrics_interval': 5,
+        'pack_metrics_min_change': 'cell_diff:1,cell_median:0.001,cell_mean:0.001,soc_median:0.1,soc_mean:0.1,'
+                                   'median:0.001,imbalance:1',
+        # alert rules are opt-in, their topics are subscribed for every module, hidden or not
+        'alerts_file': '',
+        'alerts_topic': '',
+        'accurate_concurrency': 4,
+        'accurate_timeout': 10,
+        'evict_after': 3600,
+        'subscriptions': 'narrow',
+        'mqtt_protocol': '3.1.1',
+        'receive_maximum': 64,
+        'session_expiry': 300,
+        'history_file': '',
+        'history_retention': 'raw:2,1m:14,1h:365'
     }
-    CELL_TOPICS: list = [
-        'voltage',
-        'is_balancing'
-    ]
+    CELL_TOPICS: list = CELL_TOPICS
+    MAX_TOMBSTONES: int = 1000
+    SYNC_QUIET_TIME: float = 0.5
+    SYNC_MAX_TIME: float = 15.0
+    HISTORY_METRICS: set[str] = {'voltage', 'module_voltage', 'chip_temp'}
 
-    def __init__(self, parameters: dict, as_app=True):
+    def __init__(self, parameters: dict, as_app=True, transport: HubClient | None = None):
         self.as_app = as_app
+        self.on_close: Callable[[], None] | None = None
         if self.as_app:
             if not QtWidgets.QApplication.instance():
                 self.app = QtWidgets.QApplication(sys.argv)
@@ -67,6 +113,11 @@ class MqttLiveWindow(Ui_MainWindow):
         self.actiongenerate_slave_mapping.triggered.connect(self.generate_slave_mapping)
         self.actionset_can_ha_discovery.triggered.connect(self.set_can_ha_discovery)
         self.actionset_esp_relay_discovery.triggered.connect(self.set_esp_relay_discovery)
+        self.actionmodule_ha_discovery.toggled.connect(self.module_ha_discovery_clicked)
+        self.actionwrite_profile.triggered.connect(profiler.write_profile)
+        self.actionmemory_report.triggered.connect(self.show_memory_report)
+        self.actionhistory.triggered.connect(self.show_history)
+        self.actionwrite_profile.setVisible(profiler.active_profiler is not None)
 
         self.actionhidden.triggered.connect(self.show_hidden_clicked)
         self.actionuptime.triggered.connect(self.update_modules)
@@ -81,15 +132,43 @@ class MqttLiveWindow(Ui_MainWindow):
 
         self.canBox.hide()
 
+        self.staleness = StalenessTracker(
+            parse_thresholds(parameters.get('stale_thresholds', self.DEFAULT_SETTINGS['stale_thresholds'])),
+            self.module_stale, self.main_window)
+
+        self.metrics = Metrics()
+        self.diagnostics_dock = DiagnosticsDock(self.metrics.rows, self.main_window)
+        self.main_window.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.diagnostics_dock)
+        self.diagnostics_dock.hide()
+        self.actiondiagnostics.toggled.connect(self.diagnostics_dock.setVisible)
+        self.diagnostics_dock.visibilityChanged.connect(self.actiondiagnostics.setChecked)
+        self.metrics_exporter = MetricsExporter(self.metrics, parameters.get('metrics_file', ''),
+                                                parameters.get('metrics_address', ''))
+        if self.metrics_exporter.metrics_file is not None or self.metrics_exporter.server is not None:
+            metrics_timer = QtCore.QTimer(self.main_window)
+            metrics_timer.timeout.connect(self.metrics_exporter.export)
+            metrics_timer.start(10000)
+
+        alerts_file: str = parameters.get('alerts_file', self.DEFAULT_SETTINGS['alerts_file'])
+        self.alerts = AlertEngine(load_rules(Path(alerts_file)) if len(alerts_file) > 0 else [], self.alert_changed)
+        self.alerts_topic: str = parameters.get('alerts_topic', self.DEFAULT_SETTINGS['alerts_topic']).rstrip('/')
+        self.alerts_dock = AlertsDock(self.alerts, self.main_window)
+        self.main_window.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.alerts_dock)
+        self.alerts_dock.hide()
+        self.actionalerts.toggled.connect(self.alerts_dock.setVisible)
+        self.alerts_dock.visibilityChanged.connect(self.actionalerts.setChecked)
+
         self.hide_modules: set[str] = set()
         hide_modules = parameters.get('hide_modules', self.DEFAULT_SETTINGS['hide_modules'])
         if hide_modules != '' and hide_modules.lower() != 'none':
             modules: list[str] = hide_modules.split(',')
             self.hide_modules: set[str] = set(modules)
 
-        self.row = 0
-        self.column = 0
         self.modules: dict[str, Module] = {}
+        self.tombstones: dict[str, ModuleTombstone] = {}
+        self.evict_after: float = float(parameters.get('evict_after', self.DEFAULT_SETTINGS['evict_after']))
+        self.grid_model = GridModel(self.moduleBoxLayout, self.max_columns)
+        self.grid_order: list[str] = []
         self.spacer: dict = {}
 
         self.total_system_voltage: float = 0
@@ -99,37 +178,150 @@ class MqttLiveWindow(Ui_MainWindow):
         self.mqtt_prefix: str = parameters.get('mqtt_prefix', '')
         if len(self.mqtt_prefix) > 0 and not self.mqtt_prefix.endswith('/'):
             self.mqtt_prefix = f'{self.mqtt_prefix}/'
-        self.mqtt_host = parameters['host']
-        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        self.mqtt_client.on_connect = self.mqtt_on_connect
-        self.mqtt_client.on_message = self.mqtt_on_message
-        self.mqtt_client.username_pw_set(parameters['username'], parameters['password'])
-        self.mqtt_client.connect_async(host=self.mqtt_host, port=1883, keepalive=60)
 
-        self.mqtt_client.loop_start()
+        self.initial_sync: bool = False
+        self.bulk_loading: bool = False
+        self.sync_started: float = 0
+        self.last_sync_message: float = 0
+        self.sync_message_count: int = 0
+        self.sync_buffer: dict[tuple, bytes] = {}
+        self.sync_topic: str = f'{self.mqtt_prefix}mqtt-live/sync/{uuid.uuid4().hex}'
+        self.first_frame_time: float | None = None
+        self.sync_timer = QtCore.QTimer(self.main_window)
+        self.sync_timer.timeout.connect(self.check_initial_sync)
+        # a view of the shared connection (main window, multi site) gets its messages decoded by the hub
+        self.mqtt_client: MqttTransport | HubClient
+        if transport is None:
+            self.mqtt_client = create_transport(parameters, self.main_window.signal)
+            self.mqtt_client.on_message = self.mqtt_on_message
+        else:
+            self.mqtt_client = transport
+            self.mqtt_client.on_decoded = self.mqtt_on_decoded
+        self.mqtt_client.on_connect = self.mqtt_on_connect
+        # 'wide' keeps the old esp-module/# subscription and only counts what narrowing would save
+        self.subscriptions = SubscriptionManager(
+            lambda topic: self.mqtt_client.subscribe(topic, subscription_id=mqtt_topics.subscription_id(
+                mqtt_topics.strip_prefix(topic, self.mqtt_prefix))),
+            self.mqtt_client.unsubscribe, self.mqtt_prefix,
+            parameters.get('subscriptions', self.DEFAULT_SETTINGS['subscriptions']) == 'wide')
+        if transport is not None:
+            self.mqtt_client.accepts = self.subscriptions.accepts
 
         self.ota_file = parameters.get('ota_file', self.DEFAULT_SETTINGS['ota_file'])
+        self.accurate_concurrency: int = int(parameters.get('accurate_concurrency',
+                                                            self.DEFAULT_SETTINGS['accurate_concurrency']))
+        self.accurate_timeout: float = float(parameters.get('accurate_timeout',
+                                                            self.DEFAULT_SETTINGS['accurate_timeout']))
+        self.accurate_sweep: AccurateSweep | None = None
+
+        self.module_sensors: list[SensorDef] = generate_module_sensors()
+        self.ha_discovery = HaDiscoveryPublisher(
+            lambda topic, payload: self.mqtt_client.publish(topic, payload=payload, retain=True), self.main_window,
+            int(parameters.get('ha_discovery_interval', self.DEFAULT_SETTINGS['ha_discovery_interval'])))
+        self.module_ha_discovery: bool = False
+
+        self.pack_metrics: PackMetricsPublisher | None = None
+        pack_metrics_prefix: str = parameters.get('pack_metrics_prefix', self.DEFAULT_SETTINGS['pack_metrics_prefix'])
+        if len(pack_metrics_prefix) > 0:
+            self.pack_metrics = PackMetricsPublisher(
+                lambda topic, payload: self.mqtt_client.publish(topic, payload=payload),
+                pack_metrics_prefix,
+                float(parameters.get('pack_metrics_interval', self.DEFAULT_SETTINGS['pack_metrics_interval'])),
+                parse_thresholds(parameters.get('pack_metrics_min_change',
+                                                self.DEFAULT_SETTINGS['pack_metrics_min_change'])))
+        self.actionmodule_ha_discovery.setChecked(
+            int(parameters.get('module_ha_discovery', self.DEFAULT_SETTINGS['module_ha_discovery'])) == 1)
+
+        # optional sqlite time series of cell voltages, module voltage and chip temperature
+        self.history: HistoryStore | None = None
+        self.history_dialog: HistoryDialog | None = None
+        history_file: str = parameters.get('history_file', self.DEFAULT_SETTINGS['history_file'])
+        if len(history_file) > 0:
+            self.history = HistoryStore(Path(history_file), parse_thresholds(
+                parameters.get('history_retention', self.DEFAULT_SETTINGS['history_retention'])))
+        self.actionhistory.setEnabled(self.history is not None)
+
+        self.snapshot_file: Path | None = None
+        if int(parameters.get('snapshot', self.DEFAULT_SETTINGS['snapshot'])) == 1:
+            self.snapshot_file = snapshot_path(parameters['host'], self.mqtt_prefix)
+            self.restore_snapshot()
+            snapshot_timer = QtCore.QTimer(self.main_window)
+            snapshot_timer.timeout.connect(self.save_snapshot)
+            snapshot_timer.start(60000)
+        self.mqtt_client.start()
 
         timer = QtCore.QTimer(self.main_window)
         timer.timeout.connect(self.timer_work)
         timer.start(1000)
+        if self.evict_after > 0:
+            evict_timer = QtCore.QTimer(self.main_window)
+            evict_timer.timeout.connect(self.evict_unseen)
+            evict_timer.start(60000)
 
     def show(self):
         self.main_window.show()
         if self.as_app:
-            sys.exit(self.app.exec())
+            sys.exit(exec_app())
 
     def close_event(self, a0: QCloseEvent) -> None:
-        self.mqtt_client.loop_stop()
+        self.save_snapshot()
+        self.metrics_exporter.stop()
+        if self.history is not None:
+            self.history.close()
+        self.mqtt_client.stop()
+        if self.on_close is not None:
+            self.on_close()
         a0.accept()
 
     def read_accurate_all(self):
+        if self.accurate_sweep is not None:
+            self.accurate_sweep.cancel()
+        targets: dict[str, tuple[str, int]] = {}
         for identifier in self.modules:
-            self.mqtt_client.publish(f'esp-module/{identifier}/read_accurate', payload='1')
+            module = self.modules[identifier]
+            # a mac aliased to a module number is the same module, the number one is requested via the mac
+            if module.number is not None:
+                continue
+            cell_count = sum(1 for cell in module.cells.values() if cell.voltage is not None)
+            targets[identifier] = (module.get_topic(), cell_count or len(module.cells))
+        self.accurate_sweep = AccurateSweep(
+            targets,
+            lambda topic: self.mqtt_client.publish(f'esp-module/{topic}/read_accurate', payload='1', alias=True),
+            self.accurate_sweep_finished, self.main_window, self.accurate_concurrency, self.accurate_timeout)
+        self.accurate_sweep.start()
+
+    def accurate_received(self, identifier: str, number: int):
+        module = self.modules[identifier]
+        if module.number is not None and str(module.number) in self.modules:
+            identifier = str(module.number)
+        accurate = module.cells[number].accurate_voltage
+        self.accurate_sweep.received(identifier, number, accurate, self.modules[identifier].cells[number].voltage)
+
+    def accurate_sweep_finished(self, report: dict):
+        self.accurate_sweep = None
+        self.metrics.observe('accurate_sweep', report['duration'])
+        text = yaml.dump(report, default_flow_style=False, sort_keys=False)
+        print(f'accurate sweep:\n{text}')
+        dialog = QDialog(self.main_window)
+        dialog.setWindowTitle('accurate sweep')
+        dialog.resize(400, 300)
+        layout = QVBoxLayout(dialog)
+        textbox = QTextEdit(dialog)
+        textbox.setReadOnly(True)
+        textbox.setText(text)
+        layout.addWidget(textbox)
+        dialog.show()
 
     def switch_balancing_enabled(self):
-        value: str = str(self.actionbalancing_enabled.isChecked()).lower()
-        self.mqtt_client.publish('master/core/config/balancing_enabled/set', payload=value, retain=True)
+        asyncio.ensure_future(self.publish_balancing_enabled(self.actionbalancing_enabled.isChecked()))
+
+    async def publish_balancing_enabled(self, enabled: bool):
+        ack = self.mqtt_client.publish('master/core/config/balancing_enabled/set', payload=str(enabled).lower(),
+                                       qos=1, retain=True)
+        if not await ack:
+            # the master never got it, show the state it still has
+            self.actionbalancing_enabled.setChecked(not enabled)
+            self.main_window.statusBar().showMessage(f'balancing_enabled not published (rc {ack.rc})')
 
     def delete_module(self, identifier: str):
         topics = [
@@ -152,6 +344,8 @@ class MqttLiveWindow(Ui_MainWindow):
             'ota_start',
             'ota_url',
             'pec15_error_count',
+            'cells',
+            'cells_bin',
             'total_system_voltage',
             'uptime',
             'version',
@@ -163,9 +357,85 @@ class MqttLiveWindow(Ui_MainWindow):
                 topics.append(f'cell/{i}/{cell_topic}')
         for topic in topics:
             self.mqtt_client.publish(f'esp-module/{identifier}/{topic}', retain=True)
+        self.evict_module(identifier, 'deleted')
 
-    def delete_offline(self):
+    def evict_module(self, identifier: str, reason: str):
+        module = self.modules.pop(identifier, None)
+        if module is None:
+            return
+        snapshot = module.to_snapshot()
+        del snapshot['cells']
+        self.tombstones[identifier] = ModuleTombstone(identifier, snapshot, reason)
+        while len(self.tombstones) > self.MAX_TOMBSTONES:
+            del self.tombstones[next(iter(self.tombstones))]
+        self.grid_model.unregister(identifier, module.widget)
+        module.release()
+        self.staleness.remove(identifier)
+        self.alerts.remove(identifier)
+        if self.pack_metrics is not None:
+            self.pack_metrics.remove(f'module/{identifier}')
+        self.metrics.count('modules_evicted', f'reason="{reason}"')
+        self.update_subscriptions()
+
+    def evict_unseen(self):
+        if self.initial_sync:
+            return
+        deadline = time.monotonic() - self.evict_after
+        evicted = [identifier for identifier in self.modules if self.modules[identifier].last_seen < deadline]
+        for identifier in evicted:
+            self.evict_module(identifier, 'unseen')
+        if len(evicted) > 0:
+            self.sort_modules()
+
+    def show_memory_report(self):
+        now = time.monotonic()
+        lines: list[str] = [f'rss: {format_bytes(rss_bytes())}',
+                            f'modules: {len(self.modules)}, tombstones: {len(self.tombstones)}',
+                            f'qt objects in window: {len(self.main_window.findChildren(QtCore.QObject))}',
+                            '', 'module: qt objects, python bytes, last seen']
+        total_qobjects: int = 0
+        total_bytes: int = 0
         for identifier in self.modules:
+            module = self.modules[identifier]
+            qobjects, python_bytes = module.footprint()
+            total_qobjects += qobjects
+            total_bytes += python_bytes
+            lines.append(f'{module.get_title()}: {qobjects}, {format_bytes(python_bytes)}, '
+                         f'{now - module.last_seen:.0f} s ago')
+        lines.append(f'total: {total_qobjects}, {format_bytes(total_bytes)}')
+        lines += ['', 'tombstones: reason, evicted']
+        for identifier, tombstone in self.tombstones.items():
+            lines.append(f'{identifier}: {tombstone.reason}, {now - tombstone.evicted:.0f} s ago')
+        lines += ['', 'live python objects:']
+        lines += [f'{name}: {count}' for name, count in object_counts()]
+        dialog = QDialog(self.main_window)
+        dialog.setWindowTitle('memory report')
+        dialog.resize(500, 600)
+        layout = QVBoxLayout(dialog)
+        textbox = QTextEdit(dialog)
+        textbox.setReadOnly(True)
+        textbox.setText('\n'.join(lines))
+        layout.addWidget(textbox)
+        dialog.show()
+
+    def show_history(self):
+        if self.history_dialog is None:
+            self.history_dialog = HistoryDialog(self.history, self.main_window.signal, self.main_window)
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+
+    def record_history(self, identifier: str, number: int, field: str, value: str | float | None):
+        # retained values, in the initial sync or for a new subscription later, are not new samples
+        if self.history is None or self.bulk_loading or self.mqtt_client.retained or value is None or \
+                field not in self.HISTORY_METRICS:
+            return
+        try:
+            self.history.add(identifier, number, field, float(value))
+        except ValueError:
+            pass
+
+    def delete_offline(self):
+        for identifier in list(self.modules):
             if self.modules[identifier].available == 'offline':
                 self.delete_module(identifier)
 
@@ -176,40 +446,23 @@ class MqttLiveWindow(Ui_MainWindow):
             return
         c = Connection(host=config['host'], user=config['user'], connect_kwargs={'password': config['password']})
         file = get_yaml_file(c, '/docker/easybms-master/slave_mapping.yaml')
-        for identifier in self.modules:
+        for identifier in list(self.modules):
             if len(identifier) != 12:
                 continue
             if identifier not in file['slaves']:
                 self.delete_module(identifier)
 
-    def find_module_by_item(self, item: QWidgetItem):
-        if not item:
-            return None
-        module_widget = item.widget()
-        if not module_widget:
-            return None
-        if not isinstance(module_widget, ModuleWidget):
-            return None
-        for identifier in self.modules:
-            widget = self.modules[identifier].widget
-            if widget == module_widget:
-                return self.modules[identifier]
-        return None
-
     def generate_slave_mapping(self):
         comments: str = ''
         mapping: dict = {'slaves': {}}
         counter: int = 1
-        for row in range(self.moduleBoxLayout.rowCount()):
-            for col in range(self.moduleBoxLayout.columnCount()):
-                item = self.moduleBoxLayout.itemAtPosition(row, col)
-                module = self.find_module_by_item(item)
-                if module:
-                    if module.is_mac() or module.mac is not None:
-                        mapping['slaves'][module.get_topic()] = {'number': counter}
-                    else:
-                        comments += f'# {module.identifier} not found!\n'
-                    counter += 1
+        for identifier in self.grid_model.ordered():
+            module = self.modules[identifier]
+            if module.is_mac() or module.mac is not None:
+                mapping['slaves'][module.get_topic()] = {'number': counter}
+            else:
+                comments += f'# {module.identifier} not found!\n'
+            counter += 1
         dialog = QDialog()
         dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowType.WindowContextHelpButtonHint)
         dialog.resize(600, 450)
@@ -308,6 +561,25 @@ class MqttLiveWindow(Ui_MainWindow):
                                                 'https://github.com/SunshadeCorp', 'esp-total/status', 'master/relays/')
         self.mqtt_client.publish('homeassistant/device/esp32_relays/config', payload=payload, retain=True)
 
+    def module_ha_discovery_clicked(self, checked: bool):
+        self.module_ha_discovery = checked
+        if checked:
+            self.update_module_ha_discovery()
+
+    def update_module_ha_discovery(self):
+        for identifier in self.modules:
+            module = self.modules[identifier]
+            # a mac aliased to a module number publishes its values under the number
+            if module.number is not None or identifier in self.hide_modules:
+                continue
+            dev_id = f'easybms_module_{module.get_topic()}'
+            state_prefix = f'{self.mqtt_prefix}esp-module/{identifier}/'
+            self.ha_discovery.update(
+                dev_id, (identifier, module.mac, self.mqtt_prefix), f'homeassistant/device/{dev_id}/config',
+                lambda: generate_ha_discovery_payload(self.module_sensors, dev_id, f'EasyBMS module {identifier}',
+                                                      'easybms-master', 'https://github.com/SunshadeCorp',
+                                                      f'{state_prefix}available', state_prefix))
+
     def ota_update_all(self):
         for identifier in self.modules:
             if len(identifier) != 12:
@@ -331,9 +603,10 @@ class MqttLiveWindow(Ui_MainWindow):
     def update_modules(self):
         for identifier in self.modules:
             module = self.modules[identifier]
-            if module.mac is not None and len(module.build_timestamp_label.text()) <= 1:
+            if module.mac in self.modules and len(module.build_timestamp_label.text()) <= 1:
                 module.build_timestamp_label.setText(self.modules[module.mac].build_timestamp_label.text())
             self.update_all_labels(module)
+        self.update_subscriptions()
         if self.auto_resize:
             QtCore.QTimer.singleShot(100, self.resize_window)
 
@@ -346,23 +619,89 @@ class MqttLiveWindow(Ui_MainWindow):
                 self.modules[identifier].restart()
 
     def sort_modules(self):
+        start = time.perf_counter()
         for identifier in self.modules:
             self.modules[identifier].widget.hide()
             self.modules[identifier].widget.setParent(None)
-        self.row = 0
-        self.column = 0
-        for identifier in sorted(self.modules, key=lambda x: self.modules[x].get_order()):
+        self.grid_model.clear()
+        positions: dict[str, int] = {identifier: i for i, identifier in enumerate(self.grid_order)}
+
+        def get_order(identifier: str) -> tuple:
+            if identifier in positions:
+                return 0, positions[identifier]
+            return 1, self.modules[identifier].get_order()
+
+        for identifier in sorted(self.modules, key=get_order):
             if self.modules[identifier].hidden and not self.show_hidden:
                 continue
             self.add_widget_to_grid(self.modules[identifier].widget)
             self.modules[identifier].widget.show()
+        self.update_subscriptions()
         if self.auto_resize:
             self.resize_window()
+        self.metrics.observe('sort_modules', time.perf_counter() - start)
 
-    def mqtt_on_connect(self, client, userdata, flags, reason_code, properties):
-        client.subscribe(f'{self.mqtt_prefix}esp-module/#')
-        client.subscribe(f'{self.mqtt_prefix}esp-total/#')
-        client.subscribe(f'{self.mqtt_prefix}master/core/config/balancing_enabled')
+    def mqtt_on_connect(self):
+        self.begin_initial_sync()
+        self.subscriptions.reset()
+        self.update_subscriptions()
+        # the broker sends retained messages per subscription in order, so the echo of this ends the flood
+        self.mqtt_client.subscribe(self.sync_topic, subscription_id=mqtt_topics.SUBSCRIPTION_SYNC)
+        self.mqtt_client.publish(self.sync_topic, payload='1')
+
+    def update_subscriptions(self):
+        fields = set(ALWAYS_FIELDS)
+        if self.actionuptime.isChecked():
+            fields.add('uptime')
+        if self.actionbuild_timestamp.isChecked():
+            fields.add('build_timestamp')
+        # staleness, alerts and history watch every module, hidden or not
+        fields.update(topic for topic, group in TOPIC_GROUPS.items() if group in self.staleness.thresholds)
+        fields.update(self.alerts.index)
+        if self.history is not None:
+            fields.update(self.HISTORY_METRICS)
+        view_modules: set[str] | None = None
+        if not self.show_hidden and any(module.hidden for module in self.modules.values()):
+            view_modules = {identifier for identifier in self.modules if not self.modules[identifier].hidden}
+        self.subscriptions.update(fields, view_modules)
+
+    def begin_initial_sync(self):
+        self.initial_sync = True
+        self.sync_started = time.perf_counter()
+        self.last_sync_message = self.sync_started
+        self.sync_message_count = 0
+        self.sync_buffer = {}
+        self.sync_timer.start(100)
+
+    def check_initial_sync(self):
+        now = time.perf_counter()
+        if now - self.last_sync_message > self.SYNC_QUIET_TIME or now - self.sync_started > self.SYNC_MAX_TIME:
+            self.end_initial_sync()
+
+    def end_initial_sync(self):
+        if not self.initial_sync:
+            return
+        self.initial_sync = False
+        self.sync_timer.stop()
+        self.mqtt_client.unsubscribe(self.sync_topic)
+        buffer, self.sync_buffer = self.sync_buffer, {}
+        self.bulk_loading = True
+        self.moduleBox.setUpdatesEnabled(False)
+        for decoded in buffer:
+            self.apply_decoded(decoded, buffer[decoded])
+        self.bulk_loading = False
+        self.sort_modules()
+        self.moduleBox.setUpdatesEnabled(True)
+        self.print_status_bar()
+        self.calc_cell_diff()
+        QtCore.QTimer.singleShot(0, self.report_initial_sync)
+
+    def report_initial_sync(self):
+        self.first_frame_time = time.perf_counter() - self.sync_started
+        message = (f'initial sync: {self.sync_message_count} messages, {len(self.modules)} modules'
+                   f', first complete frame after {self.first_frame_time * 1000:.0f} ms')
+        print(message)
+        self.main_window.statusBar().showMessage(message, 10000)
 
     @staticmethod
     def update_label_visibility(action: QAction, label: QtWidgets.QLabel):
@@ -375,23 +714,69 @@ class MqttLiveWindow(Ui_MainWindow):
         self.update_label_visibility(self.actionuptime, module.uptime_label)
         self.update_label_visibility(self.actionbuild_timestamp, module.build_timestamp_label)
 
+    def create_module(self, identifier: str) -> Module:
+        module = Module(identifier, self.moduleBox, self.grid_model, self.mqtt_client)
+        self.grid_model.register(identifier, module.widget)
+        module.widget.on_drop.connect(self.module_dropped)
+        self.update_all_labels(module)
+        self.modules[identifier] = module
+        # a module that comes online and never sends its uptime is stale after the threshold, like before the heap
+        self.staleness.touch(identifier, 'uptime')
+        return module
+
     def add_widget(self, identifier: str):
         if identifier not in self.modules:
-            module = Module(identifier, self.moduleBox, self.moduleBoxLayout, self.mqtt_client)
-            self.update_all_labels(module)
-            self.add_widget_to_grid(module.widget)
-            self.modules[identifier] = module
+            module = self.create_module(identifier)
+            tombstone = self.tombstones.pop(identifier, None)
+            if tombstone is not None:
+                module.restore_snapshot(tombstone.snapshot)
+            if not self.bulk_loading:
+                self.add_widget_to_grid(module.widget)
+                self.update_subscriptions()
+
+    def module_dropped(self, infos: dict):
+        grid_order: list[str] = self.grid_model.ordered()
+        in_grid: set[str] = set(grid_order)
+        self.grid_order = grid_order + [identifier for identifier in self.grid_order if identifier not in in_grid]
+
+    def restore_snapshot(self):
+        snapshot: dict = read_snapshot(self.snapshot_file)
+        if len(snapshot) < 1:
+            return
+        self.moduleBox.setUpdatesEnabled(False)
+        self.grid_order = snapshot.get('grid_order', [])
+        for identifier, module_snapshot in snapshot.get('modules', {}).items():
+            module = self.create_module(identifier)
+            module.restore_snapshot(module_snapshot)
+            if identifier in self.hide_modules:
+                module.hidden = True
+        self.total_system_voltage = snapshot.get('total_system_voltage', 0)
+        self.total_system_current = snapshot.get('total_system_current', 0)
+        self.sort_modules()
+        self.moduleBox.setUpdatesEnabled(True)
+        self.print_status_bar()
+        self.calc_cell_diff()
+
+    def save_snapshot(self):
+        if self.snapshot_file is None:
+            return
+        try:
+            write_snapshot(self.snapshot_file, {
+                'grid_order': self.grid_order,
+                'total_system_voltage': self.total_system_voltage,
+                'total_system_current': self.total_system_current,
+                'modules': {identifier: self.modules[identifier].to_snapshot() for identifier in self.modules},
+            })
+        except OSError as e:
+            print('snapshot not saved:', e)
 
     def add_widget_to_grid(self, widget):
-        self.moduleBoxLayout.addWidget(widget, self.row, self.column)
-        self.column += 1
-        if self.column >= self.max_columns:
-            self.row += 1
-            self.column = 0
+        self.grid_model.append(widget)
 
     def set_module_hidden(self, module: Module, value: bool):
         module.hidden = True if module.identifier in self.hide_modules else value
-        self.sort_modules()
+        if not self.bulk_loading:
+            self.sort_modules()
 
     def print_status_bar(self):
         mod_sum_voltage: float = sum(self.modules[identifier].module_voltage for identifier in self.modules
@@ -408,6 +793,8 @@ class MqttLiveWindow(Ui_MainWindow):
         module = self.modules[data['identifier']]
         if 'available' in data:
             self.set_module_hidden(module, module.update_available(data['available']))
+            if (module.identifier, 'uptime') in self.staleness.stale:
+                module.mark_stale('uptime')
         elif 'module_topic' in data:
             identifier = data['module_topic'][data['module_topic'].find('/') + 1:]
             if data['identifier'] != identifier and module.is_available():
@@ -437,6 +824,8 @@ class MqttLiveWindow(Ui_MainWindow):
         elif 'accurate_voltage' in data:
             module.cells[data['number']].accurate_voltage = float(data['accurate_voltage'])
             module.refresh_cell_text(data['number'])
+            if self.accurate_sweep is not None:
+                self.accurate_received(data['identifier'], data['number'])
         elif 'is_balancing' in data:
             cell: Cell = module.cells[data['number']]
             cell.is_balancing = bool(int(data['is_balancing']))
@@ -457,13 +846,70 @@ class MqttLiveWindow(Ui_MainWindow):
             self.print_status_bar()
 
     def timer_work(self):
-        for identifier in self.modules:
-            self.modules[identifier].check_uptime()
+        start = time.perf_counter()
         if not self.mqtt_client.is_connected():
             self.main_window.setWindowTitle("DISCONNECTED!")
-            self.mqtt_client.connect_async(host=self.mqtt_host, port=1883, keepalive=60)
-            return
-        self.calc_cell_diff()
+        else:
+            self.calc_cell_diff()
+            self.alerts.check_pending()
+            if self.module_ha_discovery and not self.initial_sync:
+                self.update_module_ha_discovery()
+        self.update_metrics()
+        self.alerts_dock.refresh()
+        self.metrics.observe('timer_work', time.perf_counter() - start)
+
+    def module_stale(self, identifier: str, group: str):
+        if identifier in self.modules:
+            self.modules[identifier].mark_stale(group)
+            self.alerts.update(identifier, None, f'stale/{group}', 1.0)
+
+    def alert_changed(self, alert: Alert, active: bool):
+        self.metrics.count('alerts_raised' if active else 'alerts_cleared', f'rule="{alert.rule.name}"')
+        if len(self.alerts_topic) > 0:
+            topic = f'{self.alerts_topic}/{alert.rule.name}/{alert.key()}'
+            if active:
+                payload = json.dumps({'severity': alert.rule.severity, 'value': alert.value, 'since': time.time()})
+                self.mqtt_client.publish(topic, payload=payload, retain=True)
+            else:
+                self.mqtt_client.publish(topic, retain=True)
+
+    def update_metrics(self):
+        self.metrics.set_gauge('modules', len(self.modules))
+        self.metrics.set_gauge('tombstones', len(self.tombstones))
+        self.metrics.set_gauge('signal_queue_depth', self.mqtt_client.queued())
+        self.metrics.set_gauge('mqtt_reconnects', self.mqtt_client.reconnect_count)
+        self.metrics.set_gauge('mqtt_connected', int(self.mqtt_client.is_connected()))
+        self.metrics.set_gauge('mqtt_protocol', 5 if self.mqtt_client.protocol == 5 else 3)
+        self.metrics.set_gauge('mqtt_aliased_publishes', self.mqtt_client.aliased_publishes)
+        if isinstance(self.mqtt_client, HubClient):
+            self.metrics.set_gauge('mqtt_shared_views', self.mqtt_client.views())
+            self.metrics.set_gauge('mqtt_retained_skipped', self.mqtt_client.hub.retained_skipped)
+        self.metrics.set_gauge('stale_deadlines', len(self.staleness.heap))
+        self.metrics.set_gauge('stale_fired', self.staleness.fired)
+        self.metrics.set_gauge('alerts_active', len(self.alerts.active))
+        self.metrics.set_gauge('alerts_pending', len(self.alerts.pending))
+        self.metrics.set_gauge('alert_evaluations', self.alerts.evaluated)
+        saved_messages, saved_bytes = self.subscriptions.savings()
+        self.metrics.set_gauge('subscription_filters', len(self.subscriptions.subscribed))
+        self.metrics.set_gauge('subscription_changes',
+                               self.subscriptions.subscribe_count + self.subscriptions.unsubscribe_count)
+        self.metrics.set_gauge('subscription_saved_messages', round(saved_messages))
+        self.metrics.set_gauge('subscription_saved_bytes', round(saved_bytes))
+        self.metrics.set_gauge('subscription_unwanted_messages', self.subscriptions.unwanted_messages)
+        self.metrics.set_gauge('ha_discovery_pending', len(self.ha_discovery.pending))
+        self.metrics.set_gauge('ha_discovery_published', self.ha_discovery.published_count)
+        if self.pack_metrics is not None:
+            self.metrics.set_gauge('pack_metrics_published', self.pack_metrics.published_count)
+            self.metrics.set_gauge('pack_metrics_suppressed', self.pack_metrics.suppressed_count)
+        if self.history is not None:
+            self.metrics.set_gauge('history_queue_depth', self.history.queue.qsize())
+            self.metrics.set_gauge('history_samples_written', self.history.written)
+            self.metrics.set_gauge('history_batches', self.history.batches)
+            self.metrics.set_gauge('history_samples_dropped', self.history.dropped)
+        if self.first_frame_time is not None:
+            self.metrics.set_gauge('first_frame_seconds', self.first_frame_time)
+        self.metrics.update_rates()
+        self.diagnostics_dock.refresh()
 
     def calc_cell_diff(self):
         voltages: list[float] = []
@@ -503,66 +949,167 @@ class MqttLiveWindow(Ui_MainWindow):
                                         f', {soc_mean:.1f} % mean'
                                         f', {soc_min:.1f} % min'
                                         f', {soc_max:.1f} % max')
+        if self.pack_metrics is not None:
+            self.publish_pack_metrics({
+                'cell_diff': round(cell_diff, 1),
+                'cell_median': round(cell_median, 4),
+                'cell_mean': round(cell_mean, 4),
+                'cell_min': self.cell_min,
+                'cell_max': cell_max,
+                'soc_median': round(soc_median, 1),
+                'soc_mean': round(soc_mean, 1),
+                'soc_min': round(soc_min, 1),
+                'soc_max': round(soc_max, 1),
+            })
 
-    def emit_signal_set_module(self, identifier: str, topic: str, msg):
-        data = {
+    def publish_pack_metrics(self, pack: dict[str, float]):
+        now = time.monotonic()
+        mod_sum_voltage: float = 0
+        cell_sum_voltage: float = 0
+        for identifier in self.modules:
+            module = self.modules[identifier]
+            if module.hidden:
+                continue
+            mod_sum_voltage += module.module_voltage
+            cell_sum_voltage += module.cell_sum_voltage
+            voltages = [cell.voltage for cell in module.cells.values() if cell.voltage is not None]
+            if len(voltages) > 0:
+                self.pack_metrics.update(f'module/{identifier}', module_metrics(voltages), now)
+        pack['module_voltage_sum'] = round(mod_sum_voltage, 2)
+        pack['cell_voltage_sum'] = round(cell_sum_voltage, 2)
+        self.pack_metrics.update('pack', pack, now)
+
+    def set_module(self, identifier: str, topic: str, payload: bytes):
+        start = time.perf_counter()
+        value: str = payload.decode()
+        if topic in Module.SNAPSHOT_TOPICS:
+            self.modules[identifier].values[topic] = value
+        self.set_widget({
             'identifier': identifier,
-            topic: msg.payload.decode()
-        }
-        self.main_window.signal.emit({'func': self.set_widget, 'arg': data})
+            topic: value
+        })
+        self.record_history(identifier, 0, topic, value)
+        self.metrics.observe('set_widget', time.perf_counter() - start, f'branch="{topic}"')
 
-    def emit_signal_set_cell(self, identifier: str, number: int, topic: str, msg):
-        data = {
+    def set_cell(self, identifier: str, number: int, topic: str, payload: bytes):
+        start = time.perf_counter()
+        value: str = payload.decode()
+        self.set_widget({
             'identifier': identifier,
             'number': number,
-            topic: msg.payload.decode()
-        }
-        self.main_window.signal.emit({'func': self.set_widget, 'arg': data})
+            topic: value
+        })
+        self.record_history(identifier, number, topic, value)
+        self.metrics.observe('set_widget', time.perf_counter() - start, f'branch="{topic}"')
+
+    def set_cells(self, identifier: str, field: str, payload: bytes):
+        start = time.perf_counter()
+        try:
+            voltages, balancing_mask = mqtt_topics.decode_packed_cells(field, payload)
+        except (ValueError, struct.error):
+            print(identifier, field, payload, 'bad data!')
+            return
+        module = self.modules[identifier]
+        module.update_cells(voltages, balancing_mask)
+        module.color_median_voltage(self.cell_min + 0.01)
+        for i, voltage in enumerate(voltages[:len(module.cells)]):
+            self.record_history(identifier, i + 1, 'voltage', voltage)
+        self.metrics.observe('set_widget', time.perf_counter() - start, f'branch="{field}"')
+
+    def mqtt_on_message(self, topic: str, payload: bytes):
+        if self.mqtt_client.subscription_id is None:
+            decoded = mqtt_topics.decode_topic(mqtt_topics.strip_prefix(topic, self.mqtt_prefix))
+        else:
+            decoded = mqtt_topics.decode_tagged_topic(self.mqtt_client.subscription_id, topic[len(self.mqtt_prefix):])
+        self.mqtt_on_decoded(topic, decoded, payload)
+
+    def mqtt_on_decoded(self, topic: str, decoded: tuple | None, payload: bytes):
+        if len(payload) < 1:
+            return
+        if topic == self.sync_topic:
+            self.metrics.count('messages', 'class="sync"')
+            self.end_initial_sync()
+            return
+        self.metrics.count('message_bytes', value=len(payload))
+        self.subscriptions.received(decoded, len(topic) + len(payload))
+        if decoded is None:
+            self.metrics.count('messages', 'class="ignored"')
+            return
+        self.apply_decoded(decoded, payload)
 
-    def mqtt_on_message(self, client, userdata, msg):
-        if len(msg.payload) < 1:
+    def apply_decoded(self, decoded: tuple, payload: bytes):
+        kind, identifier, number, field = decoded
+        if not self.bulk_loading:
+            self.metrics.count('messages', f'class="{kind}"')
+        if self.initial_sync:
+            if kind == mqtt_topics.OTHER:
+                decoded, payload = (kind, identifier, None, ''), b''
+            self.sync_buffer[decoded] = payload
+            self.sync_message_count += 1
+            self.last_sync_message = time.perf_counter()
             return
-        if len(self.mqtt_prefix) > 0 and msg.topic.startswith(self.mqtt_prefix):
-            msg.topic = msg.topic[len(self.mqtt_prefix):].encode('utf-8')
-        if msg.topic.startswith('esp-module'):
-            topic: str = msg.topic[msg.topic.find('/') + 1:]
-            identifier: str = topic[:topic.find('/')]
-            self.main_window.signal.emit({'func': self.add_widget, 'arg': identifier})
-            topic = topic[topic.find('/') + 1:]
-            # print(identifier, topic)
-            if topic in Module.TOPICS:
-                self.emit_signal_set_module(identifier, topic, msg)
-            elif topic.startswith('cell/'):
-                topic = topic[topic.find('/') + 1:]
-                number = topic[:topic.find('/')]
-                topic = topic[topic.find('/') + 1:]
-                number = int(number)
-                if topic in self.CELL_TOPICS:
-                    self.emit_signal_set_cell(identifier, number, topic, msg)
-            elif topic.startswith('accurate/cell/'):
-                topic = topic[topic.find('/') + 1:]
-                topic = topic[topic.find('/') + 1:]
-                number = topic[:topic.find('/')]
-                topic = topic[topic.find('/') + 1:]
-                number = int(number)
-                if topic in self.CELL_TOPICS:
-                    self.emit_signal_set_cell(identifier, number, f'accurate_{topic}', msg)
-        elif msg.topic == 'esp-total/total_voltage':
-            self.main_window.signal.emit({'func': self.set_total, 'arg': {
-                'total_voltage': msg.payload.decode()
-            }})
-        elif msg.topic == 'esp-total/total_current':
-            self.main_window.signal.emit({'func': self.set_total, 'arg': {
-                'total_current': msg.payload.decode()
-            }})
-        elif msg.topic == 'master/core/config/balancing_enabled':
-            self.main_window.signal.emit({'func': self.actionbalancing_enabled.setChecked,
-                                          'arg': msg.payload.decode().lower() == 'true'})
+        if identifier is not None:
+            self.add_widget(identifier)
+            self.modules[identifier].last_seen = time.monotonic()
+            if self.modules[identifier].stale:
+                self.modules[identifier].confirm_live()
+                if (identifier, 'uptime') in self.staleness.stale:
+                    self.modules[identifier].mark_stale('uptime')
+            fresh_group = self.staleness.touch(identifier, field)
+            if fresh_group is not None:
+                self.modules[identifier].mark_fresh(fresh_group)
+                self.alerts.update(identifier, None, f'stale/{fresh_group}', 0.0)
+        if kind == mqtt_topics.MODULE:
+            self.set_module(identifier, field, payload)
+        elif kind == mqtt_topics.CELL:
+            self.set_cell(identifier, number, field, payload)
+        elif kind == mqtt_topics.CELLS:
+            self.set_cells(identifier, field, payload)
+        elif kind == mqtt_topics.TOTAL:
+            self.set_total({field: payload.decode()})
+        elif kind == mqtt_topics.BALANCING_ENABLED:
+            self.actionbalancing_enabled.setChecked(payload.decode().lower() == 'true')
+        if len(self.alerts.index) > 0:
+            self.update_alerts(kind, identifier, number, field, payload)
+
+    def update_alerts(self, kind: str, identifier: str | None, number: int | None, field: str, payload: bytes):
+        if kind == mqtt_topics.CELLS:
+            self.update_packed_alerts(identifier)
+            return
+        if field in self.alerts.index:
+            self.alerts.update(identifier or kind, number, field, payload.decode())
+        if identifier is None:
+            return
+        module = self.modules[identifier]
+        if field == 'voltage' and kind == mqtt_topics.CELL and 'cell_deviation' in self.alerts.index:
+            voltage = module.cells[number].voltage
+            if voltage is not None:
+                self.alerts.update(identifier, number, 'cell_deviation', voltage - module.cell_median_voltage)
+        if field in ('module_voltage', 'voltage'):
+            self.update_module_voltage_diff(module)
+
+    def update_packed_alerts(self, identifier: str):
+        module = self.modules[identifier]
+        for number in module.cells:
+            voltage = module.cells[number].voltage
+            if voltage is None:
+                continue
+            self.alerts.update(identifier, number, 'voltage', voltage)
+            self.alerts.update(identifier, number, 'cell_deviation', voltage - module.cell_median_voltage)
+        self.update_module_voltage_diff(module)
+
+    def update_module_voltage_diff(self, module: Module):
+        # the diff changes with either side, but means nothing before the first module voltage
+        if 'module_voltage_diff' in self.alerts.index and 'module_voltage' in module.values:
+            self.alerts.update(module.identifier, None, 'module_voltage_diff',
+                               abs(module.module_voltage - module.calc_voltage()))
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     script_dir = os.path.dirname(os.path.realpath(__file__))
 
+    profiler.start_profiler(sys.argv, 'mqtt_live')
     app = QtWidgets.QApplication(sys.argv)
     settings_dialog = SettingsDialog(MqttLiveWindow.DEFAULT_SETTINGS, MqttLiveWindow.SETTINGS_FILE)
     if settings_dialog.result == 1:
@@ -0,0 +1,119 @@
+import struct
+
+MODULE_TOPICS: list = [
+    'available',
+    'build_timestamp',
+    'chip_temp',
+    'module_temps',
+    'module_topic',
+    'module_voltage',
+    'pec15_error_count',
+    'total_system_current',
+    'total_system_voltage',
+    'uptime'
+]
+CELL_TOPICS: list = [
+    'voltage',
+    'is_balancing'
+]
+# all cells of a module in one message: 'cells' is csv 'v1,...,v12;mask',
+# 'cells_bin' is PACKED_CELLS (little-endian millivolts, 0xffff for a missing cell, then the balancing bitmask)
+PACKED_TOPICS: list = [
+    'cells',
+    'cells_bin'
+]
+PACKED_CELLS = struct.Struct('<12HH')
+TOTAL_TOPICS: list = [
+    'total_voltage',
+    'total_current'
+]
+
+MODULE = 'module'
+CELL = 'cell'
+CELLS = 'cells'
+TOTAL = 'total'
+BALANCING_ENABLED = 'balancing_enabled'
+OTHER = 'other'
+
+# mqtt 5 subscription identifiers, the broker tags each message with the one of its subscription
+SUBSCRIPTION_MODULE: int = 1
+SUBSCRIPTION_TOTAL: int = 2
+SUBSCRIPTION_BALANCING_ENABLED: int = 3
+SUBSCRIPTION_SYNC: int = 4
+
+
+def subscription_id(topic_filter: str) -> int | None:
+    if topic_filter.startswith('esp-module/'):
+        return SUBSCRIPTION_MODULE
+    if topic_filter.startswith('esp-total/'):
+        return SUBSCRIPTION_TOTAL
+    if topic_filter == 'master/core/config/balancing_enabled':
+        return SUBSCRIPTION_BALANCING_ENABLED
+    return None
+
+
+def strip_prefix(topic: str, prefix: str) -> str:
+    if len(prefix) > 0 and topic.startswith(prefix):
+        return topic[len(prefix):]
+    return topic
+
+
+# (kind, identifier, cell number, field) for a topic without mqtt_prefix, None if it is not used by any view
+def decode_topic(topic: str) -> tuple[str, str | None, int | None, str] | None:
+    if topic.startswith('esp-module/'):
+        return decode_module_topic(topic)
+    elif topic.startswith('esp-total/'):
+        return decode_total_topic(topic)
+    elif topic == 'master/core/config/balancing_enabled':
+        return BALANCING_ENABLED, None, None, BALANCING_ENABLED
+    return None
+
+
+# same as decode_topic, the subscription identifier already tells which tree the topic is from
+def decode_tagged_topic(tag: int, topic: str) -> tuple[str, str | None, int | None, str] | None:
+    if tag == SUBSCRIPTION_MODULE:
+        return decode_module_topic(topic)
+    if tag == SUBSCRIPTION_TOTAL:
+        return decode_total_topic(topic)
+    if tag == SUBSCRIPTION_BALANCING_ENABLED:
+        return BALANCING_ENABLED, None, None, BALANCING_ENABLED
+    return decode_topic(topic)
+
+
+def decode_module_topic(topic: str) -> tuple[str, str | None, int | None, str] | None:
+    parts = topic.split('/')
+    if len(parts) < 3:
+        return None
+    identifier = parts[1]
+    if len(parts) == 3:
+        if parts[2] in MODULE_TOPICS:
+            return MODULE, identifier, None, parts[2]
+        if parts[2] in PACKED_TOPICS:
+            return CELLS, identifier, None, parts[2]
+    elif len(parts) == 5 and parts[2] == 'cell':
+        if parts[4] in CELL_TOPICS and parts[3].isdigit():
+            return CELL, identifier, int(parts[3]), parts[4]
+    elif len(parts) == 6 and parts[2] == 'accurate' and parts[3] == 'cell':
+        if parts[5] in CELL_TOPICS and parts[4].isdigit():
+            return CELL, identifier, int(parts[4]), f'accurate_{parts[5]}'
+    return OTHER, identifier, None, '/'.join(parts[2:])
+
+
+def decode_total_topic(topic: str) -> tuple[str, str | None, int | None, str] | None:
+    field = topic[len('esp-total/'):]
+    if field in TOTAL_TOPICS:
+        return TOTAL, None, None, field
+    return None
+
+
+def decode_packed_cells(field: str, payload: bytes) -> tuple[list[float | None], int | None]:
+    # raises ValueError or struct.error on malformed payloads
+    if field == 'cells_bin':
+        values = PACKED_CELLS.unpack(payload)
+        return [None if value == 0xffff else value / 1000 for value in values[:-1]], values[-1]
+    text = payload.decode()
+    mask: int | None = None
+    if ';' in text:
+        text, mask_text = text.split(';', 1)
+        mask = int(mask_text, 0)
+    return [float(value) if len(value) > 0 else None for value in text.split(',')], mask
@@ -0,0 +1,552 @@
+import asyncio
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+from PySide6 import QtCore
+
+import mqtt_ingest
+
+
+class PublishAck:
+    def __init__(self, info: mqtt.MQTTMessageInfo, qos: int):
+        self.mid: int = info.mid
+        self.rc: mqtt.MQTTErrorCode = info.rc
+        self.qos: int = qos
+        self.published: bool = False
+        self.callbacks: list[Callable[['PublishAck'], None]] = []
+
+    def done(self) -> bool:
+        return self.published or self.rc != mqtt.MQTT_ERR_SUCCESS
+
+    def add_done_callback(self, callback: Callable[['PublishAck'], None]):
+        if self.done():
+            callback(self)
+        else:
+            self.callbacks.append(callback)
+
+    def finish(self, rc: mqtt.MQTTErrorCode = mqtt.MQTT_ERR_SUCCESS):
+        self.rc = rc
+        self.published = rc == mqtt.MQTT_ERR_SUCCESS
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def __await__(self):
+        # needs the asyncio loop of the gui thread, see utils_qt.exec_app
+        if not self.done():
+            future = asyncio.get_running_loop().create_future()
+            self.add_done_callback(lambda ack: future.done() or future.set_result(ack))
+            yield from future.__await__()
+        return self.published
+
+
+def message_subscription_id(msg: mqtt.MQTTMessage) -> int | None:
+    subscription_ids = getattr(msg.properties, 'SubscriptionIdentifier', None)
+    if isinstance(subscription_ids, list):
+        return subscription_ids[0] if len(subscription_ids) > 0 else None
+    return subscription_ids
+
+
+class MqttTransport:
+    # a broker without mqtt 5 refuses, drops or garbles the connect, without a connack in time 3.1.1 is used
+    FALLBACK_TIMEOUT: float = 5.0
+
+    def __init__(self, host: str, username: str, password: str, port: int = 1883, keepalive: int = 60,
+                 protocol: str = '3.1.1', receive_maximum: int = 0, session_expiry: int = 0):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.username = username
+        self.password = password
+        self.on_connect: Callable[[], None] | None = None
+        self.on_message: Callable[[str, bytes], None] | None = None
+        self.connect_count: int = 0
+        self.reconnect_count: int = 0
+        self.pending_acks: dict[int, PublishAck] = {}
+
+        self.protocol: int = mqtt.MQTTv5 if protocol == '5' else mqtt.MQTTv311
+        self.receive_maximum = receive_maximum
+        self.session_expiry = session_expiry
+        # a fixed client id lets the broker resume the session after a reconnect
+        self.client_id: str = f'mqtt-live-{uuid.uuid4().hex[:12]}'
+        self.fallback_deadline: float | None = None
+        # mqtt 5 only: subscription identifier of the message being delivered and topic aliases of this connection
+        self.subscription_id: int | None = None
+        # retain flag of the message being delivered, set for retained messages sent because of a subscribe
+        self.retained: bool = False
+        self.subscription_ids_available: bool = True
+        self.topic_alias_maximum: int = 0
+        self.topic_aliases: dict[str, int] = {}
+        self.aliased_publishes: int = 0
+
+        self.client = self.create_client()
+
+    def create_client(self) -> mqtt.Client:
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id, protocol=self.protocol)
+        client.username_pw_set(self.username, self.password)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.on_publish = self._on_publish
+        return client
+
+    def connect_arguments(self) -> dict:
+        if self.protocol != mqtt.MQTTv5:
+            return {}
+        self.fallback_deadline = time.monotonic() + self.FALLBACK_TIMEOUT
+        properties = Properties(PacketTypes.CONNECT)
+        if self.receive_maximum > 0:
+            properties.ReceiveMaximum = self.receive_maximum
+        if self.session_expiry > 0:
+            properties.SessionExpiryInterval = self.session_expiry
+        return {'clean_start': mqtt.MQTT_CLEAN_START_FIRST_ONLY, 'properties': properties}
+
+    def connack(self, reason_code: mqtt.ReasonCode, properties: Properties | None):
+        if reason_code.is_failure:
+            if self.protocol == mqtt.MQTTv5 and reason_code.getName() == 'Unsupported protocol version':
+                self.fallback_deadline = 0
+            return
+        self.fallback_deadline = None
+        self.topic_alias_maximum = getattr(properties, 'TopicAliasMaximum', 0)
+        self.subscription_ids_available = getattr(properties, 'SubscriptionIdentifierAvailable', 1) == 1
+
+    def check_fallback(self) -> bool:
+        if self.fallback_deadline is None or time.monotonic() < self.fallback_deadline:
+            return False
+        print('mqtt 5 connect failed, falling back to 3.1.1')
+        self.fallback_deadline = None
+        self.protocol = mqtt.MQTTv311
+        self.client = self.create_client()
+        return True
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def is_connected(self) -> bool:
+        return self.client.is_connected()
+
+    def queued(self) -> int:
+        return 0
+
+    def subscribe(self, topic: str, qos: int = 0, subscription_id: int | None = None):
+        if subscription_id is not None and self.protocol == mqtt.MQTTv5 and self.subscription_ids_available:
+            properties = Properties(PacketTypes.SUBSCRIBE)
+            properties.SubscriptionIdentifier = subscription_id
+            self.client.subscribe(topic, qos, properties=properties)
+        else:
+            self.client.subscribe(topic, qos)
+
+    def unsubscribe(self, topic: str):
+        self.client.unsubscribe(topic)
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False, alias: bool = False) -> PublishAck:
+        properties, defined = None, False
+        if alias and self.protocol == mqtt.MQTTv5 and self.topic_alias_maximum > 0 and self.client.is_connected():
+            # the first publish defines the alias, later ones send an empty topic
+            number = self.topic_aliases.get(topic)
+            if number is None and len(self.topic_aliases) < self.topic_alias_maximum:
+                number = self.topic_aliases[topic] = len(self.topic_aliases) + 1
+                defined = True
+            if number is not None:
+                properties = Properties(PacketTypes.PUBLISH)
+                properties.TopicAlias = number
+                if not defined:
+                    topic = ''
+                    self.aliased_publishes += 1
+        info = self.client.publish(topic, payload=payload, qos=qos, retain=retain, properties=properties)
+        if defined and info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self.topic_aliases.pop(topic)
+        ack = PublishAck(info, qos)
+        if not ack.done():
+            self.pending_acks[ack.mid] = ack
+        return ack
+
+    def connected(self):
+        self.topic_aliases.clear()
+        self.connect_count += 1
+        if self.connect_count > 1:
+            self.reconnect_count += 1
+        if self.on_connect is not None:
+            self.on_connect()
+
+    def disconnected(self):
+        for mid in [mid for mid in self.pending_acks if self.pending_acks[mid].qos == 0]:
+            self.pending_acks.pop(mid).finish(mqtt.MQTT_ERR_CONN_LOST)
+
+    def deliver(self, topic: str, payload: bytes, subscription_id: int | None = None, retained: bool = False):
+        if self.on_message is not None:
+            self.subscription_id = subscription_id
+            self.retained = retained
+            self.on_message(topic, payload)
+            self.subscription_id = None
+            self.retained = False
+
+    def published(self, mid: int):
+        ack = self.pending_acks.pop(mid, None)
+        if ack is not None:
+            ack.finish()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        pass
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        pass
+
+    def _on_message(self, client, userdata, msg: mqtt.MQTTMessage):
+        pass
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        pass
+
+
+class ThreadedMqttTransport(MqttTransport):
+    def __init__(self, host: str, username: str, password: str, signal: QtCore.SignalInstance, port: int = 1883,
+                 keepalive: int = 60, **options):
+        self.signal = signal
+        self.emitted: int = 0
+        self.delivered: int = 0
+        self.fallback_timer: threading.Timer | None = None
+        super().__init__(host, username, password, port, keepalive, **options)
+
+    def create_client(self) -> mqtt.Client:
+        client = super().create_client()
+        client.reconnect_delay_set(1, 60)
+        return client
+
+    def start(self):
+        self.client.connect_async(host=self.host, port=self.port, keepalive=self.keepalive,
+                                  **self.connect_arguments())
+        self.client.loop_start()
+        if self.fallback_deadline is not None:
+            self.fallback_timer = threading.Timer(self.FALLBACK_TIMEOUT + 0.5,
+                                                  lambda: self.signal.emit({'func': self.fall_back}))
+            self.fallback_timer.daemon = True
+            self.fallback_timer.start()
+
+    def fall_back(self):
+        client = self.client
+        if self.check_fallback():
+            client.loop_stop()
+            self.start()
+
+    def stop(self):
+        if self.fallback_timer is not None:
+            self.fallback_timer.cancel()
+        self.client.loop_stop()
+
+    def queued(self) -> int:
+        return self.emitted - self.delivered
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        self.connack(reason_code, properties)
+        if not reason_code.is_failure:
+            self.signal.emit({'func': self.connected})
+        elif self.fallback_deadline == 0:
+            self.signal.emit({'func': self.fall_back})
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.signal.emit({'func': self.disconnected})
+
+    def _on_message(self, client, userdata, msg: mqtt.MQTTMessage):
+        self.emitted += 1
+        self.signal.emit({'func': self.deliver_message, 'arg': msg})
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        self.signal.emit({'func': self.published, 'arg': mid})
+
+    def deliver_message(self, msg: mqtt.MQTTMessage):
+        self.delivered += 1
+        self.deliver(msg.topic, msg.payload, message_subscription_id(msg), bool(msg.retain))
+
+
+class _SocketBridge(QtCore.QObject):
+    socket_event = QtCore.Signal(str, object)
+    connect_failed = QtCore.Signal(str)
+
+
+class QtMqttTransport(MqttTransport):
+    def __init__(self, host: str, username: str, password: str, port: int = 1883, keepalive: int = 60,
+                 min_backoff: float = 1.0, max_backoff: float = 60.0, **options):
+        self.bridge = _SocketBridge()
+        super().__init__(host, username, password, port, keepalive, **options)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.attempt: int = 0
+        self.connecting: bool = False
+        self.stopped: bool = True
+        self.read_notifier: QtCore.QSocketNotifier | None = None
+        self.write_notifier: QtCore.QSocketNotifier | None = None
+
+        self.bridge.socket_event.connect(self.socket_event)
+        self.bridge.connect_failed.connect(self.connect_failed)
+
+        self.misc_timer = QtCore.QTimer(self.bridge)
+        self.misc_timer.timeout.connect(self.loop_misc)
+        self.reconnect_timer = QtCore.QTimer(self.bridge)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.connect)
+
+    def create_client(self) -> mqtt.Client:
+        client = super().create_client()
+        client.on_socket_open = lambda client, userdata, sock: self.emit_socket_event('open', sock)
+        client.on_socket_close = lambda client, userdata, sock: self.emit_socket_event('close', sock)
+        client.on_socket_register_write = (
+            lambda client, userdata, sock: self.emit_socket_event('register_write', sock))
+        client.on_socket_unregister_write = (
+            lambda client, userdata, sock: self.emit_socket_event('unregister_write', sock))
+        return client
+
+    def start(self):
+        self.stopped = False
+        self.client.connect_async(host=self.host, port=self.port, keepalive=self.keepalive,
+                                  **self.connect_arguments())
+        self.misc_timer.start(1000)
+        self.connect()
+
+    def stop(self):
+        self.stopped = True
+        self.reconnect_timer.stop()
+        self.misc_timer.stop()
+        if self.client.disconnect() == mqtt.MQTT_ERR_SUCCESS:
+            self.client.loop_write()
+        self.remove_notifiers()
+
+    def connect(self):
+        if self.stopped or self.connecting:
+            return
+        self.connecting = True
+        threading.Thread(target=self.connect_worker, daemon=True).start()
+
+    def connect_worker(self):
+        # only the blocking tcp connect runs here, all socket io happens on the gui thread
+        try:
+            self.client.reconnect()
+        except (OSError, mqtt.WebsocketConnectionError) as e:
+            self.bridge.connect_failed.emit(str(e))
+            return
+        self.emit_socket_event('connected', None)
+
+    def connect_failed(self, error: str):
+        self.connecting = False
+        print('mqtt connect failed:', error)
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self):
+        if self.stopped or self.reconnect_timer.isActive():
+            return
+        backoff = min(self.max_backoff, self.min_backoff * 2 ** self.attempt)
+        self.attempt += 1
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        self.reconnect_timer.start(int(delay * 1000))
+
+    def emit_socket_event(self, event: str, sock):
+        try:
+            self.bridge.socket_event.emit(event, sock)
+        except RuntimeError:  # bridge already deleted, paho closes its socket on interpreter shutdown
+            pass
+
+    def socket_event(self, event: str, sock):
+        if event == 'open':
+            self.remove_notifiers()
+            self.read_notifier = QtCore.QSocketNotifier(sock.fileno(), QtCore.QSocketNotifier.Type.Read, self.bridge)
+            self.read_notifier.activated.connect(self.loop_read)
+            self.write_notifier = QtCore.QSocketNotifier(sock.fileno(), QtCore.QSocketNotifier.Type.Write,
+                                                         self.bridge)
+            self.write_notifier.setEnabled(False)
+            self.write_notifier.activated.connect(self.loop_write)
+        elif event == 'close':
+            self.remove_notifiers()
+        elif event == 'register_write':
+            if self.write_notifier is not None:
+                self.write_notifier.setEnabled(True)
+        elif event == 'unregister_write':
+            if self.write_notifier is not None:
+                self.write_notifier.setEnabled(False)
+        elif event == 'connected':
+            self.connecting = False
+            if self.client.want_write() and self.write_notifier is not None:
+                self.write_notifier.setEnabled(True)
+
+    def remove_notifiers(self):
+        for notifier in (self.read_notifier, self.write_notifier):
+            if notifier is not None:
+                notifier.setEnabled(False)
+                notifier.deleteLater()
+        self.read_notifier = None
+        self.write_notifier = None
+
+    def loop_read(self, *args):
+        try:
+            rc = self.client.loop_read()
+        except (IndexError, ValueError) as e:
+            # paho fails to parse the connack of a 3.1.1 broker as mqtt 5
+            print('mqtt read failed:', repr(e))
+            rc = mqtt.MQTT_ERR_PROTOCOL
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            self.connection_lost()
+
+    def loop_write(self, *args):
+        if self.client.loop_write() != mqtt.MQTT_ERR_SUCCESS:
+            self.connection_lost()
+
+    def loop_misc(self):
+        if self.connecting:
+            return
+        if self.check_fallback():
+            self.remove_notifiers()
+            self.reconnect_timer.stop()
+            self.start()
+            return
+        if self.client.loop_misc() != mqtt.MQTT_ERR_SUCCESS and not self.stopped:
+            self.schedule_reconnect()
+
+    def connection_lost(self):
+        self.remove_notifiers()
+        if not self.stopped:
+            self.schedule_reconnect()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        self.connack(reason_code, properties)
+        if reason_code.is_failure:
+            return
+        self.attempt = 0
+        self.connected()
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.disconnected()
+        self.connection_lost()
+
+    def _on_message(self, client, userdata, msg: mqtt.MQTTMessage):
+        self.deliver(msg.topic, msg.payload, message_subscription_id(msg), bool(msg.retain))
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        self.published(mid)
+
+
+class IngestMqttTransport(MqttTransport):
+    # the mqtt connection and cell decoding live in a separate process, cell values arrive through shared memory
+    # and are handed to on_message as one packed cells_bin message per changed module
+    def __init__(self, parameters: dict, capacity: int = 512, poll_interval: int = 40, event_limit: int = 5000):
+        super().__init__(parameters['host'], parameters['username'], parameters['password'])
+        self.parameters = {key: parameters[key] for key in ('host', 'username', 'password')} | {
+            'mqtt_prefix': parameters.get('mqtt_prefix', ''),
+            'port': int(parameters.get('port', 1883)),
+        }
+        self.mqtt_prefix: str = self.parameters['mqtt_prefix']
+        if len(self.mqtt_prefix) > 0 and not self.mqtt_prefix.endswith('/'):
+            self.mqtt_prefix = f'{self.mqtt_prefix}/'
+        self.capacity = capacity
+        self.event_limit = event_limit
+        self.context = multiprocessing.get_context('spawn')
+        self.events: multiprocessing.Queue = self.context.Queue()
+        self.control: multiprocessing.Queue = self.context.Queue()
+        self.shm = SharedMemory(create=True, size=mqtt_ingest.CellTable.size(capacity))
+        self.table = mqtt_ingest.CellTable(self.shm, capacity)
+        self.slots: dict[int, str] = {}
+        self.seqs: list[int] = [0] * capacity
+        self.connected_state: bool = False
+        self.ack_counter: int = 0
+        self.process: multiprocessing.Process | None = None
+        self.frame_count: int = 0
+        self.rows_delivered: int = 0
+        self.poll_timer = QtCore.QTimer()
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.process = self.context.Process(
+            target=mqtt_ingest.run_ingest, name='mqtt ingest', daemon=True,
+            args=(self.parameters, self.shm.name, self.capacity, self.events, self.control))
+        self.process.start()
+        self.poll_timer.start()
+
+    def stop(self):
+        self.poll_timer.stop()
+        if self.process is not None:
+            self.control.put(('stop',))
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        self.table.buffer.release()
+        self.shm.close()
+        self.shm.unlink()
+
+    def is_connected(self) -> bool:
+        return self.connected_state
+
+    def queued(self) -> int:
+        try:
+            return self.events.qsize()
+        except NotImplementedError:
+            return 0
+
+    def subscribe(self, topic: str, qos: int = 0, subscription_id: int | None = None):
+        self.control.put(('subscribe', topic, qos))
+
+    def unsubscribe(self, topic: str):
+        self.control.put(('unsubscribe', topic))
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False, alias: bool = False) -> PublishAck:
+        self.ack_counter += 1
+        ack = PublishAck(mqtt.MQTTMessageInfo(self.ack_counter), qos)
+        self.pending_acks[ack.mid] = ack
+        if isinstance(payload, (int, float)):
+            payload = str(payload)
+        self.control.put(('publish', ack.mid, topic, payload, qos, retain))
+        return ack
+
+    def poll(self):
+        # events are taken first, so the rows read afterwards contain every cell written before the last event
+        events = mqtt_ingest.drain(self.events, self.event_limit)
+        for event in events:
+            if event[0] == 'slot':
+                self.slots[event[2]] = event[1]
+        self.frame_count += 1
+        for slot, identifier in self.slots.items():
+            seq, row = self.table.read(slot, self.seqs[slot])
+            if row is None:
+                continue
+            self.seqs[slot] = seq
+            self.rows_delivered += 1
+            self.deliver(f'{self.mqtt_prefix}esp-module/{identifier}/cells_bin', row)
+        for event in events:
+            if event[0] == 'message':
+                self.deliver(event[1], event[2], retained=event[3])
+            elif event[0] == 'connect':
+                self.connected_state = True
+                self.connected()
+            elif event[0] == 'disconnect':
+                self.connected_state = False
+                self.disconnected()
+            elif event[0] == 'published':
+                ack = self.pending_acks.pop(event[1], None)
+                if ack is not None:
+                    ack.finish(mqtt.MQTTErrorCode(event[2]))
+
+
+def create_transport(parameters: dict, signal: QtCore.SignalInstance) -> MqttTransport:
+    # the ingest process always speaks 3.1.1, the cell values it decodes don't carry subscription identifiers
+    options = {
+        'protocol': str(parameters.get('mqtt_protocol', '3.1.1')),
+        'receive_maximum': int(parameters.get('receive_maximum', 0)),
+        'session_expiry': int(parameters.get('session_expiry', 0)),
+        'port': int(parameters.get('port', 1883)),
+    }
+    if parameters.get('mqtt_transport', 'qt') == 'thread':
+        return ThreadedMqttTransport(parameters['host'], parameters['username'], parameters['password'], signal,
+                                     **options)
+    if parameters.get('mqtt_transport', 'qt') == 'process':
+        return IngestMqttTransport(parameters)
+    return QtMqttTransport(parameters['host'], parameters['username'], parameters['password'], **options)
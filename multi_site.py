@@ -0,0 +1,151 @@
+import copy
+import sys
+from pathlib import Path
+
+from PySide6 import QtCore, QtWidgets
+from PySide6.QtWidgets import QTableWidget, QTableWidgetItem
+
+import mqtt_topics
+from custom_signal_window import CustomSignalWindow
+from mqtt_hub import HubClient, MqttHub
+from mqtt_live import MqttLiveWindow
+from site_state import SiteState
+from subscriptions import WIDE_TOPICS
+from utils import get_config_local
+from utils_qt import exec_app
+
+
+class Site:
+    def __init__(self, name: str, parameters: dict, hub: MqttHub):
+        self.name = name
+        self.parameters = parameters
+        self.mqtt_prefix: str = parameters.get('mqtt_prefix', '')
+        if len(self.mqtt_prefix) > 0 and not self.mqtt_prefix.endswith('/'):
+            self.mqtt_prefix = f'{self.mqtt_prefix}/'
+        hide_modules = str(parameters.get('hide_modules', 'none'))
+        hidden: set[str] = set()
+        if hide_modules != '' and hide_modules.lower() != 'none':
+            hidden = set(hide_modules.split(','))
+        self.state = SiteState(hidden)
+        self.client: HubClient = hub.client(parameters)
+        self.client.on_connect = self.subscribe
+        self.client.on_decoded = self.dispatch
+        self.view: MqttLiveWindow | None = None
+
+    def subscribe(self):
+        for topic_filter in WIDE_TOPICS:
+            self.client.subscribe(f'{self.mqtt_prefix}{topic_filter}',
+                                  subscription_id=mqtt_topics.subscription_id(topic_filter))
+
+    def dispatch(self, topic: str, decoded: tuple | None, payload: bytes):
+        # the open view gets its messages from the hub itself
+        if len(payload) < 1 or decoded is None:
+            return
+        if decoded[0] == mqtt_topics.CELLS:
+            self.state.apply_packed(decoded[1], decoded[3], payload)
+        elif decoded[0] != mqtt_topics.OTHER:
+            self.state.apply(decoded, payload.decode())
+
+
+class MultiSiteWindow:
+    HEADERS: list[str] = ['site', 'state', 'modules', 'min', 'max', 'diff', 'median', 'voltage', 'current', 'power',
+                          'messages']
+
+    @staticmethod
+    def load_profiles(config_file: str) -> dict[str, dict]:
+        save_file: dict = get_config_local(Path(config_file))
+        if 'error' in save_file:
+            return {}
+        profiles: dict[str, dict] = {}
+        for key in save_file:
+            if key == 'last_used':
+                continue
+            parameters = copy.deepcopy(MqttLiveWindow.DEFAULT_SETTINGS) | save_file[key]
+            prefix = parameters.get('mqtt_prefix', '')
+            name = f"{parameters['host']} {prefix}".strip()
+            if name in profiles:
+                # same broker and prefix in two saved profiles, both are kept under the profile key
+                print(f'profile {key} duplicates site {name}')
+                name = f'{name} ({key})'
+            profiles[name] = parameters
+        return profiles
+
+    def __init__(self, profiles: dict[str, dict]):
+        if not QtWidgets.QApplication.instance():
+            self.app = QtWidgets.QApplication(sys.argv)
+        else:
+            self.app = QtWidgets.QApplication.instance()
+        self.main_window = CustomSignalWindow()
+        self.main_window.setWindowTitle('multi site')
+        self.table = QTableWidget(len(profiles), len(self.HEADERS), self.main_window)
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.cellDoubleClicked.connect(self.drill_down)
+        self.main_window.setCentralWidget(self.table)
+
+        # sites on the same broker (different mqtt_prefix) and their drill down views share one connection
+        self.hub = MqttHub(self.main_window.signal)
+        self.sites: list[Site] = []
+        for row, name in enumerate(profiles):
+            site = Site(name, profiles[name], self.hub)
+            self.sites.append(site)
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            site.client.start()
+
+        timer = QtCore.QTimer(self.main_window)
+        timer.timeout.connect(self.refresh)
+        timer.start(1000)
+
+    def show(self):
+        self.main_window.resize(900, 60 + 30 * len(self.sites))
+        self.main_window.show()
+        sys.exit(exec_app())
+
+    def drill_down(self, row: int, column: int):
+        site = self.sites[row]
+        if site.view is not None:
+            site.view.main_window.raise_()
+            site.view.main_window.activateWindow()
+            return
+        site.view = MqttLiveWindow(site.parameters, as_app=False, transport=self.hub.client(site.parameters))
+        site.view.on_close = lambda: self.close_view(site)
+        site.view.main_window.setWindowTitle(site.name)
+        site.view.show()
+
+    @staticmethod
+    def close_view(site: Site):
+        site.view = None
+
+    def refresh(self):
+        for row, site in enumerate(self.sites):
+            connected = site.client.is_connected()
+            self.set_text(row, 'state', 'online' if connected else 'DISCONNECTED!')
+            self.set_text(row, 'messages', str(site.state.message_count))
+            if not site.state.dirty:
+                continue
+            site.state.dirty = False
+            stats = site.state.stats()
+            self.set_text(row, 'modules', str(stats['modules']))
+            self.set_text(row, 'voltage', f"{stats['total_voltage']:.2f} V")
+            self.set_text(row, 'current', f"{stats['total_current']:.2f} A")
+            self.set_text(row, 'power', f"{stats['power']:.0f} W")
+            if 'cell_min' in stats:
+                self.set_text(row, 'min', f"{stats['cell_min']:.3f} V")
+                self.set_text(row, 'max', f"{stats['cell_max']:.3f} V")
+                self.set_text(row, 'diff', f"{stats['cell_diff']:.0f} mV")
+                self.set_text(row, 'median', f"{stats['cell_median']:.3f} V")
+        self.table.resizeColumnsToContents()
+
+    def set_text(self, row: int, header: str, text: str):
+        column = self.HEADERS.index(header)
+        item = self.table.item(row, column)
+        if item is None:
+            self.table.setItem(row, column, QTableWidgetItem(text))
+        elif item.text() != text:
+            item.setText(text)
+
+
+if __name__ == '__main__':
+    app = QtWidgets.QApplication(sys.argv)
+    multi_site = MultiSiteWindow(MultiSiteWindow.load_profiles(MqttLiveWindow.SETTINGS_FILE))
+    multi_site.show()
@@ -0,0 +1,49 @@
+import json
+import statistics
+import time
+from typing import Callable
+
+
+def module_metrics(voltages: list[float]) -> dict[str, float]:
+    return {
+        'median': round(statistics.median(voltages), 4),
+        'imbalance': round((max(voltages) - min(voltages)) * 1000, 1),
+    }
+
+
+class PackMetricsPublisher:
+    def __init__(self, publish: Callable[[str, str], None], topic_prefix: str, min_interval: float,
+                 min_change: dict[str, float]):
+        self.publish = publish
+        self.topic_prefix: str = topic_prefix if topic_prefix.endswith('/') else f'{topic_prefix}/'
+        self.min_interval = min_interval
+        self.min_change = min_change
+        self.last_values: dict[str, dict[str, float]] = {}
+        self.last_times: dict[str, float] = {}
+        self.published_count: int = 0
+        self.suppressed_count: int = 0
+
+    def changed(self, topic: str, values: dict[str, float]) -> bool:
+        last = self.last_values.get(topic)
+        if last is None or last.keys() != values.keys():
+            return True
+        for key, value in values.items():
+            if abs(value - last[key]) >= self.min_change.get(key, 0) and value != last[key]:
+                return True
+        return False
+
+    def update(self, topic: str, values: dict[str, float], now: float | None = None):
+        now = now if now is not None else time.monotonic()
+        if now - self.last_times.get(topic, -self.min_interval) < self.min_interval:
+            return
+        if not self.changed(topic, values):
+            self.suppressed_count += 1
+            return
+        self.last_values[topic] = values
+        self.last_times[topic] = now
+        self.publish(f'{self.topic_prefix}{topic}', json.dumps(values, separators=(',', ':')))
+        self.published_count += 1
+
+    def remove(self, topic: str):
+        self.last_values.pop(topic, None)
+        self.last_times.pop(topic, None)
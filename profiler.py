@@ -0,0 +1,134 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+ENV_VARIABLE: str = 'MANAGEMENT_GUI_PROFILE'
+MAX_DEPTH: int = 128
+
+
+class SamplingProfiler:
+    def __init__(self, output: Path, interval: float = 0.01, thread_id: int | None = None):
+        self.output = output
+        self.interval = interval
+        self.thread_id: int = thread_id if thread_id is not None else threading.main_thread().ident
+        self.samples: dict[tuple[str, ...], int] = {}
+        self.sample_count: int = 0
+        self.names: dict[object, str] = {}
+        self.lock = threading.Lock()
+        self.running: bool = False
+        self.thread: threading.Thread | None = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='sampling profiler', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.write()
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = self.collapse(frame)
+                with self.lock:
+                    self.samples[stack] = self.samples.get(stack, 0) + 1
+                    self.sample_count += 1
+            del frame
+            time.sleep(self.interval)
+
+    def frame_name(self, frame) -> str:
+        code = frame.f_code
+        name = self.names.get(code)
+        if name is None:
+            name = f'{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            self.names[code] = name
+        if code.co_name == 'signaling':
+            # attribute queued gui work to its target instead of the generic CustomSignalWindow.signaling
+            work = frame.f_locals.get('work')
+            if isinstance(work, dict) and 'func' in work:
+                func = work['func']
+                name = f"{name} -> {getattr(func, '__qualname__', repr(func))}"
+        return name
+
+    def collapse(self, frame) -> tuple[str, ...]:
+        names: list[str] = []
+        while frame is not None and len(names) < MAX_DEPTH:
+            names.append(self.frame_name(frame))
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names)
+
+    def write(self, output: Path | None = None):
+        output = output or self.output
+        with self.lock:
+            samples = dict(self.samples)
+        if output.name.endswith('.json'):
+            self.write_speedscope(output, samples)
+        else:
+            with open(output, 'w') as file:
+                for stack, count in samples.items():
+                    file.write(f"{';'.join(stack)} {count}\n")
+        print(f'profile: {sum(samples.values())} samples written to {output}')
+
+    def write_speedscope(self, output: Path, samples: dict[tuple[str, ...], int]):
+        frames: list[dict] = []
+        frame_index: dict[str, int] = {}
+        speedscope_samples: list[list[int]] = []
+        weights: list[float] = []
+        for stack, count in samples.items():
+            indices: list[int] = []
+            for name in stack:
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    frames.append({'name': name})
+                indices.append(frame_index[name])
+            speedscope_samples.append(indices)
+            weights.append(count * self.interval)
+        with open(output, 'w') as file:
+            json.dump({
+                '$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'shared': {'frames': frames},
+                'profiles': [{
+                    'type': 'sampled',
+                    'name': 'gui thread',
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': sum(weights),
+                    'samples': speedscope_samples,
+                    'weights': weights,
+                }],
+            }, file)
+
+
+active_profiler: SamplingProfiler | None = None
+
+
+def start_profiler(argv: list[str], name: str) -> SamplingProfiler | None:
+    global active_profiler
+    output: str | None = os.environ.get(ENV_VARIABLE)
+    for arg in argv[1:]:
+        if arg == '--profile':
+            output = ''
+        elif arg.startswith('--profile='):
+            output = arg[len('--profile='):]
+    if output is None:
+        return None
+    if output in ('', '1'):
+        output = f'{name}-{time.strftime("%Y%m%d%H%M%S")}.folded'
+    active_profiler = SamplingProfiler(Path(output))
+    active_profiler.start()
+    return active_profiler
+
+
+def write_profile():
+    if active_profiler is not None:
+        active_profiler.write()
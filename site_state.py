@@ -0,0 +1,133 @@
+import math
+import statistics
+import struct
+
+import mqtt_topics
+
+
+class ModuleState:
+    __slots__ = ('voltages', 'module_voltage', 'hide', 'online', 'aliased')
+
+    def __init__(self, hide: bool):
+        self.voltages: list[float | None] = [None] * 12
+        self.module_voltage: float = 0.0
+        # hidden by hide_modules, by its availability or as the mac module of a numbered alias, each kept on its own
+        # so a repeated available message doesn't count an aliased module twice
+        self.hide: bool = hide
+        self.online: bool = True
+        self.aliased: bool = False
+
+    @property
+    def hidden(self) -> bool:
+        return self.hide or not self.online or self.aliased
+
+
+def parse_float(value: str) -> float:
+    # float() accepts nan and inf, which would end up in every later sum and in the json sent to browsers
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'not a finite number: {value}')
+    return number
+
+
+class SiteState:
+    def __init__(self, hide_modules: set[str] | None = None):
+        self.hide_modules: set[str] = hide_modules or set()
+        self.modules: dict[str, ModuleState] = {}
+        self.total_voltage: float = 0.0
+        self.total_current: float = 0.0
+        self.message_count: int = 0
+        self.bad_messages: int = 0
+        self.dirty: bool = True
+
+    def get_module(self, identifier: str) -> ModuleState:
+        module = self.modules.get(identifier)
+        if module is None:
+            module = ModuleState(identifier in self.hide_modules)
+            self.modules[identifier] = module
+        return module
+
+    def apply(self, decoded: tuple, value: str):
+        kind, identifier, number, field = decoded
+        self.message_count += 1
+        try:
+            if kind == mqtt_topics.TOTAL:
+                if field == 'total_voltage':
+                    self.total_voltage = parse_float(value)
+                elif field == 'total_current':
+                    self.total_current = parse_float(value) * -1.0
+                self.dirty = True
+                return
+            if identifier is None:
+                return
+            module = self.get_module(identifier)
+            if kind == mqtt_topics.CELL:
+                if field == 'voltage' and 1 <= number <= len(module.voltages):
+                    module.voltages[number - 1] = parse_float(value)
+                    self.dirty = True
+            elif kind == mqtt_topics.MODULE:
+                if field == 'available':
+                    module.online = value == 'online'
+                    self.dirty = True
+                elif field == 'module_topic':
+                    alias = value[value.find('/') + 1:]
+                    if alias != identifier and not module.hidden:
+                        self.get_module(alias)
+                        module.aliased = True
+                        self.dirty = True
+                elif field == 'module_voltage':
+                    module.module_voltage = parse_float(value)
+                    self.dirty = True
+                elif field == 'total_system_voltage':
+                    self.total_voltage = parse_float(value)
+                    self.dirty = True
+                elif field == 'total_system_current':
+                    self.total_current = parse_float(value.split(',')[1]) * -1.0
+                    self.dirty = True
+        except (ValueError, IndexError):
+            self.bad_messages += 1
+            print(identifier, field, value, 'bad data!')
+
+    def apply_packed(self, identifier: str, field: str, payload: bytes):
+        self.message_count += 1
+        try:
+            voltages, _ = mqtt_topics.decode_packed_cells(field, payload)
+            if not all(voltage is None or math.isfinite(voltage) for voltage in voltages):
+                raise ValueError('not a finite number')
+        except (ValueError, struct.error):
+            self.bad_messages += 1
+            print(identifier, field, payload, 'bad data!')
+            return
+        module = self.get_module(identifier)
+        for i, voltage in enumerate(voltages[:len(module.voltages)]):
+            if voltage is not None:
+                module.voltages[i] = voltage
+        self.dirty = True
+
+    def stats(self) -> dict:
+        voltages: list[float] = []
+        module_count: int = 0
+        module_voltage: float = 0.0
+        for module in self.modules.values():
+            if module.hidden:
+                continue
+            module_count += 1
+            module_voltage += module.module_voltage
+            voltages.extend(voltage for voltage in module.voltages if voltage is not None)
+        stats: dict = {
+            'modules': module_count,
+            'module_voltage': module_voltage,
+            'total_voltage': self.total_voltage,
+            'total_current': self.total_current,
+            'power': self.total_voltage * self.total_current,
+        }
+        if len(voltages) > 0:
+            cell_min: float = min(voltages)
+            cell_max: float = max(voltages)
+            stats |= {
+                'cell_min': cell_min,
+                'cell_max': cell_max,
+                'cell_diff': (cell_max - cell_min) * 1000,
+                'cell_median': statistics.median(voltages),
+            }
+        return stats
@@ -4,11 +4,36 @@ from config_reader import ConfigReader
 
 
 class SlaveMapping(ConfigReader):
+    FILE: str = '/docker/easybms-master/slave_mapping.yaml'
+    MEASURERS: list[str] = ['total_current_measurer', 'total_voltage_measurer']
+
     def __init__(self, config: dict):
         super().__init__(config, 'slave_mapping')
 
+    @staticmethod
+    def assignments(slave: dict) -> list[str]:
+        return [measurer for measurer in SlaveMapping.MEASURERS if slave.get(measurer, False)]
+
+    @staticmethod
+    def check(store: dict) -> list[str]:
+        problems: list[str] = []
+        slaves: dict = (store or {}).get('slaves') or {}
+        numbers: dict[int, list[str]] = {}
+        for slave_mac, slave in slaves.items():
+            numbers.setdefault(slave.get('number'), []).append(slave_mac)
+        for number, macs in numbers.items():
+            if number is None:
+                problems.append(f'no number: {", ".join(macs)}')
+            elif len(macs) > 1:
+                problems.append(f'number {number} used by {", ".join(macs)}')
+        for measurer in SlaveMapping.MEASURERS:
+            count = sum(1 for slave in slaves.values() if slave.get(measurer, False))
+            if count != 1:
+                problems.append(f'{count} {measurer}s')
+        return problems
+
     def get_info(self):
-        self.store = self.get_yaml_file('/docker/easybms-master/slave_mapping.yaml')
+        self.store = self.get_yaml_file(self.FILE)
 
     def show_info(self):
         headers = ['Number', 'Mac', 'Assignments']
@@ -20,11 +45,7 @@ class SlaveMapping(ConfigReader):
             slave: dict = self.store['slaves'][slave_mac]
             self.table_widget.setItem(i, headers.index('Number'), QTableWidgetItem(str(slave['number'])))
             self.table_widget.setItem(i, headers.index('Mac'), QTableWidgetItem(slave_mac))
-            assignments = []
-            if slave.get('total_current_measurer', False):
-                assignments.append('total_current_measurer')
-            if slave.get('total_voltage_measurer', False):
-                assignments.append('total_voltage_measurer')
-            self.table_widget.setItem(i, headers.index('Assignments'), QTableWidgetItem(', '.join(assignments)))
+            self.table_widget.setItem(i, headers.index('Assignments'),
+                                      QTableWidgetItem(', '.join(self.assignments(slave))))
         self.table_widget.resizeColumnsToContents()
         self.autosize_window()
@@ -0,0 +1,28 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def snapshot_path(host: str, mqtt_prefix: str) -> Path:
+    h = hashlib.new('sha1')
+    h.update(f'{host}/{mqtt_prefix}'.encode())
+    return Path(f'mqtt_live_snapshot_{h.hexdigest()[:10]}.json')
+
+
+def read_snapshot(filename: Path) -> dict:
+    if not filename.exists():
+        return {}
+    try:
+        with open(filename, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(e)
+        return {}
+
+
+def write_snapshot(filename: Path, snapshot: dict):
+    tmp_filename = filename.with_suffix('.tmp')
+    with open(tmp_filename, 'w') as file:
+        json.dump(snapshot, file, separators=(',', ':'))
+    os.replace(tmp_filename, filename)
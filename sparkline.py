@@ -0,0 +1,67 @@
+from typing import Iterable
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+
+class Sparkline(QtWidgets.QWidget):
+    def __init__(self, title: str, unit: str, parent: QtWidgets.QWidget | None = None,
+                 minimum: float | None = None, maximum: float | None = None):
+        super().__init__(parent)
+        self.title = title
+        self.unit = unit
+        self.minimum = minimum
+        self.maximum = maximum
+        self.values: Iterable[float] = ()
+        self.setMinimumSize(220, 70)
+
+    def set_values(self, values: Iterable[float]):
+        self.values = values
+        self.update()
+
+    def paintEvent(self, a0: QtGui.QPaintEvent) -> None:
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing)
+        rect = self.rect().adjusted(2, 18, -2, -2)
+        painter.setPen(self.palette().color(QtGui.QPalette.ColorRole.Mid))
+        painter.drawRect(rect)
+        values = list(self.values)
+        text = self.title
+        if len(values) > 0:
+            text = f'{self.title}: {values[-1]:.1f} {self.unit}'
+        painter.setPen(self.palette().color(QtGui.QPalette.ColorRole.WindowText))
+        painter.drawText(QtCore.QRect(2, 0, self.width() - 4, 16), QtCore.Qt.AlignmentFlag.AlignLeft, text)
+        if len(values) < 2:
+            return
+        low = self.minimum if self.minimum is not None else min(values)
+        high = self.maximum if self.maximum is not None else max(values)
+        if high - low < 1e-9:
+            high = low + 1
+        step = rect.width() / (len(values) - 1)
+        points = [QtCore.QPointF(rect.left() + i * step,
+                                 rect.bottom() - (min(high, max(low, value)) - low) / (high - low) * rect.height())
+                  for i, value in enumerate(values)]
+        painter.setPen(QtGui.QPen(self.palette().color(QtGui.QPalette.ColorRole.Highlight), 1.5))
+        painter.drawPolyline(points)
+
+
+class SparklineGrid(QtWidgets.QWidget):
+    def __init__(self, columns: int = 3, parent: QtWidgets.QWidget | None = None):
+        super().__init__(parent)
+        self.columns = columns
+        self.layout = QtWidgets.QGridLayout(self)
+        self.charts: dict[str, Sparkline] = {}
+
+    def chart(self, key: str, title: str, unit: str, minimum: float | None = None,
+              maximum: float | None = None) -> Sparkline:
+        chart = self.charts.get(key)
+        if chart is None:
+            chart = Sparkline(title, unit, self, minimum, maximum)
+            position = len(self.charts)
+            self.layout.addWidget(chart, position // self.columns, position % self.columns)
+            self.charts[key] = chart
+        return chart
+
+    def set_series(self, key: str, values: Iterable[float]):
+        chart = self.charts.get(key)
+        if chart is not None:
+            chart.set_values(values)
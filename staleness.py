@@ -0,0 +1,93 @@
+import heapq
+import itertools
+import time
+from typing import Callable
+
+from PySide6 import QtCore
+
+TOPIC_GROUPS: dict[str, str] = {
+    'uptime': 'uptime',
+    'voltage': 'voltages',
+    'cells': 'voltages',
+    'cells_bin': 'voltages',
+    'chip_temp': 'temps',
+    'module_temps': 'temps',
+}
+
+
+def parse_thresholds(value: str) -> dict[str, float]:
+    thresholds: dict[str, float] = {}
+    for entry in value.split(','):
+        if ':' not in entry:
+            continue
+        group, seconds = entry.split(':', 1)
+        if float(seconds) > 0:
+            thresholds[group.strip()] = float(seconds)
+    return thresholds
+
+
+class StalenessTracker:
+    def __init__(self, thresholds: dict[str, float], on_stale: Callable[[str, str], None], parent: QtCore.QObject):
+        self.thresholds = thresholds
+        self.on_stale = on_stale
+        # one heap entry per (identifier, group), newer deadlines only update self.deadlines and are
+        # re-pushed when the outdated entry reaches the top of the heap
+        self.heap: list[tuple[float, int, str, str]] = []
+        self.deadlines: dict[tuple[str, str], float] = {}
+        self.queued: set[tuple[str, str]] = set()
+        self.stale: set[tuple[str, str]] = set()
+        self.counter = itertools.count()
+        self.fired: int = 0
+        self.wakeup: float | None = None
+        self.timer = QtCore.QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.expire)
+
+    def touch(self, identifier: str, topic: str) -> str | None:
+        # returns the group if it was stale before
+        group = TOPIC_GROUPS.get(topic)
+        if group is None or group not in self.thresholds:
+            return None
+        key = (identifier, group)
+        deadline = time.monotonic() + self.thresholds[group]
+        if key not in self.queued:
+            self.queued.add(key)
+            heapq.heappush(self.heap, (deadline, next(self.counter), identifier, group))
+            if self.wakeup is None or deadline < self.wakeup:
+                self.schedule(deadline)
+        self.deadlines[key] = deadline
+        if key in self.stale:
+            self.stale.remove(key)
+            return group
+        return None
+
+    def remove(self, identifier: str):
+        for group in self.thresholds:
+            self.deadlines.pop((identifier, group), None)
+            self.stale.discard((identifier, group))
+
+    def schedule(self, deadline: float):
+        self.wakeup = deadline
+        self.timer.start(max(0, int((deadline - time.monotonic()) * 1000) + 1))
+
+    def expire(self):
+        self.wakeup = None
+        now = time.monotonic()
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            deadline, _, identifier, group = heapq.heappop(self.heap)
+            key = (identifier, group)
+            actual = self.deadlines.get(key)
+            if actual is None:
+                self.queued.discard(key)
+                continue
+            if actual > now:
+                heapq.heappush(self.heap, (actual, next(self.counter), identifier, group))
+                continue
+            del self.deadlines[key]
+            self.queued.discard(key)
+            self.stale.add(key)
+            self.fired += 1
+            self.on_stale(identifier, group)
+        if len(self.heap) > 0:
+            self.schedule(self.heap[0][0])
@@ -0,0 +1,147 @@
+import time
+from typing import Callable, Iterable
+
+import mqtt_topics
+
+# fields of every module, known or not yet: discovery, aliasing, pack totals and the on demand accurate readings
+ALWAYS_FIELDS: list[str] = ['available', 'module_topic', 'total_system_voltage', 'total_system_current',
+                            'accurate_voltage', 'accurate_is_balancing']
+# fields only needed while a module is shown in the grid
+VIEW_FIELDS: list[str] = ['module_voltage', 'chip_temp', 'module_temps', 'pec15_error_count', 'voltage',
+                          'is_balancing', 'cells', 'cells_bin']
+# cell values also arrive packed, derived alert values are computed from these fields
+SOURCE_FIELDS: dict[str, list[str]] = {
+    'voltage': ['voltage', 'cells', 'cells_bin'],
+    'is_balancing': ['is_balancing', 'cells', 'cells_bin'],
+    'cell_deviation': ['voltage', 'cells', 'cells_bin'],
+    'module_voltage_diff': ['module_voltage', 'voltage', 'cells', 'cells_bin'],
+}
+STATIC_TOPICS: list[str] = ['esp-total/total_voltage', 'esp-total/total_current',
+                            'master/core/config/balancing_enabled']
+WIDE_TOPICS: list[str] = ['esp-module/#', 'esp-total/#', 'master/core/config/balancing_enabled']
+
+
+def field_path(field: str) -> str:
+    if field in mqtt_topics.CELL_TOPICS:
+        return f'cell/+/{field}'
+    if field.startswith('accurate_') and field[len('accurate_'):] in mqtt_topics.CELL_TOPICS:
+        return f'accurate/cell/+/{field[len("accurate_"):]}'
+    return field
+
+
+def demanded_fields(fields: Iterable[str]) -> set[str]:
+    known = set(mqtt_topics.MODULE_TOPICS) | set(mqtt_topics.PACKED_TOPICS) | set(mqtt_topics.CELL_TOPICS) | \
+            {f'accurate_{field}' for field in mqtt_topics.CELL_TOPICS}
+    demanded: set[str] = set()
+    for field in fields:
+        demanded.update(source for source in SOURCE_FIELDS.get(field, [field]) if source in known)
+    return demanded
+
+
+class SubscriptionManager:
+    MAX_MODULE_FILTERS: int = 500
+    RATE_WINDOW: float = 60.0
+
+    def __init__(self, subscribe: Callable[[str], None], unsubscribe: Callable[[str], None], prefix: str = '',
+                 wide: bool = False):
+        self.subscribe = subscribe
+        self.unsubscribe = unsubscribe
+        self.prefix = prefix
+        self.wide = wide
+        self.active: bool = False
+        self.subscribed: set[str] = set()
+        self.global_paths: set[str] = set()
+        self.view_paths: set[str] = set()
+        # None while every module is shown, then the view fields are subscribed with a + wildcard
+        self.view_modules: set[str] | None = None
+        # per wanted (identifier, path): messages, bytes and the first message
+        self.stats: dict[tuple[str, str], list] = {}
+        # per (identifier, path) no longer wanted: message rate, byte rate and since when
+        self.dropped: dict[tuple[str, str], tuple[float, float, float]] = {}
+        self.subscribe_count: int = 0
+        self.unsubscribe_count: int = 0
+        self.saved_messages: float = 0
+        self.saved_bytes: float = 0
+        self.unwanted_messages: int = 0
+
+    def reset(self):
+        # a new session starts without subscriptions
+        self.subscribed = set()
+        self.active = True
+
+    def update(self, global_fields: Iterable[str], view_modules: set[str] | None):
+        self.global_paths = {field_path(field) for field in demanded_fields(global_fields)}
+        self.view_paths = {field_path(field) for field in demanded_fields(VIEW_FIELDS)} - self.global_paths
+        if view_modules is not None and len(view_modules) * len(self.view_paths) > self.MAX_MODULE_FILTERS:
+            view_modules = None
+        self.view_modules = view_modules
+        self.update_savings()
+        if self.active:
+            self.apply(set(WIDE_TOPICS) if self.wide else self.filters())
+
+    def filters(self) -> set[str]:
+        filters = set(STATIC_TOPICS)
+        filters.update(f'esp-module/+/{path}' for path in self.global_paths)
+        for identifier in ['+'] if self.view_modules is None else self.view_modules:
+            filters.update(f'esp-module/{identifier}/{path}' for path in self.view_paths)
+        return filters
+
+    def apply(self, filters: set[str]):
+        # subscribe first, a short overlap only duplicates messages while a gap would lose retained ones
+        for topic_filter in sorted(filters - self.subscribed):
+            self.subscribe(f'{self.prefix}{topic_filter}')
+            self.subscribe_count += 1
+        for topic_filter in sorted(self.subscribed - filters):
+            self.unsubscribe(f'{self.prefix}{topic_filter}')
+            self.unsubscribe_count += 1
+        self.subscribed = filters
+
+    def wants(self, identifier: str, path: str) -> bool:
+        if path in self.global_paths:
+            return True
+        return path in self.view_paths and (self.view_modules is None or identifier in self.view_modules)
+
+    def accepts(self, decoded: tuple | None) -> bool:
+        # a shared connection also carries the topics other views subscribed
+        if self.wide or decoded is None or decoded[1] is None:
+            return True
+        return decoded[0] != mqtt_topics.OTHER and self.wants(decoded[1], field_path(decoded[3]))
+
+    def update_savings(self):
+        # narrowed away values keep saving at the rate they arrived before, the first (retained) message excluded
+        now = time.monotonic()
+        for key in [key for key in self.stats if not self.wants(*key)]:
+            messages, size, since = self.stats.pop(key)
+            duration = max(now - since, self.RATE_WINDOW)
+            repeated = max(messages - 1, 0)
+            self.dropped[key] = (repeated / duration, size * repeated / messages / duration, now)
+        for key in [key for key in self.dropped if self.wants(*key)]:
+            message_rate, byte_rate, since = self.dropped.pop(key)
+            self.saved_messages += message_rate * (now - since)
+            self.saved_bytes += byte_rate * (now - since)
+
+    def received(self, decoded: tuple | None, size: int):
+        if decoded is not None and decoded[0] in (mqtt_topics.TOTAL, mqtt_topics.BALANCING_ENABLED):
+            return
+        key = None if decoded is None or decoded[1] is None else (decoded[1], field_path(decoded[3]))
+        if decoded is None or decoded[0] == mqtt_topics.OTHER or key is None or not self.wants(*key):
+            # with wide subscriptions this is exactly what narrowing saves, otherwise an overlap or a stale filter
+            if self.wide:
+                self.saved_messages += 1
+                self.saved_bytes += size
+            else:
+                self.unwanted_messages += 1
+            return
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = [0, 0, time.monotonic()]
+        stats[0] += 1
+        stats[1] += size
+
+    def savings(self) -> tuple[float, float]:
+        now = time.monotonic()
+        messages, size = self.saved_messages, self.saved_bytes
+        for message_rate, byte_rate, since in self.dropped.values():
+            messages += message_rate * (now - since)
+            size += byte_rate * (now - since)
+        return messages, size
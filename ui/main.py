@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+## Form generated from reading UI file 'main.ui'
+##
+## Created by: Qt User Interface Compiler version 6.12.0
+##
+## WARNING! All changes made in this file will be lost when recompiling UI file!
+################################################################################
+
+from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
+    QMetaObject, QObject, QPoint, QRect,
+    QSize, QTime, QUrl, Qt)
+from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
+    QCursor, QFont, QFontDatabase, QGradient,
+    QIcon, QImage, QKeySequence, QLinearGradient,
+    QPainter, QPalette, QPixmap, QRadialGradient,
+    QTransform)
+from PySide6.QtWidgets import (QApplication, QGridLayout, QHeaderView, QMainWindow,
+    QMenu, QMenuBar, QSizePolicy, QSpacerItem,
+    QStatusBar, QTableWidget, QTableWidgetItem, QWidget)
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        if not MainWindow.objectName():
+            MainWindow.setObjectName(u"MainWindow")
+        MainWindow.resize(800, 600)
+        self.actionconfig = QAction(MainWindow)
+        self.actionconfig.setObjectName(u"actionconfig")
+        self.actionmqtt_live = QAction(MainWindow)
+        self.actionmqtt_live.setObjectName(u"actionmqtt_live")
+        self.actiondiagnostics = QAction(MainWindow)
+        self.actiondiagnostics.setObjectName(u"actiondiagnostics")
+        self.actiondiagnostics.setCheckable(True)
+        self.actionwrite_profile = QAction(MainWindow)
+        self.actionwrite_profile.setObjectName(u"actionwrite_profile")
+        self.centralwidget = QWidget(MainWindow)
+        self.centralwidget.setObjectName(u"centralwidget")
+        self.gridLayout = QGridLayout(self.centralwidget)
+        self.gridLayout.setObjectName(u"gridLayout")
+        self.tableWidget = QTableWidget(self.centralwidget)
+        self.tableWidget.setObjectName(u"tableWidget")
+
+        self.gridLayout.addWidget(self.tableWidget, 1, 0, 1, 2)
+
+        self.horizontalSpacer = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+
+        self.gridLayout.addItem(self.horizontalSpacer, 0, 0, 1, 2)
+
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.menubar = QMenuBar(MainWindow)
+        self.menubar.setObjectName(u"menubar")
+        self.menubar.setGeometry(QRect(0, 0, 800, 26))
+        self.menuconfig = QMenu(self.menubar)
+        self.menuconfig.setObjectName(u"menuconfig")
+        MainWindow.setMenuBar(self.menubar)
+        self.statusbar = QStatusBar(MainWindow)
+        self.statusbar.setObjectName(u"statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+
+        self.menubar.addAction(self.menuconfig.menuAction())
+        self.menuconfig.addAction(self.actionconfig)
+        self.menuconfig.addSeparator()
+        self.menuconfig.addAction(self.actionmqtt_live)
+        self.menuconfig.addSeparator()
+        self.menuconfig.addAction(self.actiondiagnostics)
+        self.menuconfig.addAction(self.actionwrite_profile)
+
+        self.retranslateUi(MainWindow)
+
+        QMetaObject.connectSlotsByName(MainWindow)
+    # setupUi
+
+    def retranslateUi(self, MainWindow):
+        MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"SunShade Management GUI", None))
+        self.actionconfig.setText(QCoreApplication.translate("MainWindow", u"settings", None))
+        self.actionmqtt_live.setText(QCoreApplication.translate("MainWindow", u"mqtt_live", None))
+        self.actiondiagnostics.setText(QCoreApplication.translate("MainWindow", u"diagnostics", None))
+        self.actionwrite_profile.setText(QCoreApplication.translate("MainWindow", u"write_profile", None))
+        self.menuconfig.setTitle(QCoreApplication.translate("MainWindow", u"Menu", None))
+    # retranslateUi
+
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+## Form generated from reading UI file 'mqtt_live.ui'
+##
+## Created by: Qt User Interface Compiler version 6.12.0
+##
+## WARNING! All changes made in this file will be lost when recompiling UI file!
+################################################################################
+
+from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
+    QMetaObject, QObject, QPoint, QRect,
+    QSize, QTime, QUrl, Qt)
+from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
+    QCursor, QFont, QFontDatabase, QGradient,
+    QIcon, QImage, QKeySequence, QLinearGradient,
+    QPainter, QPalette, QPixmap, QRadialGradient,
+    QTransform)
+from PySide6.QtWidgets import (QApplication, QGridLayout, QGroupBox, QHBoxLayout,
+    QMainWindow, QMenu, QMenuBar, QSizePolicy,
+    QSpacerItem, QStatusBar, QWidget)
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        if not MainWindow.objectName():
+            MainWindow.setObjectName(u"MainWindow")
+        MainWindow.resize(642, 309)
+        self.actionrestart_all = QAction(MainWindow)
+        self.actionrestart_all.setObjectName(u"actionrestart_all")
+        self.actionmaster_info = QAction(MainWindow)
+        self.actionmaster_info.setObjectName(u"actionmaster_info")
+        self.actionwrite_profile = QAction(MainWindow)
+        self.actionwrite_profile.setObjectName(u"actionwrite_profile")
+        self.actionalerts = QAction(MainWindow)
+        self.actionalerts.setObjectName(u"actionalerts")
+        self.actionalerts.setCheckable(True)
+        self.actionmemory_report = QAction(MainWindow)
+        self.actionmemory_report.setObjectName(u"actionmemory_report")
+        self.actionhistory = QAction(MainWindow)
+        self.actionhistory.setObjectName(u"actionhistory")
+        self.actiondiagnostics = QAction(MainWindow)
+        self.actiondiagnostics.setObjectName(u"actiondiagnostics")
+        self.actiondiagnostics.setCheckable(True)
+        self.actionhidden = QAction(MainWindow)
+        self.actionhidden.setObjectName(u"actionhidden")
+        self.actionhidden.setCheckable(True)
+        self.actionauto_resize = QAction(MainWindow)
+        self.actionauto_resize.setObjectName(u"actionauto_resize")
+        self.actionauto_resize.setCheckable(True)
+        self.actionuptime = QAction(MainWindow)
+        self.actionuptime.setObjectName(u"actionuptime")
+        self.actionuptime.setCheckable(True)
+        self.actionbuild_timestamp = QAction(MainWindow)
+        self.actionbuild_timestamp.setObjectName(u"actionbuild_timestamp")
+        self.actionbuild_timestamp.setCheckable(True)
+        self.actiondelete_offline = QAction(MainWindow)
+        self.actiondelete_offline.setObjectName(u"actiondelete_offline")
+        self.actiondelete_no_slave_mapping = QAction(MainWindow)
+        self.actiondelete_no_slave_mapping.setObjectName(u"actiondelete_no_slave_mapping")
+        self.actionota_update_all = QAction(MainWindow)
+        self.actionota_update_all.setObjectName(u"actionota_update_all")
+        self.actionread_accurate_all = QAction(MainWindow)
+        self.actionread_accurate_all.setObjectName(u"actionread_accurate_all")
+        self.actionbalancing_enabled = QAction(MainWindow)
+        self.actionbalancing_enabled.setObjectName(u"actionbalancing_enabled")
+        self.actionbalancing_enabled.setCheckable(True)
+        self.actiondark_mode = QAction(MainWindow)
+        self.actiondark_mode.setObjectName(u"actiondark_mode")
+        self.actiondark_mode.setCheckable(True)
+        self.actiondark_mode.setChecked(True)
+        self.actiongenerate_slave_mapping = QAction(MainWindow)
+        self.actiongenerate_slave_mapping.setObjectName(u"actiongenerate_slave_mapping")
+        self.actionreset_can_limits = QAction(MainWindow)
+        self.actionreset_can_limits.setObjectName(u"actionreset_can_limits")
+        self.actionset_can_ha_discovery = QAction(MainWindow)
+        self.actionset_can_ha_discovery.setObjectName(u"actionset_can_ha_discovery")
+        self.actionset_esp_relay_discovery = QAction(MainWindow)
+        self.actionset_esp_relay_discovery.setObjectName(u"actionset_esp_relay_discovery")
+        self.actionmodule_ha_discovery = QAction(MainWindow)
+        self.actionmodule_ha_discovery.setObjectName(u"actionmodule_ha_discovery")
+        self.actionmodule_ha_discovery.setCheckable(True)
+        self.centralwidget = QWidget(MainWindow)
+        self.centralwidget.setObjectName(u"centralwidget")
+        self.gridLayout = QGridLayout(self.centralwidget)
+        self.gridLayout.setObjectName(u"gridLayout")
+        self.moduleBox = QGroupBox(self.centralwidget)
+        self.moduleBox.setObjectName(u"moduleBox")
+        self.moduleBoxLayout = QGridLayout(self.moduleBox)
+        self.moduleBoxLayout.setObjectName(u"moduleBoxLayout")
+
+        self.gridLayout.addWidget(self.moduleBox, 1, 0, 1, 1)
+
+        self.verticalSpacer = QSpacerItem(20, 40, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
+
+        self.gridLayout.addItem(self.verticalSpacer, 2, 0, 1, 1)
+
+        self.canBox = QGroupBox(self.centralwidget)
+        self.canBox.setObjectName(u"canBox")
+        self.horizontalLayout = QHBoxLayout(self.canBox)
+        self.horizontalLayout.setObjectName(u"horizontalLayout")
+
+        self.gridLayout.addWidget(self.canBox, 0, 0, 1, 1)
+
+        self.horizontalSpacer = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+
+        self.gridLayout.addItem(self.horizontalSpacer, 0, 1, 2, 1)
+
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.menubar = QMenuBar(MainWindow)
+        self.menubar.setObjectName(u"menubar")
+        self.menubar.setGeometry(QRect(0, 0, 642, 33))
+        self.menuactions = QMenu(self.menubar)
+        self.menuactions.setObjectName(u"menuactions")
+        self.menuwindow = QMenu(self.menubar)
+        self.menuwindow.setObjectName(u"menuwindow")
+        self.menushow = QMenu(self.menubar)
+        self.menushow.setObjectName(u"menushow")
+        MainWindow.setMenuBar(self.menubar)
+        self.statusbar = QStatusBar(MainWindow)
+        self.statusbar.setObjectName(u"statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+
+        self.menubar.addAction(self.menuactions.menuAction())
+        self.menubar.addAction(self.menuwindow.menuAction())
+        self.menubar.addAction(self.menushow.menuAction())
+        self.menuactions.addAction(self.actionread_accurate_all)
+        self.menuactions.addAction(self.actionbalancing_enabled)
+        self.menuactions.addAction(self.actionrestart_all)
+        self.menuactions.addAction(self.actiondelete_offline)
+        self.menuactions.addAction(self.actiondelete_no_slave_mapping)
+        self.menuactions.addAction(self.actionota_update_all)
+        self.menuactions.addAction(self.actionreset_can_limits)
+        self.menuactions.addSeparator()
+        self.menuactions.addAction(self.actiongenerate_slave_mapping)
+        self.menuactions.addSeparator()
+        self.menuactions.addAction(self.actionset_can_ha_discovery)
+        self.menuactions.addAction(self.actionset_esp_relay_discovery)
+        self.menuactions.addAction(self.actionmodule_ha_discovery)
+        self.menuwindow.addAction(self.actionmaster_info)
+        self.menuwindow.addAction(self.actiondiagnostics)
+        self.menuwindow.addAction(self.actionmemory_report)
+        self.menuwindow.addAction(self.actionhistory)
+        self.menuwindow.addAction(self.actionalerts)
+        self.menuwindow.addAction(self.actionwrite_profile)
+        self.menushow.addAction(self.actionhidden)
+        self.menushow.addAction(self.actionuptime)
+        self.menushow.addAction(self.actionbuild_timestamp)
+        self.menushow.addSeparator()
+        self.menushow.addAction(self.actionauto_resize)
+        self.menushow.addAction(self.actiondark_mode)
+
+        self.retranslateUi(MainWindow)
+
+        QMetaObject.connectSlotsByName(MainWindow)
+    # setupUi
+
+    def retranslateUi(self, MainWindow):
+        MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"Connecting...", None))
+        self.actionrestart_all.setText(QCoreApplication.translate("MainWindow", u"restart_all", None))
+        self.actionmaster_info.setText(QCoreApplication.translate("MainWindow", u"master_info", None))
+        self.actionwrite_profile.setText(QCoreApplication.translate("MainWindow", u"write_profile", None))
+        self.actionalerts.setText(QCoreApplication.translate("MainWindow", u"alerts", None))
+        self.actionmemory_report.setText(QCoreApplication.translate("MainWindow", u"memory_report", None))
+        self.actionhistory.setText(QCoreApplication.translate("MainWindow", u"history", None))
+        self.actiondiagnostics.setText(QCoreApplication.translate("MainWindow", u"diagnostics", None))
+        self.actionhidden.setText(QCoreApplication.translate("MainWindow", u"hidden", None))
+        self.actionauto_resize.setText(QCoreApplication.translate("MainWindow", u"auto_resize", None))
+        self.actionuptime.setText(QCoreApplication.translate("MainWindow", u"uptime", None))
+        self.actionbuild_timestamp.setText(QCoreApplication.translate("MainWindow", u"build_timestamp", None))
+        self.actiondelete_offline.setText(QCoreApplication.translate("MainWindow", u"delete_offline", None))
+        self.actiondelete_no_slave_mapping.setText(QCoreApplication.translate("MainWindow", u"delete_no_slave_mapping", None))
+        self.actionota_update_all.setText(QCoreApplication.translate("MainWindow", u"ota_update_all", None))
+        self.actionread_accurate_all.setText(QCoreApplication.translate("MainWindow", u"read_accurate_all", None))
+        self.actionbalancing_enabled.setText(QCoreApplication.translate("MainWindow", u"balancing_enabled", None))
+        self.actiondark_mode.setText(QCoreApplication.translate("MainWindow", u"dark_mode", None))
+        self.actiongenerate_slave_mapping.setText(QCoreApplication.translate("MainWindow", u"generate_slave_mapping", None))
+        self.actionreset_can_limits.setText(QCoreApplication.translate("MainWindow", u"reset_can_limits", None))
+        self.actionset_can_ha_discovery.setText(QCoreApplication.translate("MainWindow", u"set_can_ha_discovery", None))
+        self.actionset_esp_relay_discovery.setText(QCoreApplication.translate("MainWindow", u"set_esp_relay_discovery", None))
+        self.actionmodule_ha_discovery.setText(QCoreApplication.translate("MainWindow", u"module_ha_discovery", None))
+        self.moduleBox.setTitle(QCoreApplication.translate("MainWindow", u"modules", None))
+        self.canBox.setTitle(QCoreApplication.translate("MainWindow", u"can", None))
+        self.menuactions.setTitle(QCoreApplication.translate("MainWindow", u"actions", None))
+        self.menuwindow.setTitle(QCoreApplication.translate("MainWindow", u"window", None))
+        self.menushow.setTitle(QCoreApplication.translate("MainWindow", u"show", None))
+    # retranslateUi
+
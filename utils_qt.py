@@ -1,8 +1,74 @@
-from PySide6 import QtWidgets
+from PySide6 import QtAsyncio, QtWidgets
+
+
+def exec_app() -> int:
+    # the qt event loop runs as the asyncio loop, so slots can start coroutines that await on the gui thread
+    QtAsyncio.run(keep_running=True, quit_qapp=True)
+    return 0
+
+
+class GridModel:
+    # mirrors the module positions of a QGridLayout so lookups don't have to walk the layout
+    def __init__(self, grid_layout: QtWidgets.QGridLayout, max_columns: int):
+        self.grid_layout = grid_layout
+        self.max_columns = max_columns
+        self.widget_modules: dict[QtWidgets.QWidget, str] = {}
+        self.position_modules: dict[tuple[int, int], str] = {}
+        self.module_positions: dict[str, tuple[int, int]] = {}
+        self.row: int = 0
+        self.column: int = 0
+
+    def register(self, identifier: str, widget: QtWidgets.QWidget):
+        self.widget_modules[widget] = identifier
+
+    def unregister(self, identifier: str, widget: QtWidgets.QWidget):
+        self.widget_modules.pop(widget, None)
+        position = self.module_positions.pop(identifier, None)
+        if position is not None:
+            del self.position_modules[position]
+            self.grid_layout.removeWidget(widget)
+
+    def clear(self):
+        self.position_modules.clear()
+        self.module_positions.clear()
+        self.row = 0
+        self.column = 0
+
+    def append(self, widget: QtWidgets.QWidget):
+        identifier = self.widget_modules[widget]
+        self.grid_layout.addWidget(widget, self.row, self.column)
+        self.position_modules[(self.row, self.column)] = identifier
+        self.module_positions[identifier] = (self.row, self.column)
+        self.column += 1
+        if self.column >= self.max_columns:
+            self.row += 1
+            self.column = 0
+
+    def exchange(self, widget1: QtWidgets.QWidget, widget2: QtWidgets.QWidget):
+        identifier1 = self.widget_modules.get(widget1)
+        identifier2 = self.widget_modules.get(widget2)
+        if identifier1 is None or identifier2 is None:
+            return
+        position1 = self.module_positions.get(identifier1)
+        position2 = self.module_positions.get(identifier2)
+        if position1 is None or position2 is None:
+            return
+        self.position_modules[position1], self.position_modules[position2] = identifier2, identifier1
+        self.module_positions[identifier1], self.module_positions[identifier2] = position2, position1
+
+    def module_of(self, widget: QtWidgets.QWidget | None) -> str | None:
+        return self.widget_modules.get(widget)
+
+    def module_at(self, row: int, column: int) -> str | None:
+        return self.position_modules.get((row, column))
+
+    def ordered(self) -> list[str]:
+        positions = ((row, column) for row in range(self.row + 1) for column in range(self.max_columns))
+        return [self.position_modules[position] for position in positions if position in self.position_modules]
 
 
 def exchange_widget_positions(grid_layout: QtWidgets.QGridLayout, widget1: QtWidgets.QWidget,
-                              widget2: QtWidgets.QWidget):
+                              widget2: QtWidgets.QWidget, grid_model: GridModel | None = None):
     row1, column1, row_span1, column_span1 = grid_layout.getItemPosition(grid_layout.indexOf(widget1))
     row2, column2, row_span2, column_span2 = grid_layout.getItemPosition(grid_layout.indexOf(widget2))
     grid_layout.removeWidget(widget1)
@@ -10,3 +76,5 @@ def exchange_widget_positions(grid_layout: QtWidgets.QGridLayout, widget1: QtWid
     grid_layout.addWidget(widget1, row2, column2, row_span2, column_span2)
     grid_layout.addWidget(widget2, row1, column1, row_span1, column_span1)
     grid_layout.update()
+    if grid_model is not None:
+        grid_model.exchange(widget1, widget2)
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import collections
+import json
+import math
+import struct
+import time
+
+import paho.mqtt.client as mqtt
+
+import mqtt_topics
+from site_state import SiteState
+from subscriptions import demanded_fields, field_path, STATIC_TOPICS
+
+# one mqtt subscription for any number of browsers: messages are applied to a SiteState at a fixed rate and only the
+# fields that changed since the last update are pushed to all viewers over server-sent events, encoded once
+
+FIELDS: list[str] = ['available', 'module_topic', 'module_voltage', 'total_system_voltage', 'total_system_current',
+                     'voltage']
+STATS: dict[str, int] = {'modules': 0, 'module_voltage': 2, 'total_voltage': 2, 'total_current': 2, 'power': 0,
+                         'cell_min': 3, 'cell_max': 3, 'cell_diff': 0, 'cell_median': 3}
+
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>management-gui</title>
+<style>
+body { font-family: sans-serif; margin: 1em; background: #202124; color: #e8eaed; }
+#stats span { display: inline-block; margin-right: 1.5em; }
+#grid { display: flex; flex-wrap: wrap; gap: 0.5em; margin-top: 1em; }
+.module { border: 1px solid #5f6368; padding: 0.4em; min-width: 11em; }
+.module h4 { margin: 0 0 0.3em 0; }
+.cell { display: inline-block; width: 3.2em; text-align: right; font-family: monospace; }
+.high { background: #ff5c33; color: #202124; }
+.low { background: #3399ff; color: #202124; }
+#state { float: right; }
+</style>
+</head>
+<body>
+<div id="state">connecting</div>
+<div id="stats"></div>
+<div id="grid"></div>
+<script>
+const STAT_LABELS = {modules: ['modules', ''], total_voltage: ['voltage', ' V'], total_current: ['current', ' A'],
+  power: ['power', ' W'], cell_min: ['min', ' V'], cell_max: ['max', ' V'], cell_diff: ['diff', ' mV'],
+  cell_median: ['median', ' V'], viewers: ['viewers', '']};
+let stats = {}, modules = {};
+function apply(data) {
+  Object.assign(stats, data.s || {});
+  const recolor = data.s && 'cell_median' in data.s;
+  for (const [id, change] of Object.entries(data.m || {})) {
+    const module = modules[id] || (modules[id] = {mv: 0, c: []});
+    if (change.mv !== undefined) module.mv = change.mv;
+    if (Array.isArray(change.c)) module.c = change.c;
+    else for (const [i, v] of Object.entries(change.c || {})) module.c[i] = v;
+    if (!recolor) draw(id);
+  }
+  for (const id of data.r || []) { delete modules[id]; const e = document.getElementById('m-' + id); if (e) e.remove(); }
+  document.getElementById('stats').innerHTML = Object.entries(STAT_LABELS).filter(([k]) => k in stats)
+    .map(([k, [label, unit]]) => `<span>${label}: ${stats[k]}${unit}</span>`).join('');
+  if (recolor) for (const id in modules) draw(id);
+}
+function draw(id) {
+  const module = modules[id];
+  let e = document.getElementById('m-' + id);
+  if (!e) {
+    e = document.createElement('div'); e.className = 'module'; e.id = 'm-' + id;
+    const grid = document.getElementById('grid');
+    const after = [...grid.children].find(c => c.id.slice(2).localeCompare(id, undefined, {numeric: true}) > 0);
+    grid.insertBefore(e, after || null);
+  }
+  const median = stats.cell_median ? stats.cell_median * 1000 : null;
+  const cells = module.c.map(v => v === null ? '<span class="cell">-</span>' :
+    `<span class="cell ${median && v - median >= 10 ? 'high' : median && v - median <= -10 ? 'low' : ''}">${v}</span>`);
+  // ids come from mqtt topics, never parse them as html
+  e.innerHTML = '<h4></h4>' + cells.join('');
+  e.firstChild.textContent = `${id}: ${module.mv} V`;
+}
+const source = new EventSource('events');
+source.addEventListener('snapshot', event => { stats = {}; modules = {};
+  document.getElementById('grid').innerHTML = ''; apply(JSON.parse(event.data)); });
+source.addEventListener('delta', event => apply(JSON.parse(event.data)));
+source.onopen = () => document.getElementById('state').textContent = 'live';
+source.onerror = () => document.getElementById('state').textContent = 'reconnecting';
+</script>
+</body>
+</html>
+'''
+
+
+class Viewer:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.resync: bool = False
+
+
+class Dashboard:
+    KEEPALIVE: float = 15.0
+
+    def __init__(self, parameters: dict, rate: float = 2.0, queue_size: int = 20):
+        self.mqtt_prefix: str = parameters.get('mqtt_prefix', '')
+        if len(self.mqtt_prefix) > 0 and not self.mqtt_prefix.endswith('/'):
+            self.mqtt_prefix = f'{self.mqtt_prefix}/'
+        hide_modules = str(parameters.get('hide_modules', 'none'))
+        hidden: set[str] = set()
+        if hide_modules != '' and hide_modules.lower() != 'none':
+            hidden = set(hide_modules.split(','))
+        self.state = SiteState(hidden)
+        self.interval: float = 1 / rate
+        self.queue_size = queue_size
+        # filled by the paho network thread, drained on the event loop once per interval
+        self.inbox: collections.deque[tuple[str, bytes]] = collections.deque()
+        self.sent: dict = {'s': {}, 'm': {}}
+        self.viewers: set[Viewer] = set()
+        self.bytes_sent: int = 0
+        self.deltas_sent: int = 0
+        self.resyncs: int = 0
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client.username_pw_set(parameters.get('username', ''), parameters.get('password', ''))
+        self.client.reconnect_delay_set(1, 60)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = lambda client, userdata, msg: self.inbox.append((msg.topic, msg.payload))
+        self.host: str = parameters['host']
+        self.port: int = int(parameters.get('port', 1883))
+
+    def filters(self) -> list[str]:
+        filters = list(STATIC_TOPICS)
+        filters += [f'esp-module/+/{field_path(field)}' for field in sorted(demanded_fields(FIELDS))]
+        return [f'{self.mqtt_prefix}{topic_filter}' for topic_filter in filters]
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if not reason_code.is_failure:
+            client.subscribe([(topic_filter, 0) for topic_filter in self.filters()])
+
+    def apply_inbox(self):
+        for _ in range(len(self.inbox)):
+            topic, payload = self.inbox.popleft()
+            if len(payload) < 1:
+                continue
+            decoded = mqtt_topics.decode_topic(mqtt_topics.strip_prefix(topic, self.mqtt_prefix))
+            if decoded is None or decoded[0] == mqtt_topics.OTHER:
+                continue
+            # one bad payload must not end the update loop and disconnect every viewer
+            try:
+                if decoded[0] == mqtt_topics.CELLS:
+                    self.state.apply_packed(decoded[1], decoded[3], payload)
+                else:
+                    self.state.apply(decoded, payload.decode())
+            except (ValueError, IndexError, struct.error) as e:
+                self.state.bad_messages += 1
+                print(topic, payload, 'bad data!', e)
+
+    def view(self) -> dict:
+        # millivolts and rounded stats, a change below the shown precision is not sent
+        stats = self.state.stats()
+        # power can still overflow to inf from two large finite values
+        view: dict = {'s': {key: round(stats[key], digits) if digits > 0 else round(stats[key])
+                            for key, digits in STATS.items() if math.isfinite(stats.get(key, math.nan))}, 'm': {}}
+        view['s']['viewers'] = len(self.viewers)
+        for identifier, module in self.state.modules.items():
+            if module.hidden:
+                continue
+            view['m'][identifier] = {'mv': round(module.module_voltage, 2),
+                                     'c': [None if voltage is None else round(voltage * 1000)
+                                           for voltage in module.voltages]}
+        return view
+
+    def delta(self, view: dict) -> dict:
+        delta: dict = {}
+        stats = {key: value for key, value in view['s'].items() if self.sent['s'].get(key) != value}
+        if len(stats) > 0:
+            delta['s'] = stats
+        modules: dict = {}
+        for identifier, module in view['m'].items():
+            old = self.sent['m'].get(identifier)
+            if old is None:
+                modules[identifier] = module
+                continue
+            change: dict = {}
+            if module['mv'] != old['mv']:
+                change['mv'] = module['mv']
+            cells = {i: value for i, value in enumerate(module['c']) if old['c'][i] != value}
+            if len(cells) > 0:
+                change['c'] = cells
+            if len(change) > 0:
+                modules[identifier] = change
+        if len(modules) > 0:
+            delta['m'] = modules
+        removed = [identifier for identifier in self.sent['m'] if identifier not in view['m']]
+        if len(removed) > 0:
+            delta['r'] = removed
+        return delta
+
+    @staticmethod
+    def event(name: str, data: dict) -> bytes:
+        return f'event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode()
+
+    async def publish_deltas(self):
+        viewer_count = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            self.apply_inbox()
+            if not self.state.dirty and viewer_count == len(self.viewers):
+                continue
+            self.state.dirty = False
+            viewer_count = len(self.viewers)
+            view = self.view()
+            delta = self.delta(view)
+            self.sent = view
+            if len(delta) < 1:
+                continue
+            data = self.event('delta', delta)
+            self.deltas_sent += 1
+            for viewer in self.viewers:
+                if viewer.resync:
+                    continue
+                try:
+                    viewer.queue.put_nowait(data)
+                except asyncio.QueueFull:
+                    # a viewer that can't keep up skips the backlog and starts over from a snapshot
+                    viewer.resync = True
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+            method, path = request.split(b'\r\n', 1)[0].decode('latin-1').split(' ')[:2]
+            path = path.split('?', 1)[0]
+            if method != 'GET':
+                await self.respond(writer, '405 Method Not Allowed', 'text/plain', b'method not allowed\n')
+            elif path in ('/', '/index.html'):
+                await self.respond(writer, '200 OK', 'text/html; charset=utf-8', PAGE.encode())
+            elif path == '/state':
+                await self.respond(writer, '200 OK', 'application/json', json.dumps(self.sent).encode())
+            elif path == '/events':
+                await self.stream(writer)
+            else:
+                await self.respond(writer, '404 Not Found', 'text/plain', b'not found\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError,
+                ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes):
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                     f'Cache-Control: no-cache\r\nConnection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+
+    async def stream(self, writer: asyncio.StreamWriter):
+        viewer = Viewer(self.queue_size)
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n'
+                     b'Connection: keep-alive\r\n\r\nretry: 2000\n\n')
+        self.viewers.add(viewer)
+        try:
+            data = self.event('snapshot', self.sent)
+            while True:
+                writer.write(data)
+                self.bytes_sent += len(data)
+                await writer.drain()
+                try:
+                    data = await asyncio.wait_for(viewer.queue.get(), self.KEEPALIVE)
+                except asyncio.TimeoutError:
+                    data = b': keepalive\n\n'
+                if viewer.resync:
+                    viewer.resync = False
+                    self.resyncs += 1
+                    while not viewer.queue.empty():
+                        viewer.queue.get_nowait()
+                    data = self.event('snapshot', self.sent)
+        finally:
+            self.viewers.discard(viewer)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(60)
+            print(f'{time.strftime("%H:%M:%S")} viewers: {len(self.viewers)}, modules: {len(self.sent["m"])}, '
+                  f'deltas: {self.deltas_sent}, sent: {self.bytes_sent} bytes, resyncs: {self.resyncs}, '
+                  f'bad messages: {self.state.bad_messages}')
+
+    async def run(self, listen_host: str, listen_port: int):
+        self.client.connect_async(host=self.host, port=self.port)
+        self.client.loop_start()
+        try:
+            server = await asyncio.start_server(self.handle, listen_host, listen_port)
+            print(f'dashboard on http://{listen_host}:{listen_port}/ for {self.host}:{self.port} {self.mqtt_prefix}')
+            async with server:
+                await asyncio.gather(server.serve_forever(), self.publish_deltas(), self.report())
+        finally:
+            self.client.disconnect()
+            self.client.loop_stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='web dashboard of a pack, pushed to browsers with server-sent events')
+    parser.add_argument('--host', default='127.0.0.1', help='mqtt broker')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--username', default='')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--mqtt-prefix', default='')
+    parser.add_argument('--hide-modules', default='none')
+    parser.add_argument('--listen', default='127.0.0.1:8080', help='address of the http server')
+    parser.add_argument('--rate', type=float, default=2.0, help='updates per second sent to the browsers')
+    arguments = parser.parse_args()
+    listen_host, listen_port = arguments.listen.rsplit(':', 1)
+    dashboard = Dashboard({'host': arguments.host, 'port': arguments.port, 'username': arguments.username,
+                           'password': arguments.password, 'mqtt_prefix': arguments.mqtt_prefix,
+                           'hide_modules': arguments.hide_modules}, arguments.rate)
+    try:
+        asyncio.run(dashboard.run(listen_host, int(listen_port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()